@@ -3,24 +3,32 @@ AGV API 路由
 
 提供 AGV 相關的 RESTful API 端點
 """
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.exc import IntegrityError
+from typing import Any, Dict, List
 import time
 from datetime import datetime
 
-from app.core.database import get_session
+from app.core.config import settings
+from app.core.database import get_async_session
+from app.core.etag import make_etag, is_not_modified, not_modified, query_version
+from app.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, split_page
+from app.core.multi_get import match_keys, parse_keys
+from app.core.param_filter import parse_param_filters
+from app.core.serialization import get_serializer, rows_response
 from app.models import AGV
-from app.schemas.agv import AGVCreate, AGVUpdate, AGVResponse
-from app.crud import agv as crud_agv
+from app.schemas.agv import AGVCreate, AGVUpsert, AGVUpdate, AGVResponse
+from app.schemas.common import IdsRequest, NamesRequest, MultiGetItem
+from app.crud.aio import agv as crud_agv
 
 router = APIRouter()
 
 
 @router.post("/", response_model=AGVResponse, status_code=status.HTTP_201_CREATED)
-def create_agv(
+async def create_agv(
     agv_in: AGVCreate,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     新增 AGV
@@ -31,67 +39,243 @@ def create_agv(
     - **enable**: 啟用狀態，預設 1
     - **parameter**: AGV 參數（JSON，選填）
     """
-    # 檢查名稱是否已存在
-    existing_agv = crud_agv.get_agv_by_name(session, agv_in.name)
-    if existing_agv:
+    # 轉換為 AGV 模型
+    agv_data = AGV(**agv_in.model_dump())
+
+    # 名稱唯一性交由資料庫的唯一約束檢查（避免先查再寫的競爭條件）
+    try:
+        agv = await crud_agv.create_agv(session, agv_data)
+    except IntegrityError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"AGV 名稱 '{agv_in.name}' 已存在"
         )
+    return agv
 
-    # 轉換為 AGV 模型
-    agv_data = AGV(**agv_in.model_dump())
-    agv = crud_agv.create_agv(session, agv_data)
+
+@router.put("/by-name", response_model=List[AGVResponse])
+async def upsert_agvs_by_name(
+    agvs_in: List[AGVCreate],
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    依名稱批次新增或更新 AGV（單一語句）
+
+    - **agvs_in**: AGV 列表，欄位同新增 AGV；名稱已存在則更新，否則新增
+
+    上限由 UPSERT_BULK_MAX_SIZE 設定；同一批中重複的名稱以最後一筆為準
+    """
+    if len(agvs_in) > settings.UPSERT_BULK_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"單次最多處理 {settings.UPSERT_BULK_MAX_SIZE} 筆"
+        )
+
+    agvs_data = [AGV(**item.model_dump()) for item in agvs_in]
+    results = await crud_agv.upsert_agvs(session, agvs_data)
+    return [agv for agv, _ in results]
+
+
+@router.put("/by-name/{name}", response_model=AGVResponse)
+async def upsert_agv_by_name(
+    name: str,
+    agv_in: AGVUpsert,
+    response: Response,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    依名稱新增或更新 AGV
+
+    - **name**: AGV 名稱（路徑）
+    - **model**: AGV 型號（必填）
+    - **description**: 描述，預設 N/A
+    - **enable**: 啟用狀態，預設 1
+    - **parameter**: AGV 參數（JSON）
+
+    名稱不存在時新增並回傳 201，已存在時更新並回傳 200
+    """
+    agv_data = AGV(name=name, **agv_in.model_dump())
+    agv, inserted = await crud_agv.upsert_agv(session, agv_data)
+    response.status_code = status.HTTP_201_CREATED if inserted else status.HTTP_200_OK
     return agv
 
 
 @router.get("/", response_model=List[AGV])
-def get_all_agvs(
+async def get_all_agvs(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     enabled_only: bool = False,
-    session: Session = Depends(get_session)
+    cursor: str | None = None,
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
-    查詢所有 AGV
+    查詢所有 AGV（按 ID 排序）
 
     - **skip**: 跳過筆數（分頁用），預設 0
     - **limit**: 限制筆數（分頁用），預設 100
     - **enabled_only**: 是否只查詢啟用的 AGV，預設 False
+    - **cursor**: 分頁游標，取自上一頁回應標頭 X-Next-Cursor；提供時忽略 skip
+    - **param.<key>**: 依 parameter 內容篩選，例如 param.ip=10.0.0.1（JSONB 包含查詢，可重複指定多個鍵）
+
+    還有下一頁時，回應標頭 X-Next-Cursor 會帶有下一頁的游標；
+    回應帶有 ETag，以 If-None-Match 帶回且資料未變更時回傳 304
     """
-    agvs = crud_agv.get_all_agvs(
+    after_id = None
+    if cursor:
+        try:
+            (after_id,) = decode_cursor(cursor, (int,))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="無效的分頁游標"
+            )
+
+    try:
+        parameter = parse_param_filters(request.query_params)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    # 條件式 GET：以筆數與最後更新時間判斷資料是否變更，未變更時不查詢也不序列化資料列
+    # （放在參數驗證之後：無效的游標或篩選條件即使 ETag 相符也回傳 400）
+    version = await crud_agv.get_agvs_version(session, enabled_only=enabled_only)
+    etag = make_etag(version, query_version(request))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+
+    agvs = await crud_agv.get_all_agvs(
         session,
-        skip=skip,
-        limit=limit,
-        enabled_only=enabled_only
+        skip=0 if cursor else skip,
+        limit=limit + 1,  # 多查一筆用來判斷是否還有下一頁
+        enabled_only=enabled_only,
+        after_id=after_id,
+        parameter=parameter
     )
-    return agvs
+    agvs, next_cursor = split_page(agvs, limit, lambda agv: (agv.id,))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return rows_response(agvs, AGVResponse, response.headers)
+
+
+@router.get("/many", response_model=List[MultiGetItem[AGVResponse]])
+async def get_agvs_many(
+    ids: str = Query(..., description="逗號分隔的 AGV ID，例如 1,2,3"),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    依 ID 列表查詢多筆 AGV（單一查詢）
+
+    - **ids**: 逗號分隔的 AGV ID；列表很長時改用 POST /many
+
+    結果依請求順序排列，每個 ID 一筆；不存在的 ID 回傳 found=false、data=null
+    """
+    try:
+        keys = parse_keys(ids, int, settings.MULTI_GET_MAX_SIZE)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return await _get_agvs_many(session, keys)
+
+
+@router.post("/many", response_model=List[MultiGetItem[AGVResponse]])
+async def post_agvs_many(
+    request_in: IdsRequest,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    依 ID 列表查詢多筆 AGV（請求本體版本，適用於長列表）
+
+    - **ids**: AGV ID 列表
+    """
+    return await _get_agvs_many(session, request_in.ids)
+
+
+@router.get("/many/by-name", response_model=List[MultiGetItem[AGVResponse]])
+async def get_agvs_many_by_name(
+    names: str = Query(..., description="逗號分隔的 AGV 名稱"),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    依名稱列表查詢多筆 AGV（單一查詢）
+
+    - **names**: 逗號分隔的 AGV 名稱；列表很長時改用 POST /many/by-name
+
+    結果依請求順序排列，每個名稱一筆；不存在的名稱回傳 found=false、data=null
+    """
+    try:
+        keys = parse_keys(names, str, settings.MULTI_GET_MAX_SIZE)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return await _get_agvs_many_by_name(session, keys)
+
+
+@router.post("/many/by-name", response_model=List[MultiGetItem[AGVResponse]])
+async def post_agvs_many_by_name(
+    request_in: NamesRequest,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    依名稱列表查詢多筆 AGV（請求本體版本，適用於長列表）
+
+    - **names**: AGV 名稱列表
+    """
+    return await _get_agvs_many_by_name(session, request_in.names)
+
+
+async def _get_agvs_many(session: AsyncSession, ids: list[int]) -> list[dict]:
+    """依 ID 列表查詢，結果依請求順序排列"""
+    rows = await crud_agv.get_agvs_by_ids(session, list(set(ids)))
+    return match_keys(ids, rows, lambda row: row.id, get_serializer(AGVResponse).to_dicts)
+
+
+async def _get_agvs_many_by_name(session: AsyncSession, names: list[str]) -> list[dict]:
+    """依名稱列表查詢，結果依請求順序排列"""
+    rows = await crud_agv.get_agvs_by_names(session, list(set(names)))
+    return match_keys(names, rows, lambda row: row.name, get_serializer(AGVResponse).to_dicts)
 
 
 @router.get("/{agv_id}", response_model=AGV)
-def get_agv(
+async def get_agv(
     agv_id: int,
-    session: Session = Depends(get_session)
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     根據 ID 查詢單一 AGV
 
     - **agv_id**: AGV ID
     """
-    agv = crud_agv.get_agv(session, agv_id)
+    agv = await crud_agv.get_agv(session, agv_id)
     if not agv:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"找不到 ID 為 {agv_id} 的 AGV"
         )
+
+    # 條件式 GET：資料未變更時回傳 304，不序列化回應內容
+    etag = make_etag(agv.id, agv.updated_at)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
     return agv
 
 
 @router.put("/{agv_id}", response_model=AGV)
-def update_agv(
+async def update_agv(
     agv_id: int,
     agv_in: AGV,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     更新 AGV（完整更新）
@@ -99,35 +283,30 @@ def update_agv(
     - **agv_id**: AGV ID
     - **agv_in**: 更新的 AGV 資料
     """
-    # 檢查 AGV 是否存在
-    existing_agv = crud_agv.get_agv(session, agv_id)
-    if not existing_agv:
+    # 轉換為字典（排除 None 值）
+    update_data = agv_in.model_dump(exclude_unset=True, exclude={'id', 'created_at'})
+
+    # 單一 UPDATE ... RETURNING；名稱唯一性交由資料庫的唯一約束檢查
+    try:
+        agv = await crud_agv.update_agv(session, agv_id, update_data)
+    except IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"AGV 名稱 '{update_data.get('name')}' 已被其他 AGV 使用"
+        )
+    if not agv:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"找不到 ID 為 {agv_id} 的 AGV"
         )
-
-    # 如果要更新名稱，檢查新名稱是否已被其他 AGV 使用
-    if agv_in.name != existing_agv.name:
-        name_check = crud_agv.get_agv_by_name(session, agv_in.name)
-        if name_check:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"AGV 名稱 '{agv_in.name}' 已被其他 AGV 使用"
-            )
-
-    # 轉換為字典（排除 None 值）
-    update_data = agv_in.model_dump(exclude_unset=True, exclude={'id', 'created_at'})
-
-    agv = crud_agv.update_agv(session, agv_id, update_data)
     return agv
 
 
 @router.patch("/{agv_id}", response_model=AGV)
-def partial_update_agv(
+async def partial_update_agv(
     agv_id: int,
     agv_in: AGV,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     部分更新 AGV（只更新提供的欄位）
@@ -135,41 +314,59 @@ def partial_update_agv(
     - **agv_id**: AGV ID
     - **agv_in**: 要更新的欄位
     """
-    # 檢查 AGV 是否存在
-    existing_agv = crud_agv.get_agv(session, agv_id)
-    if not existing_agv:
+    # 轉換為字典（只包含有設定的欄位）
+    update_data = agv_in.model_dump(exclude_unset=True, exclude={'id', 'created_at'})
+
+    # 單一 UPDATE ... RETURNING；名稱唯一性交由資料庫的唯一約束檢查
+    try:
+        agv = await crud_agv.update_agv(session, agv_id, update_data)
+    except IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"AGV 名稱 '{update_data.get('name')}' 已被其他 AGV 使用"
+        )
+    if not agv:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"找不到 ID 為 {agv_id} 的 AGV"
         )
+    return agv
 
-    # 轉換為字典（只包含有設定的欄位）
-    update_data = agv_in.model_dump(exclude_unset=True, exclude={'id', 'created_at'})
 
-    # 如果要更新名稱，檢查新名稱是否已被其他 AGV 使用
-    if 'name' in update_data and update_data['name'] != existing_agv.name:
-        name_check = crud_agv.get_agv_by_name(session, update_data['name'])
-        if name_check:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"AGV 名稱 '{update_data['name']}' 已被其他 AGV 使用"
-            )
+@router.patch("/{agv_id}/parameter", response_model=AGV)
+async def update_agv_parameter(
+    agv_id: int,
+    values: Dict[str, Any],
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    部分更新 AGV 的 parameter（只修改提供的鍵）
+
+    - **agv_id**: AGV ID
+    - **values**: 要設定的鍵值，例如 {"ip": "10.0.0.2"}；值為 null 表示刪除該鍵
 
-    agv = crud_agv.update_agv(session, agv_id, update_data)
+    在資料庫端合併（第一層），未提供的鍵維持不變，不需要先讀出整份 parameter
+    """
+    agv = await crud_agv.update_agv_parameter(session, agv_id, values)
+    if not agv:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"找不到 ID 為 {agv_id} 的 AGV"
+        )
     return agv
 
 
 @router.delete("/{agv_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_agv(
+async def delete_agv(
     agv_id: int,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     刪除 AGV
 
     - **agv_id**: AGV ID
     """
-    success = crud_agv.delete_agv(session, agv_id)
+    success = await crud_agv.delete_agv(session, agv_id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -179,17 +376,19 @@ def delete_agv(
 
 
 @router.get("/count/total")
-def count_agvs(
+async def count_agvs(
     enabled_only: bool = False,
-    session: Session = Depends(get_session)
+    approximate: bool = False,
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     計算 AGV 總數
 
     - **enabled_only**: 是否只計算啟用的 AGV，預設 False
+    - **approximate**: 使用統計資訊的估計值（僅在無篩選條件時生效），預設 False
     """
-    count = crud_agv.count_agvs(session, enabled_only=enabled_only)
-    return {"total": count, "enabled_only": enabled_only}
+    count = await crud_agv.count_agvs(session, enabled_only=enabled_only, approximate=approximate)
+    return {"total": count, "enabled_only": enabled_only, "approximate": approximate}
 
 
 @router.get("/test/slow-query")
@@ -3,22 +3,30 @@ EqpPort API 路由
 
 提供設備端口相關的 RESTful API 端點
 """
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.exc import IntegrityError
+from typing import Any, Dict, List
 
-from app.core.database import get_session
+from app.core.config import settings
+from app.core.database import get_async_session
+from app.core.etag import make_etag, is_not_modified, not_modified, query_version
+from app.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, split_page
+from app.core.multi_get import match_keys, parse_keys
+from app.core.param_filter import parse_param_filters
+from app.core.serialization import get_serializer, rows_response
 from app.models.eqp_port import EqpPort
-from app.schemas.eqp_port import EqpPortCreate, EqpPortUpdate, EqpPortResponse
-from app.crud import eqp_port as crud_eqp_port
+from app.schemas.eqp_port import EqpPortCreate, EqpPortUpsert, EqpPortUpdate, EqpPortResponse
+from app.schemas.common import IdsRequest, NamesRequest, MultiGetItem
+from app.crud.aio import eqp_port as crud_eqp_port
 
 router = APIRouter()
 
 
 @router.post("/", response_model=EqpPortResponse, status_code=status.HTTP_201_CREATED)
-def create_eqp_port(
+async def create_eqp_port(
     eqp_port_in: EqpPortCreate,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     新增設備端口
@@ -29,67 +37,243 @@ def create_eqp_port(
     - **description**: 描述（選填）
     - **parameter**: 端口參數（JSON，選填）
     """
-    # 檢查名稱是否已存在
-    existing_port = crud_eqp_port.get_eqp_port_by_name(session, eqp_port_in.name)
-    if existing_port:
+    # 轉換為 EqpPort 模型
+    eqp_port_data = EqpPort(**eqp_port_in.model_dump())
+
+    # 名稱唯一性交由資料庫的唯一約束檢查（避免先查再寫的競爭條件）
+    try:
+        eqp_port = await crud_eqp_port.create_eqp_port(session, eqp_port_data)
+    except IntegrityError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"端口名稱 '{eqp_port_in.name}' 已存在"
         )
+    return eqp_port
 
-    # 轉換為 EqpPort 模型
-    eqp_port_data = EqpPort(**eqp_port_in.model_dump())
-    eqp_port = crud_eqp_port.create_eqp_port(session, eqp_port_data)
+
+@router.put("/by-name", response_model=List[EqpPortResponse])
+async def upsert_eqp_ports_by_name(
+    eqp_ports_in: List[EqpPortCreate],
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    依名稱批次新增或更新設備端口（單一語句）
+
+    - **eqp_ports_in**: 設備端口列表，欄位同新增設備端口；名稱已存在則更新，否則新增
+
+    上限由 UPSERT_BULK_MAX_SIZE 設定；同一批中重複的名稱以最後一筆為準
+    """
+    if len(eqp_ports_in) > settings.UPSERT_BULK_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"單次最多處理 {settings.UPSERT_BULK_MAX_SIZE} 筆"
+        )
+
+    eqp_ports_data = [EqpPort(**item.model_dump()) for item in eqp_ports_in]
+    results = await crud_eqp_port.upsert_eqp_ports(session, eqp_ports_data)
+    return [eqp_port for eqp_port, _ in results]
+
+
+@router.put("/by-name/{name}", response_model=EqpPortResponse)
+async def upsert_eqp_port_by_name(
+    name: str,
+    eqp_port_in: EqpPortUpsert,
+    response: Response,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    依名稱新增或更新設備端口
+
+    - **name**: 端口名稱（路徑）
+    - **eqp_name**: 所屬設備名稱（必填）
+    - **node**: 節點編號（必填）
+    - **description**: 描述，預設 N/A
+    - **parameter**: 端口參數（JSON，選填）
+
+    名稱不存在時新增並回傳 201，已存在時更新並回傳 200
+    """
+    eqp_port_data = EqpPort(name=name, **eqp_port_in.model_dump())
+    eqp_port, inserted = await crud_eqp_port.upsert_eqp_port(session, eqp_port_data)
+    response.status_code = status.HTTP_201_CREATED if inserted else status.HTTP_200_OK
     return eqp_port
 
 
 @router.get("/", response_model=List[EqpPort])
-def get_all_eqp_ports(
+async def get_all_eqp_ports(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     eqp_name: str | None = None,
-    session: Session = Depends(get_session)
+    cursor: str | None = None,
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
-    查詢所有設備端口
+    查詢所有設備端口（按 ID 排序）
 
     - **skip**: 跳過筆數（分頁用），預設 0
     - **limit**: 限制筆數（分頁用），預設 100
     - **eqp_name**: 按設備名稱篩選（選填）
+    - **cursor**: 分頁游標，取自上一頁回應標頭 X-Next-Cursor；提供時忽略 skip
+    - **param.<key>**: 依 parameter 內容篩選，例如 param.slot=2（JSONB 包含查詢，可重複指定多個鍵）
+
+    還有下一頁時，回應標頭 X-Next-Cursor 會帶有下一頁的游標；
+    回應帶有 ETag，以 If-None-Match 帶回且資料未變更時回傳 304
     """
-    eqp_ports = crud_eqp_port.get_all_eqp_ports(
+    after_id = None
+    if cursor:
+        try:
+            (after_id,) = decode_cursor(cursor, (int,))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="無效的分頁游標"
+            )
+
+    try:
+        parameter = parse_param_filters(request.query_params)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    # 條件式 GET：以筆數與最後更新時間判斷資料是否變更，未變更時不查詢也不序列化資料列
+    # （放在參數驗證之後：無效的游標或篩選條件即使 ETag 相符也回傳 400）
+    version = await crud_eqp_port.get_eqp_ports_version(session, eqp_name=eqp_name)
+    etag = make_etag(version, query_version(request))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+
+    eqp_ports = await crud_eqp_port.get_all_eqp_ports(
         session,
-        skip=skip,
-        limit=limit,
-        eqp_name=eqp_name
+        skip=0 if cursor else skip,
+        limit=limit + 1,  # 多查一筆用來判斷是否還有下一頁
+        eqp_name=eqp_name,
+        after_id=after_id,
+        parameter=parameter
     )
-    return eqp_ports
+    eqp_ports, next_cursor = split_page(eqp_ports, limit, lambda eqp_port: (eqp_port.id,))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return rows_response(eqp_ports, EqpPortResponse, response.headers)
+
+
+@router.get("/many", response_model=List[MultiGetItem[EqpPortResponse]])
+async def get_eqp_ports_many(
+    ids: str = Query(..., description="逗號分隔的 EqpPort ID，例如 1,2,3"),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    依 ID 列表查詢多筆 EqpPort（單一查詢）
+
+    - **ids**: 逗號分隔的 EqpPort ID；列表很長時改用 POST /many
+
+    結果依請求順序排列，每個 ID 一筆；不存在的 ID 回傳 found=false、data=null
+    """
+    try:
+        keys = parse_keys(ids, int, settings.MULTI_GET_MAX_SIZE)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return await _get_eqp_ports_many(session, keys)
+
+
+@router.post("/many", response_model=List[MultiGetItem[EqpPortResponse]])
+async def post_eqp_ports_many(
+    request_in: IdsRequest,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    依 ID 列表查詢多筆 EqpPort（請求本體版本，適用於長列表）
+
+    - **ids**: EqpPort ID 列表
+    """
+    return await _get_eqp_ports_many(session, request_in.ids)
+
+
+@router.get("/many/by-name", response_model=List[MultiGetItem[EqpPortResponse]])
+async def get_eqp_ports_many_by_name(
+    names: str = Query(..., description="逗號分隔的 EqpPort 名稱"),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    依名稱列表查詢多筆 EqpPort（單一查詢）
+
+    - **names**: 逗號分隔的 EqpPort 名稱；列表很長時改用 POST /many/by-name
+
+    結果依請求順序排列，每個名稱一筆；不存在的名稱回傳 found=false、data=null
+    """
+    try:
+        keys = parse_keys(names, str, settings.MULTI_GET_MAX_SIZE)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return await _get_eqp_ports_many_by_name(session, keys)
+
+
+@router.post("/many/by-name", response_model=List[MultiGetItem[EqpPortResponse]])
+async def post_eqp_ports_many_by_name(
+    request_in: NamesRequest,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    依名稱列表查詢多筆 EqpPort（請求本體版本，適用於長列表）
+
+    - **names**: EqpPort 名稱列表
+    """
+    return await _get_eqp_ports_many_by_name(session, request_in.names)
+
+
+async def _get_eqp_ports_many(session: AsyncSession, ids: list[int]) -> list[dict]:
+    """依 ID 列表查詢，結果依請求順序排列"""
+    rows = await crud_eqp_port.get_eqp_ports_by_ids(session, list(set(ids)))
+    return match_keys(ids, rows, lambda row: row.id, get_serializer(EqpPortResponse).to_dicts)
+
+
+async def _get_eqp_ports_many_by_name(session: AsyncSession, names: list[str]) -> list[dict]:
+    """依名稱列表查詢，結果依請求順序排列"""
+    rows = await crud_eqp_port.get_eqp_ports_by_names(session, list(set(names)))
+    return match_keys(names, rows, lambda row: row.name, get_serializer(EqpPortResponse).to_dicts)
 
 
 @router.get("/{eqp_port_id}", response_model=EqpPort)
-def get_eqp_port(
+async def get_eqp_port(
     eqp_port_id: int,
-    session: Session = Depends(get_session)
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     根據 ID 查詢單一設備端口
 
     - **eqp_port_id**: 端口 ID
     """
-    eqp_port = crud_eqp_port.get_eqp_port(session, eqp_port_id)
+    eqp_port = await crud_eqp_port.get_eqp_port(session, eqp_port_id)
     if not eqp_port:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"找不到 ID 為 {eqp_port_id} 的設備端口"
         )
+
+    # 條件式 GET：資料未變更時回傳 304，不序列化回應內容
+    etag = make_etag(eqp_port.id, eqp_port.updated_at)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
     return eqp_port
 
 
 @router.put("/{eqp_port_id}", response_model=EqpPort)
-def update_eqp_port(
+async def update_eqp_port(
     eqp_port_id: int,
     eqp_port_in: EqpPort,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     更新設備端口（完整更新）
@@ -97,35 +281,30 @@ def update_eqp_port(
     - **eqp_port_id**: 端口 ID
     - **eqp_port_in**: 更新的端口資料
     """
-    # 檢查端口是否存在
-    existing_port = crud_eqp_port.get_eqp_port(session, eqp_port_id)
-    if not existing_port:
+    # 轉換為字典（排除 None 值）
+    update_data = eqp_port_in.model_dump(exclude_unset=True, exclude={'id', 'created_at'})
+
+    # 單一 UPDATE ... RETURNING；名稱唯一性交由資料庫的唯一約束檢查
+    try:
+        eqp_port = await crud_eqp_port.update_eqp_port(session, eqp_port_id, update_data)
+    except IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"端口名稱 '{update_data.get('name')}' 已被其他端口使用"
+        )
+    if not eqp_port:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"找不到 ID 為 {eqp_port_id} 的設備端口"
         )
-
-    # 如果要更新名稱，檢查新名稱是否已被其他端口使用
-    if eqp_port_in.name != existing_port.name:
-        name_check = crud_eqp_port.get_eqp_port_by_name(session, eqp_port_in.name)
-        if name_check:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"端口名稱 '{eqp_port_in.name}' 已被其他端口使用"
-            )
-
-    # 轉換為字典（排除 None 值）
-    update_data = eqp_port_in.model_dump(exclude_unset=True, exclude={'id', 'created_at'})
-
-    eqp_port = crud_eqp_port.update_eqp_port(session, eqp_port_id, update_data)
     return eqp_port
 
 
 @router.patch("/{eqp_port_id}", response_model=EqpPort)
-def partial_update_eqp_port(
+async def partial_update_eqp_port(
     eqp_port_id: int,
     eqp_port_in: EqpPort,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     部分更新設備端口（只更新提供的欄位）
@@ -133,41 +312,59 @@ def partial_update_eqp_port(
     - **eqp_port_id**: 端口 ID
     - **eqp_port_in**: 要更新的欄位
     """
-    # 檢查端口是否存在
-    existing_port = crud_eqp_port.get_eqp_port(session, eqp_port_id)
-    if not existing_port:
+    # 轉換為字典（只包含有設定的欄位）
+    update_data = eqp_port_in.model_dump(exclude_unset=True, exclude={'id', 'created_at'})
+
+    # 單一 UPDATE ... RETURNING；名稱唯一性交由資料庫的唯一約束檢查
+    try:
+        eqp_port = await crud_eqp_port.update_eqp_port(session, eqp_port_id, update_data)
+    except IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"端口名稱 '{update_data.get('name')}' 已被其他端口使用"
+        )
+    if not eqp_port:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"找不到 ID 為 {eqp_port_id} 的設備端口"
         )
+    return eqp_port
 
-    # 轉換為字典（只包含有設定的欄位）
-    update_data = eqp_port_in.model_dump(exclude_unset=True, exclude={'id', 'created_at'})
 
-    # 如果要更新名稱，檢查新名稱是否已被其他端口使用
-    if 'name' in update_data and update_data['name'] != existing_port.name:
-        name_check = crud_eqp_port.get_eqp_port_by_name(session, update_data['name'])
-        if name_check:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"端口名稱 '{update_data['name']}' 已被其他端口使用"
-            )
+@router.patch("/{eqp_port_id}/parameter", response_model=EqpPort)
+async def update_eqp_port_parameter(
+    eqp_port_id: int,
+    values: Dict[str, Any],
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    部分更新設備端口的 parameter（只修改提供的鍵）
+
+    - **eqp_port_id**: 設備端口 ID
+    - **values**: 要設定的鍵值，例如 {"slot": 2}；值為 null 表示刪除該鍵
 
-    eqp_port = crud_eqp_port.update_eqp_port(session, eqp_port_id, update_data)
+    在資料庫端合併（第一層），未提供的鍵維持不變，不需要先讀出整份 parameter
+    """
+    eqp_port = await crud_eqp_port.update_eqp_port_parameter(session, eqp_port_id, values)
+    if not eqp_port:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"找不到 ID 為 {eqp_port_id} 的設備端口"
+        )
     return eqp_port
 
 
 @router.delete("/{eqp_port_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_eqp_port(
+async def delete_eqp_port(
     eqp_port_id: int,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     刪除設備端口
 
     - **eqp_port_id**: 端口 ID
     """
-    success = crud_eqp_port.delete_eqp_port(session, eqp_port_id)
+    success = await crud_eqp_port.delete_eqp_port(session, eqp_port_id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -177,14 +374,16 @@ def delete_eqp_port(
 
 
 @router.get("/count/total")
-def count_eqp_ports(
+async def count_eqp_ports(
     eqp_name: str | None = None,
-    session: Session = Depends(get_session)
+    approximate: bool = False,
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     計算設備端口總數
 
     - **eqp_name**: 按設備名稱篩選（選填）
+    - **approximate**: 使用統計資訊的估計值（僅在無篩選條件時生效），預設 False
     """
-    count = crud_eqp_port.count_eqp_ports(session, eqp_name=eqp_name)
-    return {"total": count, "eqp_name": eqp_name}
+    count = await crud_eqp_port.count_eqp_ports(session, eqp_name=eqp_name, approximate=approximate)
+    return {"total": count, "eqp_name": eqp_name, "approximate": approximate}
@@ -0,0 +1,83 @@
+"""
+State WebSocket 路由
+
+提供 AGV / EqpPort 狀態訂閱的 WebSocket 端點，取代畫面端的輪詢
+"""
+import asyncio
+import logging
+from typing import List
+
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.core.state_stream import state_hub
+from app.schemas.state import StateSubscription
+
+logger = logging.getLogger("app")
+
+router = APIRouter()
+
+
+@router.websocket("/ws")
+async def state_websocket(
+    websocket: WebSocket,
+    agv_name: List[str] = Query([], description="初始訂閱的 AGV 名稱（可重複指定）"),
+    eqp_name: List[str] = Query([], description="初始訂閱的設備名稱（可重複指定）"),
+):
+    """
+    AGV / EqpPort 狀態訂閱
+
+    用戶端送出 {"action": "subscribe" | "unsubscribe", "agv_names": [...], "eqp_names": [...]}；
+    伺服器推送：
+    - **snapshot**: 訂閱後或需要重新同步時的完整資料列（data）
+    - **update**: 資料列變更的 JSON Merge Patch（patch，含 parameter 內的變更，刪除的鍵為 null）
+    - **delete**: 資料列已刪除或不再符合訂閱
+    - **subscribed**: 目前的訂閱清單；**error**: 請求錯誤
+    """
+    await websocket.accept()
+    connection = state_hub.connect(websocket)
+    sender = asyncio.create_task(connection.send_loop(state_hub))
+
+    def subscribe(agv_names: List[str], eqp_names: List[str]):
+        total = len(connection.agv_names | set(agv_names)) + len(connection.eqp_names | set(eqp_names))
+        if total > settings.WS_MAX_SUBSCRIPTIONS:
+            connection.push_control({
+                "op": "error",
+                "detail": f"訂閱數量超過上限 {settings.WS_MAX_SUBSCRIPTIONS}"
+            })
+            return
+        state_hub.subscribe(connection, agv_names, eqp_names)
+
+    try:
+        if agv_name or eqp_name:
+            subscribe(agv_name, eqp_name)
+
+        while True:
+            text = await websocket.receive_text()
+            try:
+                request = StateSubscription.model_validate_json(text)
+            except ValidationError as e:
+                connection.push_control({"op": "error", "detail": e.errors(include_url=False)})
+                continue
+
+            if request.action == "subscribe":
+                subscribe(request.agv_names, request.eqp_names)
+            else:
+                state_hub.unsubscribe(connection, request.agv_names, request.eqp_names)
+                connection.push_control({
+                    "op": "subscribed",
+                    "agv_names": sorted(connection.agv_names),
+                    "eqp_names": sorted(connection.eqp_names),
+                })
+    except WebSocketDisconnect:
+        pass
+    finally:
+        state_hub.disconnect(connection)
+        sender.cancel()
+        try:
+            await sender
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.debug(f"[WS] 送出訊息失敗: {e}")
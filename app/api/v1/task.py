@@ -3,22 +3,39 @@ Task API 路由
 
 提供任務相關的 RESTful API 端點
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlmodel import Session
-from typing import List, Optional
-
-from app.core.database import get_session
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Any, Dict, List, Literal, Optional
+from datetime import datetime
+
+from app.core.config import settings
+from app.core.database import async_engine, get_async_session
+from app.core.etag import make_etag, is_not_modified, not_modified, query_version
+from app.core.expand import expand_tasks, parse_expand
+from app.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, split_page
+from app.core.multi_get import match_keys, parse_keys
+from app.core.param_filter import parse_param_filters
+from app.core.serialization import get_serializer, json_response, rows_response
+from app.core.sql_stats import skip_repeat_check
+from app.core.task_stream import task_event_hub
 from app.models.task import Task
-from app.schemas.task import TaskCreate, TaskUpdate, TaskResponse
-from app.crud import task as crud_task
+from app.schemas.task import (
+    TaskCreate, TaskUpdate, TaskResponse, TaskBatchUpdate, TaskBatchUpdateResult, TaskClaim, TaskTreeNode
+)
+from app.schemas.common import IdsRequest, MultiGetItem
+from app.crud.aio import agv as crud_agv
+from app.crud.aio import eqp_port as crud_eqp_port
+from app.crud.aio import task as crud_task
 
 router = APIRouter()
 
 
 @router.post("/", response_model=TaskResponse, status_code=status.HTTP_201_CREATED)
-def create_task(
+async def create_task(
     task_in: TaskCreate,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     新增任務
@@ -35,18 +52,77 @@ def create_task(
     """
     # 轉換為 Task 模型
     task_data = Task(**task_in.model_dump())
-    task = crud_task.create_task(session, task_data)
+    task = await crud_task.create_task(session, task_data)
     return task
 
 
+@router.post("/bulk", response_model=List[TaskResponse], status_code=status.HTTP_201_CREATED)
+async def create_tasks_bulk(
+    tasks_in: List[TaskCreate],
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    批次新增任務（單一交易）
+
+    - **tasks_in**: 任務列表，欄位同新增任務；上限由 TASK_BULK_MAX_SIZE 設定
+
+    全部成功或全部失敗，回傳新建的任務（順序與請求相同）
+    """
+    if len(tasks_in) > settings.TASK_BULK_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"單次最多新增 {settings.TASK_BULK_MAX_SIZE} 筆任務"
+        )
+
+    # 轉換為 Task 模型
+    tasks_data = [Task(**task_in.model_dump()) for task_in in tasks_in]
+    tasks = await crud_task.create_tasks(session, tasks_data)
+    return tasks
+
+
+@router.post("/claim", response_model=List[TaskResponse])
+async def claim_tasks(
+    claim_in: TaskClaim,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    領取任務（原子操作）
+
+    - **agv_name**: 領取任務的 AGV 名稱
+    - **from_status_id**: 可領取的任務狀態 ID
+    - **to_status_id**: 領取後的任務狀態 ID
+    - **limit**: 最多領取筆數，預設 1
+    - **work_id**: 只領取指定工作 ID 的任務（選填）
+    - **unassigned_only**: 只領取尚未指派 AGV 的任務，預設 True
+
+    取代「GET 查詢 + PATCH 指派」兩次呼叫；多個派車器同時領取不會拿到同一筆任務。
+    沒有可領取的任務時回傳空列表
+    """
+    tasks = await crud_task.claim_tasks(
+        session,
+        agv_name=claim_in.agv_name,
+        from_status_id=claim_in.from_status_id,
+        to_status_id=claim_in.to_status_id,
+        limit=claim_in.limit,
+        work_id=claim_in.work_id,
+        unassigned_only=claim_in.unassigned_only
+    )
+    return tasks
+
+
 @router.get("/", response_model=List[Task])
-def get_all_tasks(
+async def get_all_tasks(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     status_id: Optional[int] = Query(None, description="按狀態 ID 篩選"),
     agv_name: Optional[str] = Query(None, description="按 AGV 名稱篩選"),
     work_id: Optional[int] = Query(None, description="按工作 ID 篩選"),
-    session: Session = Depends(get_session)
+    cursor: Optional[str] = Query(None, description="分頁游標（取自上一頁回應標頭 X-Next-Cursor）"),
+    include_history: bool = Query(False, description="是否包含已搬移至歷史表的任務"),
+    expand: Optional[str] = Query(None, description="展開關聯資料（逗號分隔）：from_port, to_port, agv"),
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     查詢所有任務
@@ -56,66 +132,420 @@ def get_all_tasks(
     - **status_id**: 按狀態 ID 篩選（選填）
     - **agv_name**: 按 AGV 名稱篩選（選填）
     - **work_id**: 按工作 ID 篩選（選填）
-
-    結果按優先級（降序）和創建時間（升序）排序
+    - **cursor**: 分頁游標，提供時忽略 skip；深層分頁不會變慢，新增任務時也不會跳過或重複資料
+    - **param.<key>**: 依 parameter 內容篩選，例如 param.ip=10.0.0.1（JSONB 包含查詢，可重複指定多個鍵）
+    - **include_history**: 是否包含已搬移至歷史表（task_history）的已完成任務，預設 False
+    - **expand**: 展開關聯資料，例如 from_port,to_port,agv；每筆任務多一個 expanded 欄位，
+      內含對應的端口 / AGV 資料（名稱為 na 或不存在時為 null）。整頁只多一次端口查詢與一次 AGV 查詢
+
+    結果按優先級（降序）和創建時間（升序）排序；
+    還有下一頁時，回應標頭 X-Next-Cursor 會帶有下一頁的游標；
+    回應帶有 ETag，以 If-None-Match 帶回且資料未變更時回傳 304
     """
-    tasks = crud_task.get_all_tasks(
+    expand_fields = _parse_expand(expand)
+
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, (int, datetime, int))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="無效的分頁游標"
+            )
+
+    try:
+        parameter = parse_param_filters(request.query_params)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    # 條件式 GET：以篩選後的筆數與最後更新時間判斷資料是否變更，未變更時不查詢也不序列化資料列
+    version = [await crud_task.get_tasks_version(
+        session,
+        status_id=status_id,
+        agv_name=agv_name,
+        work_id=work_id,
+        include_history=include_history,
+        parameter=parameter
+    )]
+    # 展開的端口 / AGV 變更時 ETag 也要改變
+    if {"from_port", "to_port"} & set(expand_fields):
+        version.append(await crud_eqp_port.get_eqp_ports_version(session))
+    if "agv" in expand_fields:
+        version.append(await crud_agv.get_agvs_version(session))
+    etag = make_etag(version, query_version(request))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+
+    tasks = await crud_task.get_all_tasks(
         session,
-        skip=skip,
-        limit=limit,
+        skip=0 if cursor else skip,
+        limit=limit + 1,  # 多查一筆用來判斷是否還有下一頁
         status_id=status_id,
         agv_name=agv_name,
-        work_id=work_id
+        work_id=work_id,
+        after=after,
+        include_history=include_history,
+        parameter=parameter
     )
-    return tasks
+    tasks, next_cursor = split_page(tasks, limit, lambda task: (task.priority, task.created_at, task.id))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    if expand_fields:
+        return json_response(await expand_tasks(session, tasks, expand_fields), response.headers)
+    return rows_response(tasks, TaskResponse, response.headers)
+
+
+def _parse_expand(expand: Optional[str]) -> list[str]:
+    """解析 expand 參數，含不支援的欄位時回傳 400"""
+    try:
+        return parse_expand(expand)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.patch("/batch", response_model=TaskBatchUpdateResult, response_model_exclude_none=True)
+async def batch_update_tasks(
+    batch_in: TaskBatchUpdate,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    批次更新任務（單一 UPDATE 語句）
+
+    - **ids**: 任務 ID 列表（選填，最多 MULTI_GET_MAX_SIZE 筆）
+    - **status_id** / **agv_name** / **work_id**: 篩選條件（選填，可與 ids 併用）
+    - **values**: 要更新的欄位（可省略，但不能設為 null）
+    - **return_rows**: 是否回傳更新後的任務，預設 True
+
+    ids 與篩選條件至少需提供一項，避免誤更新整張表
+    """
+    if batch_in.ids is None and batch_in.status_id is None and not batch_in.agv_name and batch_in.work_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="請提供 ids 或至少一個篩選條件"
+        )
+
+    # 轉換為字典（只包含有設定的欄位）
+    update_data = batch_in.values.model_dump(exclude_unset=True)
+    if not update_data:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="請提供要更新的欄位"
+        )
+
+    try:
+        updated, tasks = await crud_task.update_tasks(
+            session,
+            update_data,
+            ids=batch_in.ids,
+            status_id=batch_in.status_id,
+            agv_name=batch_in.agv_name,
+            work_id=batch_in.work_id,
+            return_rows=batch_in.return_rows
+        )
+    except IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="更新的資料違反資料庫約束"
+        )
+    return {"updated": updated, "tasks": tasks if batch_in.return_rows else None}
+
+
+@router.get("/stream")
+async def stream_tasks(
+    request: Request,
+    status_id: Optional[List[int]] = Query(None, description="按狀態 ID 篩選（可重複指定）"),
+    agv_name: Optional[str] = Query(None, description="按 AGV 名稱篩選"),
+    last_event_id: Optional[int] = Query(None, description="續傳位置：最後收到的事件 ID"),
+    last_event_id_header: Optional[int] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    任務變更串流（Server-Sent Events）
+
+    取代輪詢 GET /task/：任務新增、更新、刪除時推送 insert / update / delete 事件，
+    已完成任務搬移至歷史表時推送 archive 事件，
+    data 為 {"event_id", "op", "task_id", "task"}
+
+    - **status_id**: 按狀態 ID 篩選，變更前或變更後符合即推送
+    - **agv_name**: 按 AGV 名稱篩選，變更前或變更後符合即推送
+    - **last_event_id**: 續傳位置；瀏覽器 EventSource 重新連線時會自動帶 Last-Event-ID 標頭
+
+    續傳位置早於事件保留範圍時會先推送 reset 事件，用戶端應重新查詢完整列表；
+    事件至少送達一次，用戶端以事件 ID 去重
+    """
+    resume_from = last_event_id if last_event_id is not None else last_event_id_header
+    # 連線期間補送事件會重複執行同一查詢
+    skip_repeat_check()
+    return StreamingResponse(
+        task_event_hub.stream(
+            status_ids=status_id,
+            agv_name=agv_name,
+            last_event_id=resume_from,
+            is_disconnected=request.is_disconnected,
+            keepalive=settings.TASK_STREAM_KEEPALIVE_SECONDS,
+        ),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # 關閉 nginx 緩衝，事件才能即時送出
+        },
+    )
+
+
+@router.get("/export")
+async def export_tasks(
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="匯出格式：ndjson 或 csv"),
+    status_id: Optional[int] = Query(None, description="按狀態 ID 篩選"),
+    agv_name: Optional[str] = Query(None, description="按 AGV 名稱篩選"),
+    work_id: Optional[int] = Query(None, description="按工作 ID 篩選"),
+    created_from: Optional[datetime] = Query(None, description="建立時間下限（包含）"),
+    created_to: Optional[datetime] = Query(None, description="建立時間上限（不包含）"),
+    include_history: bool = Query(False, description="是否包含已搬移至歷史表的任務"),
+):
+    """
+    串流匯出任務（報表用）
+
+    - **format**: ndjson（每行一筆 JSON）或 csv（第一列為欄位名稱）
+    - **status_id** / **agv_name** / **work_id**: 與查詢所有任務相同的篩選條件（選填）
+    - **created_from** / **created_to**: 建立時間範圍（選填）
+    - **include_history**: 是否包含已搬移至歷史表的任務（班別報表通常需要）
+
+    以伺服器端游標逐批讀取並直接寫入回應，伺服器記憶體用量與匯出筆數無關；
+    結果按建立時間（升序）排序，欄位順序與 TaskResponse 相同
+    """
+    # 篩選條件在回應開始送出前就要確定可執行：串流開始後的錯誤只會讓用戶端收到截斷的 200
+    created_from = _naive_local(created_from)
+    created_to = _naive_local(created_to)
+
+    # 串流期間逐批讀取，不做 N+1 檢查
+    skip_repeat_check()
+
+    serializer = get_serializer(TaskResponse)
+    batch_size = settings.TASK_EXPORT_BATCH_SIZE
+
+    async def generate():
+        # 依賴注入的 Session 在回應開始送出前就會關閉，串流期間需自行建立
+        async with AsyncSession(async_engine) as session:
+            if format == "csv":
+                # BOM 讓 Excel 以 UTF-8 開啟
+                yield ("\ufeff" + serializer.dumps_csv([], header=True)).encode("utf-8")
+            async for tasks in crud_task.stream_tasks(
+                session,
+                status_id=status_id,
+                agv_name=agv_name,
+                work_id=work_id,
+                created_from=created_from,
+                created_to=created_to,
+                batch_size=batch_size,
+                include_history=include_history
+            ):
+                if format == "csv":
+                    yield serializer.dumps_csv(tasks).encode("utf-8")
+                else:
+                    yield serializer.dumps_lines(tasks)
+
+    filename = f"tasks_{datetime.now():%Y%m%d_%H%M%S}.{format}"
+    return StreamingResponse(
+        generate(),
+        media_type="text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+def _naive_local(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    帶時區的時間轉為伺服器本地時間並移除時區
+
+    created_at 以 datetime.now()（不含時區的本地時間）寫入，帶時區的值直接比較會在 asyncpg 拋出 DataError
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
+
+@router.get("/many", response_model=List[MultiGetItem[TaskResponse]])
+async def get_tasks_many(
+    ids: str = Query(..., description="逗號分隔的 任務 ID，例如 1,2,3"),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    依 ID 列表查詢多筆 任務（單一查詢）
+
+    - **ids**: 逗號分隔的 任務 ID；列表很長時改用 POST /many
+
+    結果依請求順序排列，每個 ID 一筆；不存在的 ID 回傳 found=false、data=null
+    """
+    try:
+        keys = parse_keys(ids, int, settings.MULTI_GET_MAX_SIZE)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return await _get_tasks_many(session, keys)
+
+
+@router.post("/many", response_model=List[MultiGetItem[TaskResponse]])
+async def post_tasks_many(
+    request_in: IdsRequest,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    依 ID 列表查詢多筆 任務（請求本體版本，適用於長列表）
+
+    - **ids**: 任務 ID 列表
+    """
+    return await _get_tasks_many(session, request_in.ids)
+
+
+async def _get_tasks_many(session: AsyncSession, ids: list[int]) -> list[dict]:
+    """依 ID 列表查詢，結果依請求順序排列"""
+    rows = await crud_task.get_tasks_by_ids(session, list(set(ids)))
+    return match_keys(ids, rows, lambda row: row.id, get_serializer(TaskResponse).to_dicts)
 
 
 @router.get("/{task_id}", response_model=Task)
-def get_task(
+async def get_task(
     task_id: int,
-    session: Session = Depends(get_session)
+    request: Request,
+    response: Response,
+    include_history: bool = Query(False, description="是否包含已搬移至歷史表的任務"),
+    expand: Optional[str] = Query(None, description="展開關聯資料（逗號分隔）：from_port, to_port, agv"),
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     根據 ID 查詢單一任務
 
     - **task_id**: 任務 ID
+    - **expand**: 展開關聯資料，例如 from_port,to_port,agv；回應多一個 expanded 欄位
     """
-    task = crud_task.get_task(session, task_id)
+    expand_fields = _parse_expand(expand)
+
+    task = await crud_task.get_task(session, task_id, include_history=include_history)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"找不到 ID 為 {task_id} 的任務"
         )
+
+    if expand_fields:
+        # 展開的端口 / AGV 變更時 ETag 也要改變
+        data = (await expand_tasks(session, [task], expand_fields))[0]
+        etag = make_etag(task.id, task.updated_at, [
+            (field, related and related["id"], related and related["updated_at"])
+            for field, related in data["expanded"].items()
+        ])
+        if is_not_modified(request, etag):
+            return not_modified(etag)
+        return json_response(data, {"ETag": etag})
+
+    # 條件式 GET：資料未變更時回傳 304，不序列化回應內容
+    etag = make_etag(task.id, task.updated_at)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
     return task
 
 
 @router.get("/{parent_task_id}/children", response_model=List[Task])
-def get_child_tasks(
+async def get_child_tasks(
     parent_task_id: int,
-    session: Session = Depends(get_session)
+    include_history: bool = Query(False, description="是否包含已搬移至歷史表的任務"),
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     查詢子任務
 
     - **parent_task_id**: 父任務 ID
+    - **include_history**: 是否包含已搬移至歷史表的父任務與子任務，預設 False
     """
-    # 先檢查父任務是否存在
-    parent_task = crud_task.get_task(session, parent_task_id)
-    if not parent_task:
+    tasks = await crud_task.get_tasks_by_parent(session, parent_task_id, include_history=include_history)
+
+    # 沒有子任務時才確認父任務是否存在（一般情況只需一次查詢）
+    if not tasks and not await crud_task.get_task(session, parent_task_id, include_history=include_history):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"找不到 ID 為 {parent_task_id} 的父任務"
         )
+    return rows_response(tasks, TaskResponse)
+
+
+@router.get("/{task_id}/tree", response_model=TaskTreeNode, response_model_exclude_none=True)
+async def get_task_tree(
+    task_id: int,
+    max_depth: int = Query(
+        settings.TASK_TREE_MAX_DEPTH, ge=0, le=settings.TASK_TREE_MAX_DEPTH,
+        description="最多往下查詢的層數（根任務為第 0 層）"
+    ),
+    rollup: bool = Query(False, description="是否提供每個節點的子孫任務狀態統計"),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    查詢任務樹（任務及其所有子孫任務）
+
+    以單一遞迴查詢取得整棵子樹，取代逐層呼叫 /{parent_task_id}/children
+
+    - **task_id**: 根任務 ID
+    - **max_depth**: 最多往下查詢的層數，超過的子孫任務不會回傳
+    - **rollup**: 為 True 時每個節點附上 status_counts（本節點及已回傳的子孫任務依 status_id 的筆數）
+    """
+    rows = await crud_task.get_task_tree(session, task_id, max_depth)
+    if not rows:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"找不到 ID 為 {task_id} 的任務"
+        )
+    return _build_task_tree(rows, rollup)
 
-    tasks = crud_task.get_tasks_by_parent(session, parent_task_id)
-    return tasks
+
+def _build_task_tree(rows: list[tuple[Task, int]], rollup: bool) -> dict:
+    """
+    將 (任務, 層數) 列表組成巢狀的任務樹
+
+    Args:
+        rows: crud_task.get_task_tree 的結果（依層數排序，第一筆為根任務）
+        rollup: 是否計算每個節點的 status_counts
+
+    Returns:
+        根節點（TaskTreeNode 欄位的字典）
+    """
+    tasks = [task for task, _ in rows]
+    nodes: dict[int, dict] = {}
+    ordered: list[dict] = []
+    for data, (task, depth) in zip(get_serializer(TaskResponse).to_dicts(tasks), rows):
+        # 資料異常（循環的 parent_task_id）時同一任務可能出現在多層，只保留最淺的一筆
+        if task.id in nodes:
+            continue
+        data["depth"] = depth
+        data["children"] = []
+        nodes[task.id] = data
+        ordered.append(data)
+        if depth > 0:
+            nodes[task.parent_task_id]["children"].append(data)
+
+    if rollup:
+        # 由最深的節點往上累加到父節點
+        for data in ordered:
+            data["status_counts"] = {data["status_id"]: 1}
+        for data in reversed(ordered[1:]):
+            parent_counts = nodes[data["parent_task_id"]]["status_counts"]
+            for status_id, count in data["status_counts"].items():
+                parent_counts[status_id] = parent_counts.get(status_id, 0) + count
+    return ordered[0]
 
 
 @router.put("/{task_id}", response_model=Task)
-def update_task(
+async def update_task(
     task_id: int,
     task_in: Task,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     更新任務（完整更新）
@@ -123,26 +553,24 @@ def update_task(
     - **task_id**: 任務 ID
     - **task_in**: 更新的任務資料
     """
-    # 檢查任務是否存在
-    existing_task = crud_task.get_task(session, task_id)
-    if not existing_task:
+    # 轉換為字典（排除 None 值）
+    update_data = task_in.model_dump(exclude_unset=True, exclude={'id', 'created_at'})
+
+    # 單一 UPDATE ... RETURNING，回傳 None 代表任務不存在
+    task = await crud_task.update_task(session, task_id, update_data)
+    if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"找不到 ID 為 {task_id} 的任務"
         )
-
-    # 轉換為字典（排除 None 值）
-    update_data = task_in.model_dump(exclude_unset=True, exclude={'id', 'created_at'})
-
-    task = crud_task.update_task(session, task_id, update_data)
     return task
 
 
 @router.patch("/{task_id}", response_model=Task)
-def partial_update_task(
+async def partial_update_task(
     task_id: int,
     task_in: Task,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     部分更新任務（只更新提供的欄位）
@@ -150,32 +578,53 @@ def partial_update_task(
     - **task_id**: 任務 ID
     - **task_in**: 要更新的欄位
     """
-    # 檢查任務是否存在
-    existing_task = crud_task.get_task(session, task_id)
-    if not existing_task:
+    # 轉換為字典（只包含有設定的欄位）
+    update_data = task_in.model_dump(exclude_unset=True, exclude={'id', 'created_at'})
+
+    # 單一 UPDATE ... RETURNING，回傳 None 代表任務不存在
+    task = await crud_task.update_task(session, task_id, update_data)
+    if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"找不到 ID 為 {task_id} 的任務"
         )
+    return task
 
-    # 轉換為字典（只包含有設定的欄位）
-    update_data = task_in.model_dump(exclude_unset=True, exclude={'id', 'created_at'})
 
-    task = crud_task.update_task(session, task_id, update_data)
+@router.patch("/{task_id}/parameter", response_model=Task)
+async def update_task_parameter(
+    task_id: int,
+    values: Dict[str, Any],
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    部分更新任務的 parameter（只修改提供的鍵）
+
+    - **task_id**: 任務 ID
+    - **values**: 要設定的鍵值，例如 {"pr1": "done"}；值為 null 表示刪除該鍵
+
+    在資料庫端合併（第一層），未提供的鍵維持不變，不需要先讀出整份 parameter
+    """
+    task = await crud_task.update_task_parameter(session, task_id, values)
+    if not task:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"找不到 ID 為 {task_id} 的任務"
+        )
     return task
 
 
 @router.delete("/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_task(
+async def delete_task(
     task_id: int,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     刪除任務
 
     - **task_id**: 任務 ID
     """
-    success = crud_task.delete_task(session, task_id)
+    success = await crud_task.delete_task(session, task_id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -185,16 +634,32 @@ def delete_task(
 
 
 @router.get("/count/total")
-def count_tasks(
+async def count_tasks(
     status_id: Optional[int] = Query(None, description="按狀態 ID 篩選"),
     agv_name: Optional[str] = Query(None, description="按 AGV 名稱篩選"),
-    session: Session = Depends(get_session)
+    approximate: bool = Query(False, description="使用統計資訊的估計值（僅在無篩選條件時生效）"),
+    include_history: bool = Query(False, description="是否包含已搬移至歷史表的任務"),
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     計算任務總數
 
     - **status_id**: 按狀態 ID 篩選（選填）
     - **agv_name**: 按 AGV 名稱篩選（選填）
+    - **approximate**: 使用 pg_class.reltuples 估計值，適合可接受誤差的儀表板（選填）
+    - **include_history**: 是否包含已搬移至歷史表的任務（選填）
     """
-    count = crud_task.count_tasks(session, status_id=status_id, agv_name=agv_name)
-    return {"total": count, "status_id": status_id, "agv_name": agv_name}
+    count = await crud_task.count_tasks(
+        session,
+        status_id=status_id,
+        agv_name=agv_name,
+        approximate=approximate,
+        include_history=include_history
+    )
+    return {
+        "total": count,
+        "status_id": status_id,
+        "agv_name": agv_name,
+        "approximate": approximate,
+        "include_history": include_history
+    }
@@ -0,0 +1,145 @@
+"""
+已完成任務搬移（task -> task_history）
+
+背景工作定期把 updated_at 早於保留時間的已完成任務分批搬移到按月分區的歷史表，
+讓派車器查詢的 task 表與其索引維持在可常駐記憶體的大小：
+- 每批一個交易，筆數有上限，批次之間稍作停頓，不會長時間佔用鎖或連線
+- 以 advisory lock 確保多個 worker 同時只有一個在搬移
+- 搬移前先建立需要的月分區；建立失敗的月份會落入 DEFAULT 分區，
+  並在一段時間後才重試（警告只記錄一次）
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .config import settings
+from .database import async_engine
+from app.crud.aio import task_history as crud_task_history
+
+logger = logging.getLogger("app")
+
+
+class TaskArchiver:
+    """已完成任務的背景搬移工作"""
+
+    def __init__(
+        self,
+        finished_status_ids: list[int],
+        archive_after: timedelta,
+        batch_size: int,
+        interval: float,
+        batch_pause: float = 0.1,
+        partition_retry_after: timedelta = timedelta(hours=1),
+    ):
+        self._finished_status_ids = list(finished_status_ids)
+        self._archive_after = archive_after
+        self._batch_size = batch_size
+        self._interval = interval
+        self._batch_pause = batch_pause
+        self._partition_retry_after = partition_retry_after
+        # 已確認存在的月分區
+        self._partitions: set[str] = set()
+        # 建立失敗的月分區 -> 下次重試時間
+        self._failed_partitions: dict[str, datetime] = {}
+        self._task: asyncio.Task | None = None
+        self.archived = 0
+        self.last_run_at: datetime | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._finished_status_ids)
+
+    async def start(self):
+        """啟動背景工作（未設定已完成狀態時不啟動）"""
+        if self._task is None and self.enabled:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止背景工作"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_once(self) -> int:
+        """
+        執行一次搬移，直到沒有可搬移的任務或其他 worker 正在搬移
+
+        Returns:
+            本次搬移筆數
+        """
+        before = datetime.now() - self._archive_after
+        total = 0
+
+        async with AsyncSession(async_engine) as session:
+            for month in await crud_task_history.get_archivable_months(
+                session, self._finished_status_ids, before
+            ):
+                name = crud_task_history.partition_name(month)
+                if name in self._partitions:
+                    continue
+                retry_at = self._failed_partitions.get(name)
+                if retry_at is not None and datetime.now() < retry_at:
+                    continue
+                try:
+                    await crud_task_history.create_history_partition(session, month)
+                    self._partitions.add(name)
+                    self._failed_partitions.pop(name, None)
+                except Exception as e:
+                    await session.rollback()
+                    self._failed_partitions[name] = datetime.now() + self._partition_retry_after
+                    if retry_at is None:
+                        logger.warning(f"[封存] 無法建立分區 {name}，該月份任務將寫入 DEFAULT 分區: {e}")
+                    else:
+                        logger.debug(f"[封存] 重試建立分區 {name} 仍失敗: {e}")
+
+            while True:
+                moved = await crud_task_history.archive_finished_tasks(
+                    session, self._finished_status_ids, before, self._batch_size
+                )
+                if moved is None:
+                    break
+                total += moved
+                if moved < self._batch_size:
+                    break
+                await asyncio.sleep(self._batch_pause)
+
+        self.archived += total
+        self.last_run_at = datetime.now()
+        if total:
+            logger.info(f"[封存] 已搬移 {total} 筆已完成任務至 task_history")
+        return total
+
+    def stats(self) -> dict:
+        """搬移統計"""
+        return {
+            "enabled": self.enabled,
+            "finished_status_ids": self._finished_status_ids,
+            "archive_after_hours": self._archive_after.total_seconds() / 3600,
+            "archived": self.archived,
+            "last_run_at": self.last_run_at,
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("[封存] 搬移已完成任務時發生錯誤")
+            await asyncio.sleep(self._interval)
+
+
+# 全域搬移工作
+task_archiver = TaskArchiver(
+    finished_status_ids=settings.TASK_FINISHED_STATUS_IDS,
+    archive_after=timedelta(hours=settings.TASK_ARCHIVE_AFTER_HOURS),
+    batch_size=settings.TASK_ARCHIVE_BATCH_SIZE,
+    interval=settings.TASK_ARCHIVE_INTERVAL_SECONDS,
+)
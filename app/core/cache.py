@@ -0,0 +1,196 @@
+"""
+AGV / EqpPort 讀取快取
+
+- 行程內的有界 LRU + TTL 快取，以 id 為主鍵，另維護 name -> id 索引
+- 本行程的寫入由 CRUD 函式直接失效對應項目
+- 其他 worker 的寫入透過 PostgreSQL LISTEN/NOTIFY（資料表觸發器）失效，
+  監聽連線重新連線時整個清空，避免斷線期間漏接的通知留下過期資料
+- 未命中時在查詢資料庫前取得失效世代（generation()），寫入時傳給 put()；
+  查詢期間該列被失效過就不寫入，避免並行的更新完成後又被舊資料覆蓋
+- 讀寫都複製資料，呼叫端修改取得的字典（例如 parameter）不會影響快取內容
+"""
+import copy
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from .config import settings
+
+logger = logging.getLogger("app")
+
+
+class RowCache:
+    """單一資料表的資料列快取（值為 model_dump() 後的字典）"""
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._rows: OrderedDict[int, tuple[float, dict[str, Any]]] = OrderedDict()
+        self._ids_by_name: dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_puts = 0
+        # 失效世代：每次失效 / 清空遞增，並記錄各鍵最後一次失效時的世代
+        self._generation = 0
+        self._invalidated: dict[tuple[str, Any], int] = {}
+        # 早於此世代開始的查詢一律不寫入（清空或整理 _invalidated 後無法逐鍵判斷）
+        self._floor = 0
+
+    def generation(self) -> int:
+        """目前的失效世代（快取未命中時，在查詢資料庫前取得並傳給 put）"""
+        return self._generation
+
+    def get_by_id(self, row_id: int) -> dict[str, Any] | None:
+        """依 id 取得快取資料，未命中或已過期回傳 None"""
+        with self._lock:
+            return self._get(row_id)
+
+    def get_by_name(self, name: str) -> dict[str, Any] | None:
+        """依名稱取得快取資料，未命中或已過期回傳 None"""
+        with self._lock:
+            row_id = self._ids_by_name.get(name)
+            if row_id is None:
+                self.misses += 1
+                return None
+            return self._get(row_id)
+
+    def put(self, row: dict[str, Any], since: int):
+        """
+        寫入快取
+
+        Args:
+            row: 資料列（需包含 id 與 name）
+            since: 開始查詢前取得的 generation()；之後該 id / 名稱被失效過時不寫入
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if (
+                since < self._floor
+                or self._invalidated.get(("id", row["id"]), -1) > since
+                or self._invalidated.get(("name", row["name"]), -1) > since
+            ):
+                self.stale_puts += 1
+                return
+            self._remove(row["id"])
+            self._rows[row["id"]] = (time.monotonic() + self.ttl, copy.deepcopy(row))
+            self._ids_by_name[row["name"]] = row["id"]
+            while len(self._rows) > self.maxsize:
+                oldest_id = next(iter(self._rows))
+                self._remove(oldest_id)
+                self.evictions += 1
+
+    def invalidate(self, row_id: int | None = None, name: str | None = None):
+        """依 id 及/或名稱失效快取項目（改名時舊名稱的索引也會一併移除）"""
+        with self._lock:
+            # 不論目前是否有快取都要記錄，查詢中尚未寫入的資料也要視為過期
+            self._generation += 1
+            if row_id is not None:
+                self._invalidated[("id", row_id)] = self._generation
+            if name is not None:
+                self._invalidated[("name", name)] = self._generation
+            if len(self._invalidated) > max(self.maxsize, 1) * 4:
+                self._invalidated.clear()
+                self._floor = self._generation
+            if name is not None and name in self._ids_by_name:
+                self._remove(self._ids_by_name[name])
+                self.invalidations += 1
+            if row_id is not None and row_id in self._rows:
+                self._remove(row_id)
+                self.invalidations += 1
+
+    def clear(self):
+        """清空快取"""
+        with self._lock:
+            self.invalidations += len(self._rows)
+            self._rows.clear()
+            self._ids_by_name.clear()
+            self._generation += 1
+            self._invalidated.clear()
+            self._floor = self._generation
+
+    def stats(self) -> dict[str, Any]:
+        """快取統計"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._rows),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "stale_puts": self.stale_puts,
+        }
+
+    def _get(self, row_id: int) -> dict[str, Any] | None:
+        entry = self._rows.get(row_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, row = entry
+        if expires_at < time.monotonic():
+            self._remove(row_id)
+            self.evictions += 1
+            self.misses += 1
+            return None
+        self._rows.move_to_end(row_id)
+        self.hits += 1
+        return copy.deepcopy(row)
+
+    def _remove(self, row_id: int):
+        entry = self._rows.pop(row_id, None)
+        if entry is not None and self._ids_by_name.get(entry[1]["name"]) == row_id:
+            del self._ids_by_name[entry[1]["name"]]
+
+
+def _new_cache(name: str) -> RowCache:
+    maxsize = settings.CACHE_MAX_SIZE if settings.CACHE_ENABLED else 0
+    return RowCache(name, maxsize=maxsize, ttl=settings.CACHE_TTL_SECONDS)
+
+
+agv_cache = _new_cache("agv")
+eqp_port_cache = _new_cache("eqp_port")
+
+# 資料表名稱 -> 快取（供變更通知使用）
+caches: dict[str, RowCache] = {
+    "agv": agv_cache,
+    "eqp_port": eqp_port_cache,
+}
+
+
+def handle_change_notification(payload: str):
+    """
+    處理資料表變更通知（LISTEN 回呼）
+
+    Args:
+        payload: 觸發器送出的 JSON，例如 {"table": "agv", "op": "UPDATE", "id": 1, "name": "AGV01"}
+    """
+    try:
+        change = json.loads(payload)
+    except ValueError:
+        logger.warning(f"[快取] 無法解析變更通知: {payload}")
+        return
+
+    cache = caches.get(change.get("table"))
+    if cache is not None:
+        cache.invalidate(change.get("id"), change.get("name"))
+
+
+def clear_all():
+    """清空所有快取"""
+    for cache in caches.values():
+        cache.clear()
+
+
+def get_cache_stats() -> dict[str, dict[str, Any]]:
+    """取得所有快取的統計"""
+    return {name: cache.stats() for name, cache in caches.items()}
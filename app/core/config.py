@@ -14,6 +14,62 @@ class Settings(BaseSettings):
     DB_PASSWORD: str = "36274806"
     DB_NAME: str = "agvc"
 
+    # 連線池設定
+    DB_POOL_SIZE: int = 10  # 常駐連線數
+    DB_MAX_OVERFLOW: int = 20  # 超出常駐連線數後可額外建立的連線數
+    DB_POOL_TIMEOUT: float = 30.0  # 等待可用連線的逾時秒數
+    DB_POOL_RECYCLE: int = 1800  # 連線存活超過此秒數即重建，-1 表示不回收
+    DB_POOL_PRE_PING: bool = False  # True: 每次取出連線都先 ping（多一次往返）
+    DB_POOL_PING_INTERVAL: int = 30  # PRE_PING=False 時，只有閒置超過此秒數的連線才 ping，0 表示不檢查
+
+    # AGV / EqpPort 讀取快取
+    CACHE_ENABLED: bool = True
+    CACHE_MAX_SIZE: int = 1024  # 每張資料表最多快取筆數
+    CACHE_TTL_SECONDS: float = 60.0  # 快取存活秒數（跨行程通知遺失時的上限）
+
+    # 任務狀態設定
+    # 已完成狀態：超過 TASK_ARCHIVE_AFTER_HOURS 未更新即搬移至 task_history，例如 [4, 5]；空列表表示不搬移
+    TASK_FINISHED_STATUS_IDS: list[int] = []
+    TASK_ARCHIVE_AFTER_HOURS: float = 24.0
+    TASK_ARCHIVE_BATCH_SIZE: int = 1000  # 每個交易搬移的筆數上限
+    TASK_ARCHIVE_INTERVAL_SECONDS: float = 300.0  # 搬移工作的執行間隔
+    # 批次新增任務單次上限
+    TASK_BULK_MAX_SIZE: int = 5000
+
+    # 任務匯出每批從資料庫游標讀取的筆數
+    TASK_EXPORT_BATCH_SIZE: int = 1000
+
+    # 任務樹（GET /task/{id}/tree）可查詢的最大層數
+    TASK_TREE_MAX_DEPTH: int = 16
+
+    # 任務變更串流（SSE）
+    TASK_STREAM_QUEUE_SIZE: int = 1000  # 每個連線的事件佇列上限，滿了改從 task_event 補送
+    TASK_STREAM_KEEPALIVE_SECONDS: float = 15.0  # 無事件時送出註解行的間隔，避免代理伺服器斷線
+    TASK_STREAM_BATCH_SIZE: int = 500  # 每次從 task_event 讀取的事件數
+    TASK_EVENT_GAP_GRACE_SECONDS: float = 5.0  # 事件 ID 跳號時，等待較早交易提交的秒數
+    TASK_EVENT_RETENTION_HOURS: int = 24  # 事件保留時數（可續傳的時間範圍）
+
+    # AGV / EqpPort 狀態訂閱（WebSocket）
+    WS_SEND_QUEUE_SIZE: int = 256  # 每個連線待送的資料列上限，超過時改在佇列清空後補送快照
+    WS_MAX_SUBSCRIPTIONS: int = 500  # 每個連線可訂閱的名稱數上限
+
+    # 依名稱批次新增/更新（upsert）單次上限
+    UPSERT_BULK_MAX_SIZE: int = 1000
+
+    # 依 ID / 名稱列表查詢（/many）單次上限
+    MULTI_GET_MAX_SIZE: int = 1000
+
+    # 列表路由直接依回應模型欄位順序序列化資料列，不經過 response_model 驗證
+    FAST_SERIALIZATION: bool = True
+
+    # 請求延遲 / 吞吐量指標（GET /metrics，Prometheus 文字格式）
+    METRICS_ENABLED: bool = True
+
+    # SQL 語句統計（GET /admin/sql/top）
+    SQL_SLOW_QUERY_MS: float = 200.0  # 超過此耗時的語句寫入 logs/slow_query.log
+    SQL_REPEAT_THRESHOLD: int = 10  # 同一請求中同一語句形狀超過此次數時記錄 N+1 警告，0 表示停用
+    SQL_STATS_MAX_STATEMENTS: int = 1000  # 統計的語句形狀數上限
+
     # API 設定
     API_V1_PREFIX: str = "/api/v1"
     PROJECT_NAME: str = "AGVC System"
@@ -27,6 +83,11 @@ class Settings(BaseSettings):
         """資料庫連線字串"""
         return f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        """非同步資料庫連線字串（asyncpg 驅動）"""
+        return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+
     class Config:
         case_sensitive = True
 
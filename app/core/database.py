@@ -1,16 +1,164 @@
 """
 資料庫連線管理
+
+- engine / get_session: 同步版本，供 scripts/、examples/ 使用
+- async_engine / get_async_session: 非同步版本，供 API 路由使用
+- 連線池參數由 Settings 的 DB_POOL_* 控制，get_pool_status() 提供即時統計
+- 兩個引擎都掛上 SQL 語句統計事件（app/core/sql_stats.py）
 """
+import threading
+import time
+
 from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from .config import settings
+from .sql_stats import install_sql_hooks
+
+
+class PoolWaitStats:
+    """連線池取得連線的等待統計"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, elapsed: float, timed_out: bool = False):
+        """記錄一次取得連線的等待時間"""
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += elapsed
+            if elapsed > self.wait_max:
+                self.wait_max = elapsed
+
+
+class _WaitTimingMixin:
+    """在取得連線時計時，用來判斷延遲是否來自連線池耗盡"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.wait_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.wait_stats.record(time.perf_counter() - start)
+        return conn
+
+
+class InstrumentedQueuePool(_WaitTimingMixin, QueuePool):
+    """帶等待統計的同步連線池"""
+
+
+class InstrumentedAsyncQueuePool(_WaitTimingMixin, AsyncAdaptedQueuePool):
+    """帶等待統計的非同步連線池"""
+
+
+def _pool_options() -> dict:
+    """由設定產生 create_engine 的連線池參數"""
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def _install_liveness_check(sync_engine, interval: int):
+    """
+    週期性連線檢查：只有閒置超過 interval 秒的連線在取出時才 ping
+
+    相較 pool_pre_ping 每次取出都多一次往返，熱連線可以直接使用；
+    ping 失敗時拋出 DisconnectionError，連線池會丟棄該連線並重試
+    """
+
+    @event.listens_for(sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        connection_record.info["last_checkin"] = time.monotonic()
+
+    @event.listens_for(sync_engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        if connection_record is not None:
+            connection_record.info["last_checkin"] = time.monotonic()
+
+    @event.listens_for(sync_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        last_checkin = connection_record.info.get("last_checkin", 0.0)
+        if time.monotonic() - last_checkin < interval:
+            return
+        try:
+            sync_engine.dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            raise exc.DisconnectionError(f"連線檢查失敗: {e}") from e
+
 
 # 建立資料庫引擎
 engine = create_engine(
     settings.DATABASE_URL,
     echo=False,  # 生產環境設為 False
-    pool_pre_ping=True,  # 檢查連線是否有效
+    poolclass=InstrumentedQueuePool,
+    **_pool_options(),
+)
+
+# 建立非同步資料庫引擎（asyncpg）
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL,
+    echo=False,  # 生產環境設為 False
+    poolclass=InstrumentedAsyncQueuePool,
+    **_pool_options(),
 )
 
+# 語句統計、慢查詢日誌與 N+1 偵測
+install_sql_hooks(engine)
+install_sql_hooks(async_engine.sync_engine)
+
+if not settings.DB_POOL_PRE_PING and settings.DB_POOL_PING_INTERVAL > 0:
+    _install_liveness_check(engine, settings.DB_POOL_PING_INTERVAL)
+    _install_liveness_check(async_engine.sync_engine, settings.DB_POOL_PING_INTERVAL)
+
+
+def get_pool_status(target_engine=None) -> dict:
+    """
+    取得連線池即時統計
+
+    Args:
+        target_engine: 要查詢的引擎，預設為 API 使用的 async_engine
+
+    Returns:
+        連線池狀態（使用中、閒置、溢出連線數與等待時間統計）
+    """
+    pool = (target_engine or async_engine).pool
+    stats = pool.wait_stats
+    requests = stats.checkouts + stats.timeouts
+
+    return {
+        "pool_size": pool.size(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "timeout_seconds": settings.DB_POOL_TIMEOUT,
+        "liveness": "pre_ping" if settings.DB_POOL_PRE_PING else f"idle>{settings.DB_POOL_PING_INTERVAL}s",
+        "checkouts": stats.checkouts,
+        "timeouts": stats.timeouts,
+        "wait_ms_total": round(stats.wait_total * 1000, 3),
+        "wait_ms_avg": round(stats.wait_total * 1000 / requests, 3) if requests else 0.0,
+        "wait_ms_max": round(stats.wait_max * 1000, 3),
+    }
+
 
 def get_session():
     """
@@ -21,3 +169,17 @@ def get_session():
     """
     with Session(engine) as session:
         yield session
+
+
+async def get_async_session():
+    """
+    取得非同步資料庫 Session（用於 FastAPI 依賴注入）
+
+    expire_on_commit=False：commit 後物件屬性仍可直接讀取，
+    避免在回應序列化時觸發隱式的延遲載入（async 模式下不允許）
+
+    Yields:
+        AsyncSession: 非同步資料庫 Session
+    """
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
@@ -0,0 +1,62 @@
+"""
+ETag / If-None-Match 條件式 GET
+
+ETag 由便宜取得的版本資訊（筆數、max(updated_at)、查詢參數等）雜湊而成，
+不需要先序列化回應內容；比對相符時直接回傳 304 Not Modified
+"""
+import hashlib
+
+from fastapi import Request, Response, status
+
+
+def make_etag(*parts) -> str:
+    """
+    由版本資訊產生弱 ETag
+
+    Args:
+        parts: 任何可 repr 的版本資訊
+
+    Returns:
+        ETag 字串，例如 W/"3f2a..."
+    """
+    digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def query_version(request: Request) -> tuple:
+    """
+    正規化的查詢參數（排序後的鍵值對），參數順序不同的相同查詢得到相同 ETag
+
+    Args:
+        request: 請求
+
+    Returns:
+        可放入 make_etag 的 tuple
+    """
+    return tuple(sorted(request.query_params.multi_items()))
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """
+    判斷請求的 If-None-Match 是否與 ETag 相符（弱比對）
+
+    Args:
+        request: 請求
+        etag: 目前的 ETag
+
+    Returns:
+        是否可回傳 304
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    """產生 304 Not Modified 回應"""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
@@ -0,0 +1,94 @@
+"""
+任務關聯資料展開（expand=from_port,to_port,agv）
+
+Task 的 from_port / to_port / agv_name 只存名稱，派車器執行任務前需要端口的 node / parameter
+與 AGV 的連線參數。展開時整頁任務引用的端口以一次查詢、AGV 以一次查詢取得
+（先查 AGV / EqpPort 快取，只查詢未命中的名稱），不會隨任務筆數增加查詢次數
+"""
+from typing import Any, Iterable
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .serialization import get_serializer
+from app.crud.aio import agv as crud_agv
+from app.crud.aio import eqp_port as crud_eqp_port
+from app.models import AGV, EqpPort, Task
+from app.schemas.agv import AGVResponse
+from app.schemas.eqp_port import EqpPortResponse
+from app.schemas.task import TaskResponse
+
+# 可展開的欄位 -> Task 上存放名稱的屬性
+TASK_EXPAND_FIELDS = {
+    "from_port": "from_port",
+    "to_port": "to_port",
+    "agv": "agv_name",
+}
+
+# 表示未指定端口 / AGV 的名稱，不查詢
+EMPTY_NAME = "na"
+
+
+def parse_expand(value: str | None) -> list[str]:
+    """
+    解析 expand 參數
+
+    Args:
+        value: 逗號分隔的欄位名稱，例如 "from_port,to_port,agv"
+
+    Returns:
+        要展開的欄位列表（去除重複）
+
+    Raises:
+        ValueError: 含有不支援的欄位
+    """
+    if not value:
+        return []
+    fields = list(dict.fromkeys(item.strip() for item in value.split(",") if item.strip()))
+    unknown = [field for field in fields if field not in TASK_EXPAND_FIELDS]
+    if unknown:
+        raise ValueError(
+            f"不支援展開的欄位: {', '.join(unknown)}（可用: {', '.join(TASK_EXPAND_FIELDS)}）"
+        )
+    return fields
+
+
+async def expand_tasks(session: AsyncSession, tasks: Iterable[Task], fields: list[str]) -> list[dict[str, Any]]:
+    """
+    任務轉為回應字典並加上展開的關聯資料
+
+    Args:
+        session: 非同步資料庫 Session
+        tasks: Task 物件（或欄位相同的資料列）
+        fields: 要展開的欄位（parse_expand 的結果）
+
+    Returns:
+        TaskResponse 欄位的字典列表，另含 expanded：{欄位: 端口 / AGV 資料或 None（名稱為 na 或不存在）}
+    """
+    tasks = list(tasks)
+    data = get_serializer(TaskResponse).to_dicts(tasks)
+
+    port_fields = [field for field in fields if field in ("from_port", "to_port")]
+    port_names = {
+        getattr(task, TASK_EXPAND_FIELDS[field]) for task in tasks for field in port_fields
+    } - {EMPTY_NAME}
+    agv_names = {task.agv_name for task in tasks} - {EMPTY_NAME} if "agv" in fields else set()
+
+    related: dict[str, dict[str, dict]] = {"port": {}, "agv": {}}
+    if port_names:
+        eqp_ports = await crud_eqp_port.get_eqp_ports_by_names(session, list(port_names), use_cache=True)
+        related["port"] = _by_name(eqp_ports, EqpPortResponse)
+    if agv_names:
+        agvs = await crud_agv.get_agvs_by_names(session, list(agv_names), use_cache=True)
+        related["agv"] = _by_name(agvs, AGVResponse)
+
+    for task, item in zip(tasks, data):
+        item["expanded"] = {
+            field: related["agv" if field == "agv" else "port"].get(getattr(task, TASK_EXPAND_FIELDS[field]))
+            for field in fields
+        }
+    return data
+
+
+def _by_name(rows: list[AGV] | list[EqpPort], schema) -> dict[str, dict]:
+    """資料列轉為 名稱 -> 回應字典"""
+    return {row.name: item for row, item in zip(rows, get_serializer(schema).to_dicts(rows))}
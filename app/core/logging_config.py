@@ -3,6 +3,7 @@
 - 自动轮转（每天一个文件或达到大小限制）
 - 保留最近 30 天的日志
 - 限制单个文件最大 10MB
+- 慢查询单独写入 slow_query.log
 """
 import logging
 from logging.handlers import RotatingFileHandler, TimedRotatingFileHandler
@@ -53,6 +54,16 @@ def setup_logging():
     app_handler.setFormatter(log_format)
     app_handler.setLevel(logging.INFO)
 
+    # 4. 慢查询日志（按大小轮转，阈值由 SQL_SLOW_QUERY_MS 设置）
+    slow_query_handler = RotatingFileHandler(
+        log_dir / "slow_query.log",
+        maxBytes=10 * 1024 * 1024,  # 10MB
+        backupCount=10,  # 保留 10 个备份
+        encoding='utf-8'
+    )
+    slow_query_handler.setFormatter(log_format)
+    slow_query_handler.setLevel(logging.WARNING)
+
     # 配置根日志器
     root_logger = logging.getLogger()
     root_logger.setLevel(logging.INFO)
@@ -71,6 +82,11 @@ def setup_logging():
     app_logger = logging.getLogger("app")
     app_logger.addHandler(app_handler)
 
+    # 配置慢查询日志（只写入 slow_query.log，不再传给 app / 根日志器）
+    slow_query_logger = logging.getLogger("app.sql.slow")
+    slow_query_logger.addHandler(slow_query_handler)
+    slow_query_logger.propagate = False
+
     return root_logger
 
 
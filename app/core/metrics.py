@@ -0,0 +1,205 @@
+"""
+請求延遲與吞吐量指標（Prometheus 文字格式，GET /metrics）
+
+- MetricsMiddleware 為純 ASGI 中間件：記錄各路由（路由樣板，例如 /api/v1/task/{task_id}）
+  的請求數、狀態碼、延遲直方圖與進行中的請求數，不經過 BaseHTTPMiddleware 的額外包裝
+- 每個請求以 sql_stats.begin_request() 建立 SQL 統計物件（contextvar），資料庫游標事件
+  把語句數與耗時累加到該物件，請求結束時併入所屬路由的統計並檢查 N+1
+- 統計只在事件迴圈執行緒中更新（資料庫事件除外，只寫入各請求自己的物件），不需要鎖；
+  直方圖以固定區間的計數陣列保存，輸出時才累加
+- 另輸出 anyio 執行緒池（同步路由）與資料庫連線池的即時狀態
+"""
+import time
+from bisect import bisect_left
+
+from anyio import to_thread
+
+from .database import get_pool_status
+from .sql_stats import RequestSqlContext, begin_request, end_request
+
+# 延遲直方圖的區間上限（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 未對應到路由的請求（404 等）合併為同一標籤，避免任意路徑造成大量時間序列
+UNMATCHED_ROUTE = "<unmatched>"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class RouteStats:
+    """單一路由（方法 + 路由樣板）的累計統計"""
+
+    __slots__ = ("statuses", "buckets", "latency_sum", "count", "db_statements", "db_seconds")
+
+    def __init__(self):
+        self.statuses: dict[int, int] = {}
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.count = 0
+        self.db_statements = 0
+        self.db_seconds = 0.0
+
+    def observe(self, status_code: int, elapsed: float, db: RequestSqlContext):
+        self.statuses[status_code] = self.statuses.get(status_code, 0) + 1
+        self.buckets[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+        self.latency_sum += elapsed
+        self.count += 1
+        self.db_statements += db.statements
+        self.db_seconds += db.seconds
+
+
+class MetricsRegistry:
+    """行程內的指標彙整"""
+
+    def __init__(self):
+        self.routes: dict[tuple[str, str], RouteStats] = {}
+        self.in_flight: dict[str, int] = {}
+        self.started_at = time.time()
+
+    def request_started(self, method: str):
+        self.in_flight[method] = self.in_flight.get(method, 0) + 1
+
+    def request_finished(self, method: str, route: str, status_code: int, elapsed: float, db: RequestSqlContext):
+        self.in_flight[method] -= 1
+        stats = self.routes.get((method, route))
+        if stats is None:
+            stats = self.routes[(method, route)] = RouteStats()
+        stats.observe(status_code, elapsed, db)
+
+    def render(self) -> str:
+        """
+        輸出 Prometheus 文字格式
+
+        Returns:
+            指標文字（需在事件迴圈中呼叫，以讀取執行緒池狀態）
+        """
+        lines: list[str] = []
+
+        def header(name: str, kind: str, doc: str):
+            lines.append(f"# HELP {name} {doc}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        routes = sorted(self.routes.items())
+
+        header("agvc_http_requests_total", "counter", "HTTP requests by route and status code")
+        for (method, route), stats in routes:
+            for status_code, count in sorted(stats.statuses.items()):
+                lines.append(
+                    f'agvc_http_requests_total{{method="{method}",route="{_escape(route)}",status="{status_code}"}} {count}'
+                )
+
+        header("agvc_http_request_duration_seconds", "histogram", "HTTP request latency by route")
+        for (method, route), stats in routes:
+            labels = f'method="{method}",route="{_escape(route)}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                cumulative += count
+                lines.append(f'agvc_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'agvc_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.count}')
+            lines.append(f"agvc_http_request_duration_seconds_sum{{{labels}}} {stats.latency_sum:.6f}")
+            lines.append(f"agvc_http_request_duration_seconds_count{{{labels}}} {stats.count}")
+
+        header("agvc_http_db_statements_total", "counter", "Database statements executed while handling requests")
+        for (method, route), stats in routes:
+            lines.append(
+                f'agvc_http_db_statements_total{{method="{method}",route="{_escape(route)}"}} {stats.db_statements}'
+            )
+
+        header("agvc_http_db_seconds_total", "counter", "Database statement time spent while handling requests")
+        for (method, route), stats in routes:
+            lines.append(
+                f'agvc_http_db_seconds_total{{method="{method}",route="{_escape(route)}"}} {stats.db_seconds:.6f}'
+            )
+
+        header("agvc_http_requests_in_flight", "gauge", "HTTP requests currently being handled")
+        for method, count in sorted(self.in_flight.items()):
+            lines.append(f'agvc_http_requests_in_flight{{method="{method}"}} {count}')
+
+        # 同步路由（def）在 anyio 預設執行緒池中執行，waiting 持續大於 0 代表執行緒不足
+        limiter = to_thread.current_default_thread_limiter()
+        threadpool = limiter.statistics()
+        header("agvc_threadpool_size", "gauge", "Threadpool capacity for sync routes")
+        lines.append(f"agvc_threadpool_size {limiter.total_tokens}")
+        header("agvc_threadpool_busy", "gauge", "Threadpool workers in use")
+        lines.append(f"agvc_threadpool_busy {threadpool.borrowed_tokens}")
+        header("agvc_threadpool_queue_depth", "gauge", "Tasks waiting for a threadpool worker")
+        lines.append(f"agvc_threadpool_queue_depth {threadpool.tasks_waiting}")
+
+        pool = get_pool_status()
+        header("agvc_db_pool_checked_out", "gauge", "Database connections in use")
+        lines.append(f"agvc_db_pool_checked_out {pool['checked_out']}")
+        header("agvc_db_pool_idle", "gauge", "Idle database connections")
+        lines.append(f"agvc_db_pool_idle {pool['idle']}")
+        header("agvc_db_pool_timeouts_total", "counter", "Connection checkouts that timed out")
+        lines.append(f"agvc_db_pool_timeouts_total {pool['timeouts']}")
+        header("agvc_db_pool_wait_seconds_total", "counter", "Time spent waiting for a database connection")
+        lines.append(f"agvc_db_pool_wait_seconds_total {pool['wait_ms_total'] / 1000:.6f}")
+
+        header("agvc_process_start_time_seconds", "gauge", "Process start time (unix seconds)")
+        lines.append(f"agvc_process_start_time_seconds {self.started_at:.3f}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _route_label(scope) -> str:
+    """
+    路由標籤：匹配到的路由樣板加上 include_router 的前綴，例如 /api/v1/task/12 -> /api/v1/task/{task_id}
+
+    路由物件的 path_format 不含前綴，前綴由實際路徑去掉路由本身對應的部分取得；
+    不以參數值回推樣板，避免參數值與固定路徑段相同時（例如名稱為 agv）標籤錯誤
+    """
+    route = scope.get("route")
+    if route is None:
+        return UNMATCHED_ROUTE
+    path_format = getattr(route, "path_format", None)
+    if path_format is None:
+        return scope["path"]
+
+    concrete = path_format
+    convertors = getattr(route, "param_convertors", {})
+    for name, value in (scope.get("path_params") or {}).items():
+        convertor = convertors.get(name)
+        concrete = concrete.replace(f"{{{name}}}", convertor.to_string(value) if convertor else str(value))
+    path = scope["path"]
+    if not path.endswith(concrete):
+        return path_format
+    return path[:len(path) - len(concrete)] + path_format
+
+
+class MetricsMiddleware:
+    """純 ASGI 指標中間件（只處理 HTTP，WebSocket 直接通過）"""
+
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        db, token = begin_request(f"{method} {scope['path']}")
+        self.registry.request_started(method)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            end_request(db, token)
+            self.registry.request_finished(method, _route_label(scope), status_code, elapsed, db)
+
+
+# 全域指標
+metrics_registry = MetricsRegistry()
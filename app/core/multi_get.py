@@ -0,0 +1,54 @@
+"""
+依 ID / 名稱列表一次查詢多筆資料（multi-get）
+
+GET 以逗號分隔的查詢參數（?ids=1,2,3）、POST 以請求本體（長列表）傳入；
+結果依請求順序排列，每個鍵值都有一筆結果，找不到時 found 為 False
+"""
+from typing import Any, Callable, Iterable, Sequence
+
+
+def parse_keys(value: str, key_type: type, max_size: int) -> list:
+    """
+    解析逗號分隔的鍵值列表
+
+    Args:
+        value: 查詢參數，例如 "1,2,3"
+        key_type: 鍵值型別（int 或 str）
+        max_size: 鍵值數量上限
+
+    Returns:
+        鍵值列表（略過空白項目）
+
+    Raises:
+        ValueError: 鍵值無法轉換為指定型別，或數量為 0 / 超過上限
+    """
+    try:
+        keys = [key_type(item.strip()) for item in value.split(",") if item.strip()]
+    except ValueError as e:
+        raise ValueError("無效的鍵值列表") from e
+    if not keys or len(keys) > max_size:
+        raise ValueError(f"請提供 1 到 {max_size} 個項目")
+    return keys
+
+
+def match_keys(
+    keys: Sequence[Any],
+    rows: Iterable[Any],
+    key: Callable[[Any], Any],
+    to_data: Callable[[list], list[dict]],
+) -> list[dict]:
+    """
+    依請求順序排列查詢結果
+
+    Args:
+        keys: 請求的鍵值（可重複，重複時各自回傳一筆）
+        rows: 查詢結果（順序不拘）
+        key: 由資料列取得鍵值的函式
+        to_data: 資料列轉為回應字典的函式（例如 RowSerializer.to_dicts）
+
+    Returns:
+        [{"key": 鍵值, "found": 是否存在, "data": 資料或 None}] 列表
+    """
+    rows = list(rows)
+    by_key = dict(zip((key(row) for row in rows), to_data(rows)))
+    return [{"key": k, "found": k in by_key, "data": by_key.get(k)} for k in keys]
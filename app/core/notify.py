@@ -0,0 +1,97 @@
+"""
+PostgreSQL LISTEN/NOTIFY 監聽
+
+每個 worker 只維持一條 asyncpg 監聽連線，收到通知後分派給行程內註冊的回呼；
+連線中斷時自動重連，並呼叫重連回呼（斷線期間的通知會遺失，需由使用端自行補償）
+"""
+import asyncio
+import logging
+from typing import Callable
+
+import asyncpg
+
+from .config import settings
+
+logger = logging.getLogger("app")
+
+# AGV / EqpPort 資料表變更通知頻道（由 scripts/db_init.py 建立的觸發器發送）
+CHANGE_CHANNEL = "agvc_change"
+# 任務變更事件通知頻道（內容為空字串，同一交易內的多筆變更只會送出一次通知）
+TASK_EVENT_CHANNEL = "agvc_task_event"
+
+
+class PgListener:
+    """共用的 LISTEN 連線"""
+
+    def __init__(self, dsn: str, retry_interval: float = 5.0, keepalive_interval: float = 30.0):
+        self._dsn = dsn
+        self._retry_interval = retry_interval
+        self._keepalive_interval = keepalive_interval
+        self._callbacks: dict[str, list[Callable[[str], None]]] = {}
+        self._reconnect_callbacks: list[Callable[[], None]] = []
+        self._task: asyncio.Task | None = None
+
+    def add_listener(self, channel: str, callback: Callable[[str], None]):
+        """
+        註冊頻道回呼（需在 start() 前呼叫）
+
+        Args:
+            channel: 頻道名稱
+            callback: 回呼函式，參數為通知內容；在事件迴圈中同步執行，不可阻塞
+        """
+        self._callbacks.setdefault(channel, []).append(callback)
+
+    def add_reconnect_callback(self, callback: Callable[[], None]):
+        """註冊（重新）連線成功後的回呼"""
+        self._reconnect_callbacks.append(callback)
+
+    async def start(self):
+        """啟動背景監聽工作"""
+        if self._task is None and self._callbacks:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止背景監聽工作"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _dispatch(self, connection, pid: int, channel: str, payload: str):
+        for callback in self._callbacks.get(channel, []):
+            try:
+                callback(payload)
+            except Exception:
+                logger.exception(f"[LISTEN] 處理 {channel} 通知時發生錯誤")
+
+    async def _run(self):
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self._dsn)
+                for channel in self._callbacks:
+                    await connection.add_listener(channel, self._dispatch)
+                logger.info(f"[LISTEN] 已監聽頻道: {', '.join(self._callbacks)}")
+
+                for callback in self._reconnect_callbacks:
+                    callback()
+
+                # 定期送出查詢，及早發現被中斷的閒置連線
+                while not connection.is_closed():
+                    await asyncio.sleep(self._keepalive_interval)
+                    await connection.execute("SELECT 1")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[LISTEN] 監聽連線中斷，{self._retry_interval} 秒後重試: {e}")
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(self._retry_interval)
+
+
+# 全域監聽實例
+pg_listener = PgListener(settings.DATABASE_URL)
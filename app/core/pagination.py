@@ -0,0 +1,79 @@
+"""
+Keyset（游標）分頁工具
+
+游標為排序鍵值的 JSON 陣列經 base64url 編碼後的字串，對客戶端而言不透明；
+下一頁的游標透過回應標頭 X-Next-Cursor 回傳，回應本體維持原本的列表格式
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Sequence
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    將排序鍵值編碼為游標
+
+    Args:
+        values: 排序鍵值（支援 int、str、datetime）
+
+    Returns:
+        游標字串
+    """
+    data = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> tuple:
+    """
+    解碼游標並轉換為排序鍵值
+
+    Args:
+        cursor: 游標字串
+        types: 各鍵值的型別（int、str、datetime）
+
+    Returns:
+        排序鍵值 tuple
+
+    Raises:
+        ValueError: 游標格式錯誤
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError("無效的游標") from e
+
+    if not isinstance(data, list) or len(data) != len(types):
+        raise ValueError("無效的游標")
+
+    values = []
+    for value, value_type in zip(data, types):
+        try:
+            values.append(datetime.fromisoformat(value) if value_type is datetime else value_type(value))
+        except (ValueError, TypeError) as e:
+            raise ValueError("無效的游標") from e
+    return tuple(values)
+
+
+def split_page(rows: list, limit: int, key: Callable[[Any], Sequence[Any]]) -> tuple[list, str | None]:
+    """
+    由多查詢一筆（limit + 1）的結果切出本頁資料與下一頁游標
+
+    Args:
+        rows: 查詢結果（最多 limit + 1 筆）
+        limit: 每頁筆數
+        key: 由資料列取得排序鍵值的函式
+
+    Returns:
+        (本頁資料, 下一頁游標或 None)
+    """
+    if limit <= 0:
+        return [], None
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(key(rows[-1]))
@@ -0,0 +1,55 @@
+"""
+parameter 欄位篩選（param.<key>=<value>）
+
+列表路由的查詢參數中以 param. 開頭的項目組成一個 JSON 物件，交給 CRUD 以
+parameter @> :value 查詢（JSONB 包含查詢，使用 GIN 索引）：
+- ?param.ip=10.0.0.1&param.port=502  ->  {"ip": "10.0.0.1", "port": 502}
+- ?param.slot.side=L                 ->  {"slot": {"side": "L"}}
+- 值可解析為 JSON 時（數字、true / false、null、帶引號的字串）依 JSON 型別比對，否則視為字串；
+  數字格式的字串值以引號表示，例如 param.lot="001"
+"""
+import json
+from typing import Any, Optional
+
+from starlette.datastructures import QueryParams
+
+PARAM_PREFIX = "param."
+
+
+def parse_param_filters(query_params: QueryParams) -> Optional[dict[str, Any]]:
+    """
+    由查詢參數取得 parameter 篩選條件
+
+    Args:
+        query_params: 請求的查詢參數
+
+    Returns:
+        要包含的 JSON 物件；沒有 param.* 參數時回傳 None
+
+    Raises:
+        ValueError: 鍵名為空或同一路徑同時指定了值與子鍵
+    """
+    filters: dict[str, Any] = {}
+    for name, raw in query_params.multi_items():
+        if not name.startswith(PARAM_PREFIX):
+            continue
+        path = name[len(PARAM_PREFIX):].split(".")
+        if not all(path):
+            raise ValueError(f"無效的參數篩選: {name}")
+
+        node = filters
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+            if not isinstance(node, dict):
+                raise ValueError(f"參數篩選衝突: {name}")
+        if isinstance(node.get(path[-1]), dict):
+            raise ValueError(f"參數篩選衝突: {name}")
+        node[path[-1]] = _parse_value(raw)
+    return filters or None
+
+
+def _parse_value(raw: str) -> Any:
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return raw
@@ -0,0 +1,169 @@
+"""
+列表回應的快速序列化
+
+FastAPI 對 response_model 會把每個資料列重新驗證一次再轉為 JSON，大量資料列時
+CPU 時間主要耗在這裡。這裡直接依回應模型（TaskResponse、AGVResponse 等）的欄位順序
+讀取資料列屬性，一次序列化為 JSON bytes，不經過驗證：
+- 已安裝 orjson 時使用 orjson
+- 否則使用預先建立的 pydantic TypeAdapter（pydantic-core 序列化）
+
+同樣的欄位順序也用於 NDJSON / CSV 匯出；回應中含有額外欄位（例如任務的 expanded）時
+以 json_response 直接輸出
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from operator import attrgetter, itemgetter
+from typing import Any, Iterable, Mapping
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+from .config import settings
+
+try:
+    import orjson
+except ImportError:  # 選用套件
+    orjson = None
+
+
+class RowSerializer:
+    """依回應模型欄位順序序列化資料列（只讀取屬性，不做驗證）"""
+
+    def __init__(self, schema: type[BaseModel]):
+        self.schema = schema
+        self.fields = tuple(schema.model_fields)
+        self._getter = attrgetter(*self.fields)
+        self._item_getter = itemgetter(*self.fields)
+        self._adapter = TypeAdapter(list[dict[str, Any]])
+        self._row_adapter = TypeAdapter(dict[str, Any])
+
+    def to_dicts(self, rows: Iterable[Any]) -> list[dict[str, Any]]:
+        """資料列轉為依欄位順序排列的字典"""
+        fields, getter, item_getter = self.fields, self._getter, self._item_getter
+        result = []
+        for row in rows:
+            try:
+                # 已載入的 ORM 資料列欄位值都在 __dict__ 中，略過 instrumented 屬性的開銷
+                values = item_getter(row.__dict__)
+            except (AttributeError, KeyError):
+                # 未載入（expired / deferred）的欄位或非 ORM 物件，改用屬性存取
+                values = getter(row)
+            result.append(dict(zip(fields, values)))
+        return result
+
+    def dumps(self, rows: Iterable[Any]) -> bytes:
+        """
+        資料列序列化為 JSON 陣列
+
+        Args:
+            rows: 具有回應模型欄位屬性的物件（SQLModel 資料列等）
+
+        Returns:
+            JSON bytes
+        """
+        data = self.to_dicts(rows)
+        if orjson is not None:
+            return orjson.dumps(data)
+        return self._adapter.dump_json(data)
+
+    def dumps_lines(self, rows: Iterable[Any]) -> bytes:
+        """
+        資料列序列化為 NDJSON（每列一個 JSON 物件，以換行結尾）
+
+        Args:
+            rows: 具有回應模型欄位屬性的物件
+
+        Returns:
+            JSON bytes
+        """
+        dumps = orjson.dumps if orjson is not None else self._row_adapter.dump_json
+        return b"".join(dumps(data) + b"\n" for data in self.to_dicts(rows))
+
+    def dumps_csv(self, rows: Iterable[Any], header: bool = False) -> str:
+        """
+        資料列序列化為 CSV
+
+        Args:
+            rows: 具有回應模型欄位屬性的物件
+            header: 是否在最前面加上欄位名稱列
+
+        Returns:
+            CSV 字串（巢狀的 JSON 欄位以 JSON 字串輸出）
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if header:
+            writer.writerow(self.fields)
+        for data in self.to_dicts(rows):
+            writer.writerow([_csv_value(value) for value in data.values()])
+        return buffer.getvalue()
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    return value
+
+
+_serializers: dict[type[BaseModel], RowSerializer] = {}
+_any_adapter = TypeAdapter(Any)
+
+
+def get_serializer(schema: type[BaseModel]) -> RowSerializer:
+    """取得（並快取）回應模型的序列化器"""
+    serializer = _serializers.get(schema)
+    if serializer is None:
+        serializer = _serializers[schema] = RowSerializer(schema)
+    return serializer
+
+
+def rows_response(
+    rows: Iterable[Any],
+    schema: type[BaseModel],
+    headers: Mapping[str, str] | None = None,
+) -> Any:
+    """
+    列表路由的回應：FAST_SERIALIZATION 開啟時直接回傳序列化後的 Response
+
+    直接回傳 Response 時 FastAPI 不會套用注入的 response 標頭，需由 headers 帶入
+
+    Args:
+        rows: 資料列
+        schema: 決定欄位與順序的回應模型
+        headers: 要附加的回應標頭（例如 X-Next-Cursor、ETag）
+
+    Returns:
+        Response；FAST_SERIALIZATION 關閉時原樣回傳 rows，交由 response_model 處理
+    """
+    if not settings.FAST_SERIALIZATION:
+        return rows
+    return Response(
+        content=get_serializer(schema).dumps(rows),
+        media_type="application/json",
+        headers=dict(headers) if headers else None,
+    )
+
+
+def json_response(data: Any, headers: Mapping[str, str] | None = None) -> Response:
+    """
+    已組好的字典 / 列表直接序列化為 JSON Response（不經過 response_model）
+
+    Args:
+        data: 可序列化為 JSON 的資料（通常為 RowSerializer.to_dicts 的結果再加上額外欄位）
+        headers: 要附加的回應標頭
+
+    Returns:
+        Response
+    """
+    content = orjson.dumps(data) if orjson is not None else _any_adapter.dump_json(data)
+    return Response(
+        content=content,
+        media_type="application/json",
+        headers=dict(headers) if headers else None,
+    )
@@ -0,0 +1,234 @@
+"""
+SQL 語句統計
+
+- before/after_cursor_execute 事件記錄每個語句的正規化文字（參數、數字、字串字面值換成 ?，
+  IN 列表與多列 VALUES 合併）、耗時與回傳筆數，依語句形狀累計（GET /admin/sql/top）
+- 超過 SQL_SLOW_QUERY_MS 的語句寫入慢查詢日誌（logs/slow_query.log）
+- 每個請求以 contextvar 帶一個 RequestSqlContext（由 MetricsMiddleware 建立），
+  累計語句數、耗時與各語句形狀的次數；同一形狀超過 SQL_REPEAT_THRESHOLD 次時記錄 N+1 警告
+- 串流回應（SSE、匯出）在整個連線期間分批重複同一查詢，路由以 skip_repeat_check() 排除 N+1 檢查
+"""
+import logging
+import re
+import threading
+import time
+from contextvars import ContextVar, Token
+from functools import lru_cache
+from typing import Optional
+
+from sqlalchemy import event
+
+from .config import settings
+
+logger = logging.getLogger("app")
+slow_query_logger = logging.getLogger("app.sql.slow")
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\$\d+|:\w+|\?")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_REPEATED_TUPLES = re.compile(r"(\(\?(?:, \?)*\))(?:, \1)+")
+
+
+@lru_cache(maxsize=4096)
+def normalize_statement(statement: str) -> str:
+    """
+    正規化 SQL 語句（同一形狀的語句得到相同文字）
+
+    Args:
+        statement: 送往資料庫的 SQL
+
+    Returns:
+        正規化後的 SQL
+    """
+    text = _WHITESPACE.sub(" ", statement).strip()
+    text = _STRING_LITERAL.sub("?", text)
+    text = _PLACEHOLDER.sub("?", text)
+    text = _NUMBER.sub("?", text)
+    text = _PLACEHOLDER_LIST.sub("(?)", text)
+    return _REPEATED_TUPLES.sub(r"\1", text)
+
+
+class RequestSqlContext:
+    """單一請求的 SQL 統計"""
+
+    __slots__ = ("label", "statements", "seconds", "shapes", "check_repeats")
+
+    def __init__(self, label: str):
+        self.label = label
+        self.statements = 0
+        self.seconds = 0.0
+        # 語句形狀 -> 次數
+        self.shapes: dict[str, int] = {}
+        # 結束時是否檢查 N+1
+        self.check_repeats = True
+
+
+_current_request: ContextVar[Optional[RequestSqlContext]] = ContextVar("agvc_request_sql", default=None)
+
+
+def begin_request(label: str) -> tuple[RequestSqlContext, Token]:
+    """
+    開始統計一個請求的 SQL
+
+    Args:
+        label: 記錄用的請求描述，例如 "GET /api/v1/task/12"
+
+    Returns:
+        (請求統計, contextvar token)，結束時傳給 end_request()
+    """
+    context = RequestSqlContext(label)
+    return context, _current_request.set(context)
+
+
+def skip_repeat_check():
+    """
+    目前的請求不做 N+1 檢查（語句數與耗時仍會累計）
+
+    串流回應的產生器在回應送完前都屬於同一個請求，分批讀取或補送事件時
+    同一語句本來就會執行很多次，不代表 N+1
+    """
+    context = _current_request.get()
+    if context is not None:
+        context.check_repeats = False
+
+
+def end_request(context: RequestSqlContext, token: Token):
+    """
+    結束請求的 SQL 統計，同一語句形狀執行次數超過 SQL_REPEAT_THRESHOLD 時記錄 N+1 警告
+
+    Args:
+        context: begin_request() 回傳的請求統計
+        token: begin_request() 回傳的 token
+    """
+    _current_request.reset(token)
+    threshold = settings.SQL_REPEAT_THRESHOLD
+    if threshold <= 0 or not context.check_repeats:
+        return
+    for shape, count in context.shapes.items():
+        if count > threshold:
+            logger.warning(f"[N+1] {context.label} 同一語句執行 {count} 次: {shape}")
+
+
+class StatementStats:
+    """單一語句形狀的累計統計"""
+
+    __slots__ = ("calls", "total_seconds", "max_seconds", "rows")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+
+
+class SqlStatsRegistry:
+    """行程內各語句形狀的累計統計"""
+
+    def __init__(self, max_statements: int):
+        self.max_statements = max_statements
+        self.started_at = time.time()
+        self.dropped = 0
+        # 同步引擎的事件在執行緒池中觸發，需要鎖
+        self._lock = threading.Lock()
+        self._statements: dict[str, StatementStats] = {}
+
+    def record(self, shape: str, elapsed: float, rows: int):
+        """記錄一次執行"""
+        with self._lock:
+            stats = self._statements.get(shape)
+            if stats is None:
+                if len(self._statements) >= self.max_statements:
+                    # 形狀數量達上限（通常是未參數化的動態 SQL），不再新增
+                    self.dropped += 1
+                    return
+                stats = self._statements[shape] = StatementStats()
+            stats.calls += 1
+            stats.total_seconds += elapsed
+            if elapsed > stats.max_seconds:
+                stats.max_seconds = elapsed
+            if rows > 0:
+                stats.rows += rows
+
+    def top(self, k: int = 20, order_by: str = "total") -> list[dict]:
+        """
+        取得前 k 個語句形狀
+
+        Args:
+            k: 筆數
+            order_by: 排序依據：total（總耗時）、mean（平均耗時）、max（最大耗時）、calls（次數）
+
+        Returns:
+            統計字典列表（時間單位為毫秒）
+        """
+        sort_keys = {
+            "total": lambda stats: stats.total_seconds,
+            "mean": lambda stats: stats.total_seconds / stats.calls,
+            "max": lambda stats: stats.max_seconds,
+            "calls": lambda stats: stats.calls,
+        }
+        sort_key = sort_keys[order_by]
+        with self._lock:
+            items = sorted(self._statements.items(), key=lambda item: sort_key(item[1]), reverse=True)[:k]
+            return [
+                {
+                    "statement": shape,
+                    "calls": stats.calls,
+                    "total_ms": round(stats.total_seconds * 1000, 3),
+                    "mean_ms": round(stats.total_seconds * 1000 / stats.calls, 3),
+                    "max_ms": round(stats.max_seconds * 1000, 3),
+                    "rows": stats.rows,
+                }
+                for shape, stats in items
+            ]
+
+    def reset(self):
+        """清除統計"""
+        with self._lock:
+            self._statements.clear()
+            self.dropped = 0
+            self.started_at = time.time()
+
+
+def install_sql_hooks(sync_engine):
+    """
+    在引擎上註冊游標事件
+
+    Args:
+        sync_engine: 同步引擎（非同步引擎請傳入 async_engine.sync_engine）
+    """
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("agvc_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["agvc_query_start"].pop()
+        shape = normalize_statement(statement)
+        rows = cursor.rowcount if cursor is not None else -1
+        sql_stats.record(shape, elapsed, rows)
+
+        request = _current_request.get()
+        if request is not None:
+            request.statements += 1
+            request.seconds += elapsed
+            request.shapes[shape] = request.shapes.get(shape, 0) + 1
+
+        if elapsed * 1000 >= settings.SQL_SLOW_QUERY_MS:
+            source = request.label if request is not None else "-"
+            slow_query_logger.warning(f"{elapsed * 1000:.1f} ms rows={rows} [{source}] {shape}")
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        # 執行失敗時不會觸發 after_cursor_execute，移除對應的開始時間
+        # （ExceptionContext.cursor 在部分情況下未設定，讀取會拋出 AttributeError 並取代原本的例外）
+        conn = exception_context.connection
+        starts = conn.info.get("agvc_query_start") if conn is not None else None
+        if starts:
+            starts.pop()
+
+
+# 全域語句統計
+sql_stats = SqlStatsRegistry(max_statements=settings.SQL_STATS_MAX_STATEMENTS)
@@ -0,0 +1,415 @@
+"""
+AGV / EqpPort 狀態訂閱（WebSocket）
+
+- 用戶端依 AGV 名稱或設備名稱（eqp_name）訂閱，資料列或其 parameter 變更時推送差異
+- 每個 worker 只有一個背景工作處理共用監聽連線的變更通知（CHANGE_CHANNEL）：
+  每批通知以單一查詢讀取變更的資料列，與上一次的快照比對後產生 JSON Merge Patch
+  （RFC 7396），再分派給訂閱該資料列的連線
+- 每個連線的送出佇列以資料列為鍵合併：消費太慢時同一資料列只保留合併後的一則訊息；
+  佇列已滿時新資料列的訊息先丟棄，待佇列清空後改送該資料列的最新快照（已刪除或不再符合
+  訂閱時改送刪除）；控制訊息無法補送，佇列已滿時直接關閉連線
+"""
+import asyncio
+import itertools
+import json
+import logging
+from collections import OrderedDict
+from typing import Any, Optional
+
+from fastapi import WebSocket, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .config import settings
+from .database import async_engine
+from app.crud.aio import agv as crud_agv
+from app.crud.aio import eqp_port as crud_eqp_port
+
+logger = logging.getLogger("app")
+
+AGV_TABLE = "agv"
+EQP_PORT_TABLE = "eqp_port"
+
+# (資料表, id)
+RowKey = tuple[str, int]
+
+
+def make_merge_patch(old: Any, new: Any) -> Any:
+    """
+    產生由 old 變為 new 的 JSON Merge Patch
+
+    Args:
+        old: 原始值
+        new: 新值
+
+    Returns:
+        Merge Patch；物件沒有差異時為空字典（刪除的鍵以 None 表示）
+    """
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return new
+    patch = {}
+    for key, value in new.items():
+        if key not in old:
+            patch[key] = value
+        elif old[key] != value:
+            patch[key] = make_merge_patch(old[key], value) if isinstance(value, dict) else value
+    for key in old.keys() - new.keys():
+        patch[key] = None
+    return patch
+
+
+def apply_merge_patch(target: Any, patch: Any) -> Any:
+    """將 JSON Merge Patch 套用到 target（不修改原物件）"""
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = apply_merge_patch(result.get(key), value)
+    return result
+
+
+def merge_patches(first: dict, second: dict) -> dict:
+    """合併兩個連續的 Merge Patch（效果等同先套用 first 再套用 second）"""
+    result = dict(first)
+    for key, value in second.items():
+        if isinstance(value, dict) and isinstance(result.get(key), dict):
+            result[key] = merge_patches(result[key], value)
+        else:
+            result[key] = value
+    return result
+
+
+def _row_message(table: str, op: str, row: dict[str, Any]) -> dict[str, Any]:
+    message = {"type": table, "op": op, "id": row["id"], "name": row["name"]}
+    if table == EQP_PORT_TABLE:
+        message["eqp_name"] = row["eqp_name"]
+    return message
+
+
+class StateConnection:
+    """單一 WebSocket 連線的訂閱與送出佇列"""
+
+    def __init__(self, websocket: WebSocket, maxsize: int):
+        self.websocket = websocket
+        self.maxsize = maxsize
+        self.agv_names: set[str] = set()
+        self.eqp_names: set[str] = set()
+        # 以資料列為鍵的待送訊息（同一資料列的訊息會合併）
+        self._pending: OrderedDict[RowKey, dict[str, Any]] = OrderedDict()
+        # 佇列滿時被丟棄、之後需補送的資料列 -> 待補送的刪除訊息（None 表示補送最新快照）
+        self._stale: OrderedDict[RowKey, Optional[dict[str, Any]]] = OrderedDict()
+        self._control_seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self.dropped = 0
+        # 控制訊息因佇列已滿而無法放入，送出迴圈會關閉連線
+        self.overflowed = False
+
+    def is_subscribed(self, key: RowKey, message: dict[str, Any]) -> bool:
+        """資料列訊息是否符合目前的訂閱"""
+        if key[0] == AGV_TABLE:
+            return message["name"] in self.agv_names
+        return message["eqp_name"] in self.eqp_names
+
+    def push(self, key: RowKey, message: dict[str, Any]):
+        """
+        放入送出佇列
+
+        Args:
+            key: (資料表, id)
+            message: snapshot / update / delete 訊息
+        """
+        pending = self._pending.get(key)
+        if pending is None:
+            # 已在補送清單中的資料列繼續等待補送，避免差異早於快照送出
+            if key in self._stale or len(self._pending) >= self.maxsize:
+                # 刪除無法由快照重建，保留刪除訊息；其餘訊息改為補送最新快照
+                self._stale[key] = message if message["op"] == "delete" else None
+                self._stale.move_to_end(key)
+                self.dropped += 1
+                self._wakeup.set()
+                return
+            self._pending[key] = message
+        elif message["op"] == "update" and pending["op"] == "snapshot":
+            pending["data"] = apply_merge_patch(pending["data"], message["patch"])
+            pending["name"] = message["name"]
+        elif message["op"] == "update" and pending["op"] == "update":
+            pending["patch"] = merge_patches(pending["patch"], message["patch"])
+            pending["name"] = message["name"]
+        else:
+            # snapshot / delete 取代先前的訊息
+            self._pending[key] = message
+        self._wakeup.set()
+
+    def push_control(self, message: dict[str, Any]):
+        """放入控制訊息（subscribed / error，不合併）；佇列已滿時標記連線溢位"""
+        if len(self._pending) >= self.maxsize:
+            self.overflowed = True
+        else:
+            self._pending[("", next(self._control_seq))] = message
+        self._wakeup.set()
+
+    async def send_loop(self, hub: "StateHub"):
+        """送出佇列中的訊息，直到連線關閉（控制訊息溢位時主動關閉）"""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if self.overflowed:
+                await self.websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+                return
+            while self._pending or self._stale:
+                if self._pending:
+                    _, message = self._pending.popitem(last=False)
+                else:
+                    key, message = self._stale.popitem(last=False)
+                    if message is None:
+                        message = hub.snapshot_message(key)
+                        # 已刪除或不再符合訂閱時會另有刪除訊息；取消訂閱的資料列不補送
+                        if message is None or not self.is_subscribed(key, message):
+                            continue
+                await self.websocket.send_text(
+                    json.dumps(message, ensure_ascii=False, separators=(",", ":"))
+                )
+
+
+class StateHub:
+    """行程內的 AGV / EqpPort 狀態分派器"""
+
+    def __init__(self, queue_size: int):
+        self._queue_size = queue_size
+        self._connections: set[StateConnection] = set()
+        # 名稱 -> 訂閱的連線
+        self._agv_subscribers: dict[str, set[StateConnection]] = {}
+        self._eqp_subscribers: dict[str, set[StateConnection]] = {}
+        # 有訂閱者的資料列最新快照（model_dump(mode="json")）
+        self._snapshots: dict[RowKey, dict[str, Any]] = {}
+
+        # 等待背景工作處理的變更
+        self._changed: set[RowKey] = set()
+        self._load_agv_names: set[str] = set()
+        self._load_eqp_names: set[str] = set()
+        self._awaiting_snapshot: dict[StateConnection, tuple[set[str], set[str]]] = {}
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def connection_count(self) -> int:
+        return len(self._connections)
+
+    def connect(self, websocket: WebSocket) -> StateConnection:
+        """建立連線的訂閱物件"""
+        connection = StateConnection(websocket, self._queue_size)
+        self._connections.add(connection)
+        return connection
+
+    def disconnect(self, connection: StateConnection):
+        """移除連線與其所有訂閱"""
+        self.unsubscribe(connection, list(connection.agv_names), list(connection.eqp_names))
+        self._awaiting_snapshot.pop(connection, None)
+        self._connections.discard(connection)
+
+    def subscribe(self, connection: StateConnection, agv_names: list[str], eqp_names: list[str]):
+        """
+        新增訂閱；背景工作讀取資料後會先送出各資料列的完整快照
+
+        Args:
+            connection: 連線
+            agv_names: AGV 名稱列表
+            eqp_names: 設備名稱列表
+        """
+        agv_names = set(agv_names) - connection.agv_names
+        eqp_names = set(eqp_names) - connection.eqp_names
+        for name in agv_names:
+            self._agv_subscribers.setdefault(name, set()).add(connection)
+        for name in eqp_names:
+            self._eqp_subscribers.setdefault(name, set()).add(connection)
+        connection.agv_names |= agv_names
+        connection.eqp_names |= eqp_names
+
+        awaiting_agv, awaiting_eqp = self._awaiting_snapshot.setdefault(connection, (set(), set()))
+        awaiting_agv |= agv_names
+        awaiting_eqp |= eqp_names
+        self._load_agv_names |= agv_names
+        self._load_eqp_names |= eqp_names
+        self._wakeup.set()
+
+    def unsubscribe(self, connection: StateConnection, agv_names: list[str], eqp_names: list[str]):
+        """
+        取消訂閱
+
+        Args:
+            connection: 連線
+            agv_names: AGV 名稱列表
+            eqp_names: 設備名稱列表
+        """
+        for name in agv_names:
+            subscribers = self._agv_subscribers.get(name)
+            if subscribers is not None:
+                subscribers.discard(connection)
+                if not subscribers:
+                    del self._agv_subscribers[name]
+            connection.agv_names.discard(name)
+        for name in eqp_names:
+            subscribers = self._eqp_subscribers.get(name)
+            if subscribers is not None:
+                subscribers.discard(connection)
+                if not subscribers:
+                    del self._eqp_subscribers[name]
+            connection.eqp_names.discard(name)
+        self._drop_unsubscribed_snapshots()
+
+    def snapshot_message(self, key: RowKey) -> Optional[dict[str, Any]]:
+        """資料列的最新快照訊息（已刪除或不再訂閱時為 None）"""
+        row = self._snapshots.get(key)
+        if row is None:
+            return None
+        return {**_row_message(key[0], "snapshot", row), "data": row}
+
+    def handle_change_notification(self, payload: str):
+        """
+        處理資料表變更通知（LISTEN 回呼）
+
+        Args:
+            payload: 觸發器送出的 JSON，例如 {"table": "eqp_port", "op": "UPDATE", "id": 1, "name": "P1", "eqp_name": "EQ1"}
+        """
+        if not self._connections:
+            return
+        try:
+            change = json.loads(payload)
+        except ValueError:
+            return
+
+        table, row_id = change.get("table"), change.get("id")
+        key = (table, row_id)
+        if table == AGV_TABLE:
+            interested = change.get("name") in self._agv_subscribers
+        elif table == EQP_PORT_TABLE:
+            interested = change.get("eqp_name") in self._eqp_subscribers
+        else:
+            return
+
+        # 已有快照的資料列也要處理（例如改名或移到其他設備）
+        if interested or key in self._snapshots:
+            self._changed.add(key)
+            self._wakeup.set()
+
+    def resync(self):
+        """監聽連線重新連線後重新讀取所有訂閱的資料列（斷線期間的通知已遺失）"""
+        self._changed |= set(self._snapshots)
+        self._load_agv_names |= set(self._agv_subscribers)
+        self._load_eqp_names |= set(self._eqp_subscribers)
+        self._wakeup.set()
+
+    async def start(self):
+        """啟動背景工作"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止背景工作"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                await self._process()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("[WS] 處理狀態變更時發生錯誤")
+
+    async def _process(self):
+        changed, self._changed = self._changed, set()
+        agv_names, self._load_agv_names = self._load_agv_names, set()
+        eqp_names, self._load_eqp_names = self._load_eqp_names, set()
+        awaiting, self._awaiting_snapshot = self._awaiting_snapshot, {}
+
+        agv_ids = [row_id for table, row_id in changed if table == AGV_TABLE]
+        eqp_port_ids = [row_id for table, row_id in changed if table == EQP_PORT_TABLE]
+
+        # 每張資料表最多兩次查詢（依 id、依名稱），與通知數量和連線數量無關
+        rows: dict[RowKey, dict[str, Any]] = {}
+        async with AsyncSession(async_engine) as session:
+            for agv in await crud_agv.get_agvs_by_ids(session, agv_ids) \
+                    + await crud_agv.get_agvs_by_names(session, list(agv_names)):
+                rows[(AGV_TABLE, agv.id)] = agv.model_dump(mode="json")
+            for eqp_port in await crud_eqp_port.get_eqp_ports_by_ids(session, eqp_port_ids) \
+                    + await crud_eqp_port.get_eqp_ports_by_eqp_names(session, list(eqp_names)):
+                rows[(EQP_PORT_TABLE, eqp_port.id)] = eqp_port.model_dump(mode="json")
+
+        for key in changed - rows.keys():
+            self._apply(key, None)
+        for key, row in rows.items():
+            self._apply(key, row)
+
+        # 新訂閱的連線送出完整快照（之後的差異會在送出佇列中與快照合併）
+        for connection, (awaiting_agv, awaiting_eqp) in awaiting.items():
+            if connection not in self._connections:
+                continue
+            for key, row in self._snapshots.items():
+                if (key[0] == AGV_TABLE and row["name"] in awaiting_agv) \
+                        or (key[0] == EQP_PORT_TABLE and row["eqp_name"] in awaiting_eqp):
+                    connection.push(key, self.snapshot_message(key))
+            connection.push_control({
+                "op": "subscribed",
+                "agv_names": sorted(connection.agv_names),
+                "eqp_names": sorted(connection.eqp_names),
+            })
+
+        self._drop_unsubscribed_snapshots()
+
+    def _subscribers(self, key: RowKey, row: dict[str, Any]) -> set[StateConnection]:
+        if key[0] == AGV_TABLE:
+            return self._agv_subscribers.get(row["name"], set())
+        return self._eqp_subscribers.get(row["eqp_name"], set())
+
+    def _apply(self, key: RowKey, row: Optional[dict[str, Any]]):
+        """更新快照並分派差異"""
+        old = self._snapshots.get(key)
+
+        if row is None:
+            if old is not None:
+                del self._snapshots[key]
+                message = _row_message(key[0], "delete", old)
+                for connection in self._subscribers(key, old):
+                    connection.push(key, message)
+            return
+
+        self._snapshots[key] = row
+        old_subscribers = self._subscribers(key, old) if old is not None else set()
+        new_subscribers = self._subscribers(key, row)
+
+        if old is None:
+            message = {**_row_message(key[0], "snapshot", row), "data": row}
+        else:
+            patch = make_merge_patch(old, row)
+            if not patch:
+                return
+            message = {**_row_message(key[0], "update", row), "patch": patch}
+
+        for connection in new_subscribers:
+            # 改名或移到其他設備後才符合訂閱的連線沒有舊資料，送完整快照
+            if old is not None and connection not in old_subscribers:
+                connection.push(key, self.snapshot_message(key))
+            else:
+                connection.push(key, message)
+        # 改名或移到其他設備後不再符合訂閱的連線視為刪除
+        for connection in old_subscribers - new_subscribers:
+            connection.push(key, _row_message(key[0], "delete", old))
+
+    def _drop_unsubscribed_snapshots(self):
+        for key in [key for key, row in self._snapshots.items() if not self._subscribers(key, row)]:
+            del self._snapshots[key]
+
+
+# 全域狀態分派器
+state_hub = StateHub(queue_size=settings.WS_SEND_QUEUE_SIZE)
@@ -0,0 +1,332 @@
+"""
+任務變更事件串流（Server-Sent Events）
+
+- task 表的觸發器把每筆變更寫入 task_event，並在同一交易送出 NOTIFY
+- 每個 worker 透過共用的監聽連線收到通知後，以一次查詢讀取新事件，
+  再分派到行程內所有訂閱者的佇列；訂閱者數量不影響資料庫負載
+- 事件持久化在 task_event 中：監聽連線中斷、訂閱者佇列滿或用戶端以
+  Last-Event-ID 重新連線時，都直接從資料表補送（至少送達一次，用戶端以事件 ID 去重）
+"""
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .config import settings
+from .database import async_engine
+from app.crud.aio import task_event as crud_task_event
+from app.models.task_event import TaskEvent
+
+logger = logging.getLogger("app")
+
+# 依事件 ID 補查跳號的上限：序號一次跳太多（例如大量新增後回滾）時不追蹤
+MAX_TRACKED_GAPS = 10000
+
+# 續傳位置早於保留範圍時送出，用戶端應重新查詢完整列表
+RESET_MESSAGE = "event: reset\ndata: {}\n\n"
+
+
+def format_event(event: TaskEvent) -> str:
+    """
+    將事件轉為 SSE 訊息
+
+    Args:
+        event: TaskEvent 物件
+
+    Returns:
+        SSE 訊息字串（event 為 insert / update / delete / archive）
+    """
+    data = json.dumps(
+        {"event_id": event.id, "op": event.op, "task_id": event.task_id, "task": event.data},
+        ensure_ascii=False,
+        separators=(",", ":"),
+        default=str,
+    )
+    return f"id: {event.id}\nevent: {event.op.lower()}\ndata: {data}\n\n"
+
+
+class TaskEventSubscription:
+    """單一 SSE 連線的訂閱"""
+
+    def __init__(self, status_ids: Optional[list[int]], agv_name: Optional[str], start_id: int, maxsize: int):
+        self.status_ids = list(status_ids) if status_ids else None
+        self.agv_name = agv_name
+        # 訂閱當下 hub 已讀到的事件 ID，之後的事件都會放進佇列
+        self.start_id = start_id
+        self.queue: asyncio.Queue[tuple[int, str]] = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def matches(self, event: TaskEvent) -> bool:
+        """是否符合篩選條件（與 crud_task_event.get_task_events 的條件一致）"""
+        if self.status_ids and event.status_id not in self.status_ids \
+                and event.old_status_id not in self.status_ids:
+            return False
+        if self.agv_name and event.agv_name != self.agv_name and event.old_agv_name != self.agv_name:
+            return False
+        return True
+
+    def offer(self, event: TaskEvent, message: str):
+        """放入佇列；佇列已滿時標記溢位，由串流改從資料表補送"""
+        if self.overflowed or not self.matches(event):
+            return
+        try:
+            self.queue.put_nowait((event.id, message))
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    def reset(self):
+        """清空佇列並清除溢位標記"""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.overflowed = False
+
+
+class TaskEventHub:
+    """行程內的任務事件分派器"""
+
+    def __init__(
+        self,
+        batch_size: int,
+        queue_size: int,
+        gap_grace: float,
+        retention: timedelta,
+        prune_interval: float = 600.0,
+    ):
+        self._batch_size = batch_size
+        self._queue_size = queue_size
+        self._gap_grace = gap_grace
+        self._retention = retention
+        self._prune_interval = prune_interval
+        self._subscriptions: set[TaskEventSubscription] = set()
+        # 已分派的最大事件 ID；沒有訂閱者時為 None（不追蹤進度）
+        self._last_id: Optional[int] = None
+        # 跳號的事件 ID -> 發現時間（較早取得序號的交易可能尚未提交）
+        self._gaps: dict[int, float] = {}
+        self._wakeup = asyncio.Event()
+        self._last_prune = 0.0
+        self._task: asyncio.Task | None = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscriptions)
+
+    def notify(self, payload: str = ""):
+        """NOTIFY 回呼：喚醒背景工作讀取新事件（通知內容不使用）"""
+        self._wakeup.set()
+
+    async def start(self):
+        """啟動背景工作"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止背景工作"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def subscribe(self, status_ids: Optional[list[int]] = None, agv_name: Optional[str] = None) -> TaskEventSubscription:
+        """
+        新增訂閱
+
+        Args:
+            status_ids: 按任務狀態 ID 篩選（選填）
+            agv_name: 按 AGV 名稱篩選（選填）
+
+        Returns:
+            訂閱物件，使用完畢需呼叫 unsubscribe()
+        """
+        if self._last_id is None:
+            async with AsyncSession(async_engine) as session:
+                _, last_id = await crud_task_event.get_task_event_id_range(session)
+            # 等待期間可能已有其他訂閱者初始化
+            if self._last_id is None:
+                self._last_id = last_id or 0
+
+        subscription = TaskEventSubscription(status_ids, agv_name, self._last_id, self._queue_size)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: TaskEventSubscription):
+        """移除訂閱"""
+        self._subscriptions.discard(subscription)
+
+    async def stream(
+        self,
+        status_ids: Optional[list[int]] = None,
+        agv_name: Optional[str] = None,
+        last_event_id: Optional[int] = None,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+        keepalive: float = 15.0,
+    ) -> AsyncIterator[str]:
+        """
+        產生 SSE 訊息
+
+        訂閱在產生器開始執行時才建立、結束時取消：回應開始送出前用戶端就斷線時，
+        產生器不會被執行，也就不會留下訂閱
+
+        Args:
+            status_ids: 按任務狀態 ID 篩選（選填）
+            agv_name: 按 AGV 名稱篩選（選填）
+            last_event_id: 用戶端最後收到的事件 ID，提供時先補送之後的事件（選填）
+            is_disconnected: 檢查用戶端是否已斷線的函式（選填）
+            keepalive: 無事件時送出註解行的間隔秒數
+
+        Yields:
+            SSE 訊息字串
+        """
+        subscription = None
+        try:
+            subscription = await self.subscribe(status_ids, agv_name)
+            yield f"retry: {int(keepalive * 1000)}\n\n"
+
+            sent_id = subscription.start_id
+            if last_event_id is not None:
+                if last_event_id < subscription.start_id:
+                    async for message in self._replay(subscription, last_event_id, subscription.start_id):
+                        yield message
+                sent_id = max(sent_id, last_event_id)
+
+            while True:
+                if subscription.overflowed:
+                    # 消費太慢導致佇列溢位：丟棄佇列內容，改從 task_event 補送到目前進度
+                    until_id = self._last_id or sent_id
+                    subscription.reset()
+                    async for message in self._replay(subscription, sent_id, until_id, check_reset=False):
+                        yield message
+                    sent_id = max(sent_id, until_id)
+                    continue
+
+                try:
+                    event_id, message = await asyncio.wait_for(subscription.queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    if is_disconnected is not None and await is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+
+                # 續傳位置可能超前本行程的進度（用戶端先前連到其他 worker）
+                if last_event_id is not None and event_id <= last_event_id:
+                    continue
+                sent_id = max(sent_id, event_id)
+                yield message
+        finally:
+            if subscription is not None:
+                self.unsubscribe(subscription)
+
+    async def _replay(
+        self,
+        subscription: TaskEventSubscription,
+        after_id: int,
+        until_id: int,
+        check_reset: bool = True,
+    ) -> AsyncIterator[str]:
+        """從 task_event 補送 (after_id, until_id] 之間符合篩選條件的事件"""
+        if check_reset:
+            async with AsyncSession(async_engine) as session:
+                first_id, _ = await crud_task_event.get_task_event_id_range(session)
+            if first_id is None or after_id + 1 < first_id:
+                # 續傳位置之後的事件已被清除
+                yield RESET_MESSAGE
+
+        while after_id < until_id:
+            # 每批各自取得連線，避免慢速用戶端長時間佔用連線
+            async with AsyncSession(async_engine) as session:
+                events = await crud_task_event.get_task_events(
+                    session,
+                    after_id=after_id,
+                    until_id=until_id,
+                    status_ids=subscription.status_ids,
+                    agv_name=subscription.agv_name,
+                    limit=self._batch_size,
+                )
+            for event in events:
+                yield format_event(event)
+            if len(events) < self._batch_size:
+                break
+            after_id = events[-1].id
+
+    def _dispatch(self, event: TaskEvent):
+        message = format_event(event)
+        for subscription in list(self._subscriptions):
+            subscription.offer(event, message)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._gap_grace)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self._poll()
+                await self._prune()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("[SSE] 讀取任務事件時發生錯誤")
+
+    async def _poll(self):
+        if not self._subscriptions:
+            # 沒有訂閱者時不追蹤進度，下一個訂閱者從當下開始
+            self._last_id = None
+            self._gaps.clear()
+            return
+
+        async with AsyncSession(async_engine) as session:
+            if self._last_id is None:
+                _, last_id = await crud_task_event.get_task_event_id_range(session)
+                self._last_id = last_id or 0
+
+            now = time.monotonic()
+            if self._gaps:
+                self._gaps = {gap: seen for gap, seen in self._gaps.items() if now - seen < self._gap_grace}
+                late_events = await crud_task_event.get_task_events_by_ids(session, list(self._gaps))
+                for event in late_events:
+                    del self._gaps[event.id]
+                    self._dispatch(event)
+
+            while True:
+                events = await crud_task_event.get_task_events(
+                    session, after_id=self._last_id, limit=self._batch_size
+                )
+                for event in events:
+                    # 序號在取得時就遞增，提交順序可能不同：跳過的 ID 在寬限時間內持續補查
+                    if len(self._gaps) + event.id - self._last_id - 1 <= MAX_TRACKED_GAPS:
+                        for gap in range(self._last_id + 1, event.id):
+                            self._gaps[gap] = now
+                    self._last_id = event.id
+                    self._dispatch(event)
+                if len(events) < self._batch_size:
+                    break
+
+    async def _prune(self):
+        now = time.monotonic()
+        if now - self._last_prune < self._prune_interval:
+            return
+        self._last_prune = now
+
+        async with AsyncSession(async_engine) as session:
+            deleted = await crud_task_event.delete_task_events_before(
+                session, datetime.now() - self._retention
+            )
+        if deleted:
+            logger.info(f"[SSE] 已清除 {deleted} 筆過期任務事件")
+
+
+# 全域事件分派器
+task_event_hub = TaskEventHub(
+    batch_size=settings.TASK_STREAM_BATCH_SIZE,
+    queue_size=settings.TASK_STREAM_QUEUE_SIZE,
+    gap_grace=settings.TASK_EVENT_GAP_GRACE_SECONDS,
+    retention=timedelta(hours=settings.TASK_EVENT_RETENTION_HOURS),
+)
@@ -3,8 +3,11 @@ AGV CRUD 操作
 
 提供資料庫層的增刪改查操作
 """
-from sqlmodel import Session, select
+from sqlmodel import Session, select, func
+from sqlalchemy import update, delete
+from sqlalchemy.exc import IntegrityError
 from app.models import AGV
+from app.crud.common import ESTIMATE_ROW_COUNT, parse_estimate
 from datetime import datetime
 
 
@@ -91,23 +94,26 @@ def update_agv(session: Session, agv_id: int, agv_data: dict) -> AGV | None:
         agv_data: 要更新的資料（字典）
 
     Returns:
-        更新後的 AGV 物件或 None
-    """
-    agv = session.get(AGV, agv_id)
-    if not agv:
-        return None
-
-    # 更新欄位
-    for key, value in agv_data.items():
-        if hasattr(agv, key) and key not in ['id', 'created_at']:  # 不允許更新 id 和 created_at
-            setattr(agv, key, value)
+        更新後的 AGV 物件或 None（不存在時）
 
+    Raises:
+        IntegrityError: 違反唯一約束（例如名稱重複）
+    """
+    values = {
+        key: value for key, value in agv_data.items()
+        if key in AGV.model_fields and key not in ['id', 'created_at']  # 不允許更新 id 和 created_at
+    }
     # 更新時間戳
-    agv.updated_at = datetime.now()
-
-    session.add(agv)
-    session.commit()
-    session.refresh(agv)
+    values['updated_at'] = datetime.now()
+
+    # 單一 UPDATE ... RETURNING：0 筆即代表不存在
+    statement = update(AGV).where(AGV.id == agv_id).values(**values).returning(AGV)
+    try:
+        agv = session.scalars(statement, execution_options={"synchronize_session": False}).one_or_none()
+        session.commit()
+    except IntegrityError:
+        session.rollback()
+        raise
     return agv
 
 
@@ -122,29 +128,36 @@ def delete_agv(session: Session, agv_id: int) -> bool:
     Returns:
         是否成功刪除
     """
-    agv = session.get(AGV, agv_id)
-    if not agv:
-        return False
-
-    session.delete(agv)
+    # 單一 DELETE ... RETURNING id：不需先載入整筆資料
+    statement = delete(AGV).where(AGV.id == agv_id).returning(AGV.id)
+    deleted_id = session.scalars(statement, execution_options={"synchronize_session": False}).first()
     session.commit()
-    return True
+    return deleted_id is not None
 
 
-def count_agvs(session: Session, enabled_only: bool = False) -> int:
+def count_agvs(session: Session, enabled_only: bool = False, approximate: bool = False) -> int:
     """
     計算 AGV 總數
 
     Args:
         session: 資料庫 Session
         enabled_only: 是否只計算啟用的 AGV
+        approximate: 無篩選條件時改用 pg_class.reltuples 估計值（不掃描資料表）
 
     Returns:
         AGV 總數
     """
-    statement = select(AGV)
+    # 估計值只適用於全表總數；沒有統計資料時回退為精確計數
+    if approximate and not enabled_only:
+        estimate = parse_estimate(
+            session.exec(ESTIMATE_ROW_COUNT, params={"table_name": AGV.__tablename__}).scalar()
+        )
+        if estimate is not None:
+            return estimate
+
+    statement = select(func.count()).select_from(AGV)
 
     if enabled_only:
         statement = statement.where(AGV.enable == 1)
 
-    return len(list(session.exec(statement).all()))
+    return session.exec(statement).one()
@@ -0,0 +1,5 @@
+"""
+非同步 CRUD 操作
+
+與 app/crud/ 下的同步版本一一對應，搭配 AsyncSession 使用（API 路由專用）
+"""
@@ -0,0 +1,362 @@
+"""
+AGV 非同步 CRUD 操作
+
+提供資料庫層的增刪改查操作（AsyncSession 版本）
+get_agv / get_agv_by_name 先查 agv_cache，寫入函式負責失效對應項目
+"""
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import update, delete, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from app.models import AGV
+from app.core.cache import agv_cache
+from app.crud.common import ESTIMATE_ROW_COUNT, any_of, json_contains, merge_json, parse_estimate
+from datetime import datetime
+
+
+async def create_agv(session: AsyncSession, agv: AGV) -> AGV:
+    """
+    新增 AGV
+
+    Args:
+        session: 非同步資料庫 Session
+        agv: AGV 物件
+
+    Returns:
+        新建的 AGV 物件
+
+    Raises:
+        IntegrityError: 違反唯一約束（名稱重複）
+    """
+    session.add(agv)
+    try:
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        raise
+    await session.refresh(agv)
+    # 其他行程可能留有同名的過期項目
+    agv_cache.invalidate(agv.id, agv.name)
+    return agv
+
+
+async def upsert_agvs(session: AsyncSession, agvs: list[AGV]) -> list[tuple[AGV, bool]]:
+    """
+    依名稱新增或更新 AGV（批次）
+
+    以單一 INSERT ... ON CONFLICT (name) DO UPDATE ... RETURNING 完成，
+    名稱唯一性由資料庫約束保證，不需要先查詢；同一批中重複的名稱以最後一筆為準
+
+    Args:
+        session: 非同步資料庫 Session
+        agvs: AGV 物件列表
+
+    Returns:
+        [(AGV 物件, 是否為新增)] 列表（順序與輸入中各名稱最後出現的位置相同）
+    """
+    if not agvs:
+        return []
+
+    rows = {}
+    for item in agvs:
+        rows.pop(item.name, None)
+        rows[item.name] = item.model_dump(exclude={'id'})
+
+    statement = pg_insert(AGV).values(list(rows.values()))
+    # 衝突時更新除了 id、name、created_at 以外的欄位
+    update_columns = {
+        key: statement.excluded[key]
+        for key in next(iter(rows.values()))
+        if key not in ['id', 'name', 'created_at']
+    }
+    statement = statement.on_conflict_do_update(
+        index_elements=[AGV.name],
+        set_=update_columns
+    ).returning(AGV, literal_column("xmax = 0").label("inserted"))
+
+    result = await session.exec(statement, execution_options={"synchronize_session": False})
+    upserted = {row[0].name: (row[0], row[1]) for row in result.all()}
+    await session.commit()
+    for agv, _ in upserted.values():
+        agv_cache.invalidate(agv.id, agv.name)
+    return [upserted[name] for name in rows]
+
+
+async def upsert_agv(session: AsyncSession, agv: AGV) -> tuple[AGV, bool]:
+    """
+    依名稱新增或更新單一 AGV
+
+    Args:
+        session: 非同步資料庫 Session
+        agv: AGV 物件
+
+    Returns:
+        (AGV 物件, 是否為新增)
+    """
+    return (await upsert_agvs(session, [agv]))[0]
+
+
+async def get_agv(session: AsyncSession, agv_id: int) -> AGV | None:
+    """
+    根據 ID 查詢單一 AGV
+
+    Args:
+        session: 非同步資料庫 Session
+        agv_id: AGV ID
+
+    Returns:
+        AGV 物件或 None
+    """
+    cached = agv_cache.get_by_id(agv_id)
+    if cached is not None:
+        return AGV.model_validate(cached)
+    # 查詢前取得失效世代，查詢期間被失效時不寫入快取
+    since = agv_cache.generation()
+
+    agv = await session.get(AGV, agv_id)
+    if agv:
+        agv_cache.put(agv.model_dump(), since)
+    return agv
+
+
+async def get_agv_by_name(session: AsyncSession, name: str) -> AGV | None:
+    """
+    根據名稱查詢 AGV
+
+    Args:
+        session: 非同步資料庫 Session
+        name: AGV 名稱
+
+    Returns:
+        AGV 物件或 None
+    """
+    cached = agv_cache.get_by_name(name)
+    if cached is not None:
+        return AGV.model_validate(cached)
+    # 查詢前取得失效世代，查詢期間被失效時不寫入快取
+    since = agv_cache.generation()
+
+    statement = select(AGV).where(AGV.name == name)
+    agv = (await session.exec(statement)).first()
+    if agv:
+        agv_cache.put(agv.model_dump(), since)
+    return agv
+
+
+async def get_agvs_by_ids(session: AsyncSession, agv_ids: list[int]) -> list[AGV]:
+    """
+    根據 ID 列表查詢 AGV（單一查詢，不經過快取）
+
+    Args:
+        session: 非同步資料庫 Session
+        agv_ids: AGV ID 列表
+
+    Returns:
+        AGV 物件列表（不存在的 ID 會被略過）
+    """
+    if not agv_ids:
+        return []
+    statement = select(AGV).where(any_of(AGV.id, agv_ids)).order_by(AGV.id)
+    return list((await session.exec(statement)).all())
+
+
+async def get_agvs_by_names(session: AsyncSession, names: list[str], use_cache: bool = False) -> list[AGV]:
+    """
+    根據名稱列表查詢 AGV（單一查詢）
+
+    Args:
+        session: 非同步資料庫 Session
+        names: AGV 名稱列表
+        use_cache: 是否先查 agv_cache，只查詢未命中的名稱（預設不經過快取）
+
+    Returns:
+        AGV 物件列表（不存在的名稱會被略過）
+    """
+    agvs = []
+    if use_cache:
+        missing = []
+        for name in dict.fromkeys(names):
+            cached = agv_cache.get_by_name(name)
+            if cached is not None:
+                agvs.append(AGV.model_validate(cached))
+            else:
+                missing.append(name)
+        names = missing
+    if not names:
+        return agvs
+
+    since = agv_cache.generation()
+    statement = select(AGV).where(any_of(AGV.name, names)).order_by(AGV.id)
+    rows = list((await session.exec(statement)).all())
+    if use_cache:
+        for agv in rows:
+            agv_cache.put(agv.model_dump(), since)
+    return agvs + rows
+
+
+async def get_all_agvs(
+    session: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    enabled_only: bool = False,
+    after_id: int | None = None,
+    parameter: dict | None = None
+) -> list[AGV]:
+    """
+    查詢所有 AGV
+
+    Args:
+        session: 非同步資料庫 Session
+        skip: 跳過筆數（分頁用）
+        limit: 限制筆數（分頁用）
+        enabled_only: 是否只查詢啟用的 AGV
+        after_id: Keyset 分頁鍵，只回傳 id 大於此值的資料（選填）
+        parameter: 只回傳 parameter 包含此 JSON 物件的資料（選填）
+
+    Returns:
+        AGV 物件列表
+    """
+    statement = select(AGV)
+
+    if enabled_only:
+        statement = statement.where(AGV.enable == 1)
+
+    if parameter:
+        statement = statement.where(json_contains(AGV.parameter, parameter))
+
+    if after_id is not None:
+        statement = statement.where(AGV.id > after_id)
+
+    statement = statement.order_by(AGV.id).offset(skip).limit(limit)
+    return list((await session.exec(statement)).all())
+
+
+async def update_agv(session: AsyncSession, agv_id: int, agv_data: dict) -> AGV | None:
+    """
+    更新 AGV
+
+    Args:
+        session: 非同步資料庫 Session
+        agv_id: AGV ID
+        agv_data: 要更新的資料（字典）
+
+    Returns:
+        更新後的 AGV 物件或 None（不存在時）
+
+    Raises:
+        IntegrityError: 違反唯一約束（例如名稱重複）
+    """
+    values = {
+        key: value for key, value in agv_data.items()
+        if key in AGV.model_fields and key not in ['id', 'created_at']  # 不允許更新 id 和 created_at
+    }
+    # 更新時間戳
+    values['updated_at'] = datetime.now()
+
+    # 單一 UPDATE ... RETURNING：0 筆即代表不存在
+    statement = update(AGV).where(AGV.id == agv_id).values(**values).returning(AGV)
+    try:
+        agv = (await session.scalars(statement, execution_options={"synchronize_session": False})).one_or_none()
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        raise
+    agv_cache.invalidate(agv_id, agv.name if agv else None)
+    return agv
+
+
+async def update_agv_parameter(session: AsyncSession, agv_id: int, values: dict) -> AGV | None:
+    """
+    部分更新 AGV 的 parameter（資料庫端合併，不覆寫整份文件）
+
+    Args:
+        session: 非同步資料庫 Session
+        agv_id: AGV ID
+        values: 要設定的鍵值（第一層）；值為 None 表示刪除該鍵
+
+    Returns:
+        更新後的 AGV 物件或 None（不存在時）
+    """
+    statement = (
+        update(AGV)
+        .where(AGV.id == agv_id)
+        .values(parameter=merge_json(AGV.parameter, values), updated_at=datetime.now())
+        .returning(AGV)
+    )
+    agv = (await session.scalars(statement, execution_options={"synchronize_session": False})).one_or_none()
+    await session.commit()
+    agv_cache.invalidate(agv_id, agv.name if agv else None)
+    return agv
+
+
+async def delete_agv(session: AsyncSession, agv_id: int) -> bool:
+    """
+    刪除 AGV
+
+    Args:
+        session: 非同步資料庫 Session
+        agv_id: AGV ID
+
+    Returns:
+        是否成功刪除
+    """
+    # 單一 DELETE ... RETURNING id：不需先載入整筆資料
+    statement = delete(AGV).where(AGV.id == agv_id).returning(AGV.id)
+    deleted_id = (await session.scalars(statement, execution_options={"synchronize_session": False})).first()
+    await session.commit()
+    agv_cache.invalidate(agv_id)
+    return deleted_id is not None
+
+
+async def count_agvs(session: AsyncSession, enabled_only: bool = False, approximate: bool = False) -> int:
+    """
+    計算 AGV 總數
+
+    Args:
+        session: 非同步資料庫 Session
+        enabled_only: 是否只計算啟用的 AGV
+        approximate: 無篩選條件時改用 pg_class.reltuples 估計值（不掃描資料表）
+
+    Returns:
+        AGV 總數
+    """
+    # 估計值只適用於全表總數；沒有統計資料時回退為精確計數
+    if approximate and not enabled_only:
+        estimate = parse_estimate(
+            (await session.exec(ESTIMATE_ROW_COUNT, params={"table_name": AGV.__tablename__})).scalar()
+        )
+        if estimate is not None:
+            return estimate
+
+    statement = select(func.count()).select_from(AGV)
+
+    if enabled_only:
+        statement = statement.where(AGV.enable == 1)
+
+    return (await session.exec(statement)).one()
+
+
+async def get_agvs_version(
+    session: AsyncSession,
+    enabled_only: bool = False
+) -> tuple[int, datetime | None]:
+    """
+    取得 AGV 列表的版本資訊（用於 ETag）
+
+    新增、更新會改變 max(updated_at)，刪除會改變筆數；不需要載入資料列
+
+    Args:
+        session: 非同步資料庫 Session
+        enabled_only: 是否只計算啟用的 AGV
+
+    Returns:
+        (筆數, 最後更新時間)
+    """
+    statement = select(func.count(), func.max(AGV.updated_at)).select_from(AGV)
+
+    if enabled_only:
+        statement = statement.where(AGV.enable == 1)
+
+    count, last_updated = (await session.exec(statement)).one()
+    return count, last_updated
@@ -0,0 +1,383 @@
+"""
+EqpPort 非同步 CRUD 操作
+
+提供資料庫層的增刪改查操作（AsyncSession 版本）
+get_eqp_port / get_eqp_port_by_name 先查 eqp_port_cache，寫入函式負責失效對應項目
+"""
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import update, delete, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from app.models.eqp_port import EqpPort
+from app.core.cache import eqp_port_cache
+from app.crud.common import ESTIMATE_ROW_COUNT, any_of, json_contains, merge_json, parse_estimate
+from datetime import datetime
+
+
+async def create_eqp_port(session: AsyncSession, eqp_port: EqpPort) -> EqpPort:
+    """
+    新增 EqpPort
+
+    Args:
+        session: 非同步資料庫 Session
+        eqp_port: EqpPort 物件
+
+    Returns:
+        新建的 EqpPort 物件
+
+    Raises:
+        IntegrityError: 違反唯一約束（名稱重複）
+    """
+    session.add(eqp_port)
+    try:
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        raise
+    await session.refresh(eqp_port)
+    # 其他行程可能留有同名的過期項目
+    eqp_port_cache.invalidate(eqp_port.id, eqp_port.name)
+    return eqp_port
+
+
+async def upsert_eqp_ports(session: AsyncSession, eqp_ports: list[EqpPort]) -> list[tuple[EqpPort, bool]]:
+    """
+    依名稱新增或更新 EqpPort（批次）
+
+    以單一 INSERT ... ON CONFLICT (name) DO UPDATE ... RETURNING 完成，
+    名稱唯一性由資料庫約束保證，不需要先查詢；同一批中重複的名稱以最後一筆為準
+
+    Args:
+        session: 非同步資料庫 Session
+        eqp_ports: EqpPort 物件列表
+
+    Returns:
+        [(EqpPort 物件, 是否為新增)] 列表（順序與輸入中各名稱最後出現的位置相同）
+    """
+    if not eqp_ports:
+        return []
+
+    rows = {}
+    for item in eqp_ports:
+        rows.pop(item.name, None)
+        rows[item.name] = item.model_dump(exclude={'id'})
+
+    statement = pg_insert(EqpPort).values(list(rows.values()))
+    # 衝突時更新除了 id、name、created_at 以外的欄位
+    update_columns = {
+        key: statement.excluded[key]
+        for key in next(iter(rows.values()))
+        if key not in ['id', 'name', 'created_at']
+    }
+    statement = statement.on_conflict_do_update(
+        index_elements=[EqpPort.name],
+        set_=update_columns
+    ).returning(EqpPort, literal_column("xmax = 0").label("inserted"))
+
+    result = await session.exec(statement, execution_options={"synchronize_session": False})
+    upserted = {row[0].name: (row[0], row[1]) for row in result.all()}
+    await session.commit()
+    for eqp_port, _ in upserted.values():
+        eqp_port_cache.invalidate(eqp_port.id, eqp_port.name)
+    return [upserted[name] for name in rows]
+
+
+async def upsert_eqp_port(session: AsyncSession, eqp_port: EqpPort) -> tuple[EqpPort, bool]:
+    """
+    依名稱新增或更新單一 EqpPort
+
+    Args:
+        session: 非同步資料庫 Session
+        eqp_port: EqpPort 物件
+
+    Returns:
+        (EqpPort 物件, 是否為新增)
+    """
+    return (await upsert_eqp_ports(session, [eqp_port]))[0]
+
+
+async def get_eqp_port(session: AsyncSession, eqp_port_id: int) -> EqpPort | None:
+    """
+    根據 ID 查詢單一 EqpPort
+
+    Args:
+        session: 非同步資料庫 Session
+        eqp_port_id: EqpPort ID
+
+    Returns:
+        EqpPort 物件或 None
+    """
+    cached = eqp_port_cache.get_by_id(eqp_port_id)
+    if cached is not None:
+        return EqpPort.model_validate(cached)
+    # 查詢前取得失效世代，查詢期間被失效時不寫入快取
+    since = eqp_port_cache.generation()
+
+    eqp_port = await session.get(EqpPort, eqp_port_id)
+    if eqp_port:
+        eqp_port_cache.put(eqp_port.model_dump(), since)
+    return eqp_port
+
+
+async def get_eqp_port_by_name(session: AsyncSession, name: str) -> EqpPort | None:
+    """
+    根據名稱查詢 EqpPort
+
+    Args:
+        session: 非同步資料庫 Session
+        name: 端口名稱
+
+    Returns:
+        EqpPort 物件或 None
+    """
+    cached = eqp_port_cache.get_by_name(name)
+    if cached is not None:
+        return EqpPort.model_validate(cached)
+    # 查詢前取得失效世代，查詢期間被失效時不寫入快取
+    since = eqp_port_cache.generation()
+
+    statement = select(EqpPort).where(EqpPort.name == name)
+    eqp_port = (await session.exec(statement)).first()
+    if eqp_port:
+        eqp_port_cache.put(eqp_port.model_dump(), since)
+    return eqp_port
+
+
+async def get_eqp_ports_by_ids(session: AsyncSession, eqp_port_ids: list[int]) -> list[EqpPort]:
+    """
+    根據 ID 列表查詢 EqpPort（單一查詢，不經過快取）
+
+    Args:
+        session: 非同步資料庫 Session
+        eqp_port_ids: EqpPort ID 列表
+
+    Returns:
+        EqpPort 物件列表（不存在的 ID 會被略過）
+    """
+    if not eqp_port_ids:
+        return []
+    statement = select(EqpPort).where(any_of(EqpPort.id, eqp_port_ids)).order_by(EqpPort.id)
+    return list((await session.exec(statement)).all())
+
+
+async def get_eqp_ports_by_names(
+    session: AsyncSession,
+    names: list[str],
+    use_cache: bool = False
+) -> list[EqpPort]:
+    """
+    根據端口名稱列表查詢 EqpPort（單一查詢）
+
+    Args:
+        session: 非同步資料庫 Session
+        names: 端口名稱列表
+        use_cache: 是否先查 eqp_port_cache，只查詢未命中的名稱（預設不經過快取）
+
+    Returns:
+        EqpPort 物件列表（不存在的名稱會被略過）
+    """
+    eqp_ports = []
+    if use_cache:
+        missing = []
+        for name in dict.fromkeys(names):
+            cached = eqp_port_cache.get_by_name(name)
+            if cached is not None:
+                eqp_ports.append(EqpPort.model_validate(cached))
+            else:
+                missing.append(name)
+        names = missing
+    if not names:
+        return eqp_ports
+
+    since = eqp_port_cache.generation()
+    statement = select(EqpPort).where(any_of(EqpPort.name, names)).order_by(EqpPort.id)
+    rows = list((await session.exec(statement)).all())
+    if use_cache:
+        for eqp_port in rows:
+            eqp_port_cache.put(eqp_port.model_dump(), since)
+    return eqp_ports + rows
+
+
+async def get_eqp_ports_by_eqp_names(session: AsyncSession, eqp_names: list[str]) -> list[EqpPort]:
+    """
+    查詢多個設備的所有端口（單一查詢，不經過快取）
+
+    Args:
+        session: 非同步資料庫 Session
+        eqp_names: 設備名稱列表
+
+    Returns:
+        EqpPort 物件列表
+    """
+    if not eqp_names:
+        return []
+    statement = select(EqpPort).where(any_of(EqpPort.eqp_name, eqp_names)).order_by(EqpPort.id)
+    return list((await session.exec(statement)).all())
+
+
+async def get_all_eqp_ports(
+    session: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    eqp_name: str | None = None,
+    after_id: int | None = None,
+    parameter: dict | None = None
+) -> list[EqpPort]:
+    """
+    查詢所有 EqpPort
+
+    Args:
+        session: 非同步資料庫 Session
+        skip: 跳過筆數（分頁用）
+        limit: 限制筆數（分頁用）
+        eqp_name: 按設備名稱篩選（選填）
+        after_id: Keyset 分頁鍵，只回傳 id 大於此值的資料（選填）
+        parameter: 只回傳 parameter 包含此 JSON 物件的資料（選填）
+
+    Returns:
+        EqpPort 物件列表
+    """
+    statement = select(EqpPort)
+
+    if eqp_name:
+        statement = statement.where(EqpPort.eqp_name == eqp_name)
+
+    if parameter:
+        statement = statement.where(json_contains(EqpPort.parameter, parameter))
+
+    if after_id is not None:
+        statement = statement.where(EqpPort.id > after_id)
+
+    statement = statement.order_by(EqpPort.id).offset(skip).limit(limit)
+    return list((await session.exec(statement)).all())
+
+
+async def update_eqp_port(session: AsyncSession, eqp_port_id: int, eqp_port_data: dict) -> EqpPort | None:
+    """
+    更新 EqpPort
+
+    Args:
+        session: 非同步資料庫 Session
+        eqp_port_id: EqpPort ID
+        eqp_port_data: 要更新的資料（字典）
+
+    Returns:
+        更新後的 EqpPort 物件或 None（不存在時）
+
+    Raises:
+        IntegrityError: 違反唯一約束（例如名稱重複）
+    """
+    values = {
+        key: value for key, value in eqp_port_data.items()
+        if key in EqpPort.model_fields and key not in ['id', 'created_at']  # 不允許更新 id 和 created_at
+    }
+    # 更新時間戳
+    values['updated_at'] = datetime.now()
+
+    # 單一 UPDATE ... RETURNING：0 筆即代表不存在
+    statement = update(EqpPort).where(EqpPort.id == eqp_port_id).values(**values).returning(EqpPort)
+    try:
+        eqp_port = (await session.scalars(statement, execution_options={"synchronize_session": False})).one_or_none()
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        raise
+    eqp_port_cache.invalidate(eqp_port_id, eqp_port.name if eqp_port else None)
+    return eqp_port
+
+
+async def update_eqp_port_parameter(session: AsyncSession, eqp_port_id: int, values: dict) -> EqpPort | None:
+    """
+    部分更新 EqpPort 的 parameter（資料庫端合併，不覆寫整份文件）
+
+    Args:
+        session: 非同步資料庫 Session
+        eqp_port_id: EqpPort ID
+        values: 要設定的鍵值（第一層）；值為 None 表示刪除該鍵
+
+    Returns:
+        更新後的 EqpPort 物件或 None（不存在時）
+    """
+    statement = (
+        update(EqpPort)
+        .where(EqpPort.id == eqp_port_id)
+        .values(parameter=merge_json(EqpPort.parameter, values), updated_at=datetime.now())
+        .returning(EqpPort)
+    )
+    eqp_port = (await session.scalars(statement, execution_options={"synchronize_session": False})).one_or_none()
+    await session.commit()
+    eqp_port_cache.invalidate(eqp_port_id, eqp_port.name if eqp_port else None)
+    return eqp_port
+
+
+async def delete_eqp_port(session: AsyncSession, eqp_port_id: int) -> bool:
+    """
+    刪除 EqpPort
+
+    Args:
+        session: 非同步資料庫 Session
+        eqp_port_id: EqpPort ID
+
+    Returns:
+        是否成功刪除
+    """
+    # 單一 DELETE ... RETURNING id：不需先載入整筆資料
+    statement = delete(EqpPort).where(EqpPort.id == eqp_port_id).returning(EqpPort.id)
+    deleted_id = (await session.scalars(statement, execution_options={"synchronize_session": False})).first()
+    await session.commit()
+    eqp_port_cache.invalidate(eqp_port_id)
+    return deleted_id is not None
+
+
+async def count_eqp_ports(session: AsyncSession, eqp_name: str | None = None, approximate: bool = False) -> int:
+    """
+    計算 EqpPort 總數
+
+    Args:
+        session: 非同步資料庫 Session
+        eqp_name: 按設備名稱篩選（選填）
+        approximate: 無篩選條件時改用 pg_class.reltuples 估計值（不掃描資料表）
+
+    Returns:
+        EqpPort 總數
+    """
+    # 估計值只適用於全表總數；沒有統計資料時回退為精確計數
+    if approximate and not eqp_name:
+        estimate = parse_estimate(
+            (await session.exec(ESTIMATE_ROW_COUNT, params={"table_name": EqpPort.__tablename__})).scalar()
+        )
+        if estimate is not None:
+            return estimate
+
+    statement = select(func.count()).select_from(EqpPort)
+
+    if eqp_name:
+        statement = statement.where(EqpPort.eqp_name == eqp_name)
+
+    return (await session.exec(statement)).one()
+
+
+async def get_eqp_ports_version(
+    session: AsyncSession,
+    eqp_name: str | None = None
+) -> tuple[int, datetime | None]:
+    """
+    取得 EqpPort 列表的版本資訊（用於 ETag）
+
+    新增、更新會改變 max(updated_at)，刪除會改變筆數；不需要載入資料列
+
+    Args:
+        session: 非同步資料庫 Session
+        eqp_name: 按設備名稱篩選（選填）
+
+    Returns:
+        (筆數, 最後更新時間)
+    """
+    statement = select(func.count(), func.max(EqpPort.updated_at)).select_from(EqpPort)
+
+    if eqp_name:
+        statement = statement.where(EqpPort.eqp_name == eqp_name)
+
+    count, last_updated = (await session.exec(statement)).one()
+    return count, last_updated
@@ -0,0 +1,584 @@
+"""
+Task 非同步 CRUD 操作
+
+提供資料庫層的增刪改查操作（AsyncSession 版本）
+"""
+from sqlmodel import select, func, or_, and_
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import Select, insert, update, delete, literal_column, union_all
+from sqlalchemy.orm import aliased
+from sqlalchemy.exc import IntegrityError
+from app.models.task import Task
+from app.models.task_history import TaskHistory
+from app.crud.common import (
+    ESTIMATE_ROW_COUNT, ESTIMATE_PARTITIONED_ROW_COUNT, any_of, json_contains, merge_json, parse_estimate
+)
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+
+async def create_task(session: AsyncSession, task: Task) -> Task:
+    """
+    新增 Task
+
+    Args:
+        session: 非同步資料庫 Session
+        task: Task 物件
+
+    Returns:
+        新建的 Task 物件
+    """
+    session.add(task)
+    await session.commit()
+    await session.refresh(task)
+    return task
+
+
+async def create_tasks(session: AsyncSession, tasks: list[Task]) -> list[Task]:
+    """
+    批次新增 Task
+
+    以單一交易、多列 INSERT ... RETURNING 寫入（每 1000 筆一個語句），
+    取代逐筆 add / commit / refresh 的多次往返
+
+    Args:
+        session: 非同步資料庫 Session
+        tasks: Task 物件列表
+
+    Returns:
+        新建的 Task 物件列表（順序與輸入相同）
+    """
+    if not tasks:
+        return []
+
+    rows = [task.model_dump(exclude={'id'}) for task in tasks]
+    statement = insert(Task).returning(Task, sort_by_parameter_order=True)
+    created = list((await session.scalars(statement, rows)).all())
+    await session.commit()
+    return created
+
+
+# 進行中（task）與歷史（task_history）合併查詢時選取的欄位，順序與 Task 相同
+TASK_COLUMNS = [column.name for column in Task.__table__.c]
+
+
+def _task_columns(model) -> Select:
+    """依 Task 欄位順序選取 model 的欄位（Task 或 TaskHistory）"""
+    return select(*[getattr(model, name) for name in TASK_COLUMNS])
+
+
+def _filter_tasks(
+    statement,
+    model,
+    status_id: Optional[int] = None,
+    agv_name: Optional[str] = None,
+    work_id: Optional[int] = None,
+    after: Optional[tuple[int, datetime, int]] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    parameter: Optional[dict] = None
+):
+    """套用任務篩選條件（model 為 Task 或 TaskHistory）"""
+    if status_id is not None:
+        statement = statement.where(model.status_id == status_id)
+    if agv_name:
+        statement = statement.where(model.agv_name == agv_name)
+    if work_id is not None:
+        statement = statement.where(model.work_id == work_id)
+    if created_from is not None:
+        statement = statement.where(model.created_at >= created_from)
+    if created_to is not None:
+        statement = statement.where(model.created_at < created_to)
+    if parameter:
+        statement = statement.where(json_contains(model.parameter, parameter))
+
+    # Keyset 分頁：排序為 priority DESC, created_at ASC, id ASC
+    if after is not None:
+        priority, created_at, task_id = after
+        statement = statement.where(or_(
+            model.priority < priority,
+            and_(model.priority == priority, or_(
+                model.created_at > created_at,
+                and_(model.created_at == created_at, model.id > task_id)
+            ))
+        ))
+    return statement
+
+
+def _as_task(row) -> Task:
+    """合併查詢的資料列轉為 Task 物件（不加入 Session）"""
+    return Task(**row._mapping)
+
+
+async def get_task(session: AsyncSession, task_id: int, include_history: bool = False) -> Task | None:
+    """
+    根據 ID 查詢單一 Task
+
+    Args:
+        session: 非同步資料庫 Session
+        task_id: Task ID
+        include_history: 找不到時是否查詢歷史表
+
+    Returns:
+        Task 物件或 None（來自歷史表的任務為不屬於 Session 的 Task 物件）
+    """
+    task = await session.get(Task, task_id)
+    if task is None and include_history:
+        row = (await session.exec(_task_columns(TaskHistory).where(TaskHistory.id == task_id))).first()
+        if row is not None:
+            task = _as_task(row)
+    return task
+
+
+async def get_tasks_by_ids(session: AsyncSession, task_ids: list[int]) -> list[Task]:
+    """
+    根據 ID 列表查詢 Task（單一查詢）
+
+    Args:
+        session: 非同步資料庫 Session
+        task_ids: Task ID 列表
+
+    Returns:
+        Task 物件列表（不存在的 ID 會被略過）
+    """
+    if not task_ids:
+        return []
+    statement = select(Task).where(any_of(Task.id, task_ids)).order_by(Task.id)
+    return list((await session.exec(statement)).all())
+
+
+async def get_all_tasks(
+    session: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    status_id: Optional[int] = None,
+    agv_name: Optional[str] = None,
+    work_id: Optional[int] = None,
+    after: Optional[tuple[int, datetime, int]] = None,
+    include_history: bool = False,
+    parameter: Optional[dict] = None
+) -> list[Task]:
+    """
+    查詢所有 Task
+
+    Args:
+        session: 非同步資料庫 Session
+        skip: 跳過筆數（分頁用）
+        limit: 限制筆數（分頁用）
+        status_id: 按狀態 ID 篩選（選填）
+        agv_name: 按 AGV 名稱篩選（選填）
+        work_id: 按工作 ID 篩選（選填）
+        after: Keyset 分頁鍵 (priority, created_at, id)，只回傳排序在其之後的資料（選填）
+        include_history: 是否包含歷史表中的任務
+        parameter: 只回傳 parameter 包含此 JSON 物件的任務（選填）
+
+    Returns:
+        Task 物件列表
+    """
+    filters = dict(status_id=status_id, agv_name=agv_name, work_id=work_id, after=after, parameter=parameter)
+
+    if not include_history:
+        statement = _filter_tasks(select(Task), Task, **filters)
+        # 按優先級和創建時間排序（id 作為同值時的穩定排序）
+        statement = statement.order_by(Task.priority.desc(), Task.created_at.asc(), Task.id.asc())
+        statement = statement.offset(skip).limit(limit)
+        return list((await session.exec(statement)).all())
+
+    # 兩張表各自排序並只取前 skip + limit 筆，合併後再排序分頁
+    branches = [
+        _filter_tasks(_task_columns(model), model, **filters)
+        .order_by(model.priority.desc(), model.created_at.asc(), model.id.asc())
+        .limit(skip + limit)
+        .subquery()
+        for model in (Task, TaskHistory)
+    ]
+    merged = union_all(*[select(branch) for branch in branches]).subquery()
+    statement = (
+        select(*merged.c)
+        .order_by(merged.c.priority.desc(), merged.c.created_at.asc(), merged.c.id.asc())
+        .offset(skip)
+        .limit(limit)
+    )
+    return [_as_task(row) for row in (await session.exec(statement)).all()]
+
+
+async def get_tasks_version(
+    session: AsyncSession,
+    status_id: Optional[int] = None,
+    agv_name: Optional[str] = None,
+    work_id: Optional[int] = None,
+    include_history: bool = False,
+    parameter: Optional[dict] = None
+) -> tuple[int, datetime | None]:
+    """
+    取得任務列表的版本資訊（用於 ETag），篩選條件同 get_all_tasks
+
+    新增、更新、領取會改變 max(updated_at)，刪除與搬移會改變筆數；不需要載入資料列
+
+    Args:
+        session: 非同步資料庫 Session
+        status_id: 按狀態 ID 篩選（選填）
+        agv_name: 按 AGV 名稱篩選（選填）
+        work_id: 按工作 ID 篩選（選填）
+        include_history: 是否包含歷史表中的任務
+        parameter: 只計算 parameter 包含此 JSON 物件的任務（選填）
+
+    Returns:
+        (筆數, 最後更新時間)
+    """
+    total, last_updated = 0, None
+    for model in (Task, TaskHistory) if include_history else (Task,):
+        statement = _filter_tasks(
+            select(func.count(), func.max(model.updated_at)).select_from(model), model,
+            status_id=status_id, agv_name=agv_name, work_id=work_id, parameter=parameter
+        )
+        count, updated_at = (await session.exec(statement)).one()
+        total += count
+        if updated_at is not None and (last_updated is None or updated_at > last_updated):
+            last_updated = updated_at
+    return total, last_updated
+
+
+async def stream_tasks(
+    session: AsyncSession,
+    status_id: Optional[int] = None,
+    agv_name: Optional[str] = None,
+    work_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    batch_size: int = 1000,
+    include_history: bool = False
+) -> AsyncIterator[list]:
+    """
+    以伺服器端游標逐批讀取 Task（匯出用，記憶體用量與總筆數無關）
+
+    Args:
+        session: 非同步資料庫 Session（讀取期間會佔用一條連線）
+        status_id: 按狀態 ID 篩選（選填）
+        agv_name: 按 AGV 名稱篩選（選填）
+        work_id: 按工作 ID 篩選（選填）
+        created_from: 建立時間下限，包含（選填）
+        created_to: 建立時間上限，不包含（選填）
+        batch_size: 每批筆數
+        include_history: 是否包含歷史表中的任務
+
+    Yields:
+        Task 物件列表（每批最多 batch_size 筆）；include_history 時為欄位相同的資料列（Row）
+    """
+    filters = dict(
+        status_id=status_id, agv_name=agv_name, work_id=work_id,
+        created_from=created_from, created_to=created_to
+    )
+
+    if not include_history:
+        # 按建立時間排序（id 作為同值時的穩定排序）
+        statement = _filter_tasks(select(Task), Task, **filters).order_by(Task.created_at.asc(), Task.id.asc())
+
+        # yield_per：使用伺服器端游標，每次只從資料庫取回 batch_size 筆；
+        # Session 的 identity map 為弱參照，已輸出的資料列不會累積在記憶體中
+        result = await session.stream_scalars(statement.execution_options(yield_per=batch_size))
+    else:
+        # 匯出大量資料時不轉為 Task 物件，直接輸出資料列
+        merged = union_all(*[
+            _filter_tasks(_task_columns(model), model, **filters) for model in (Task, TaskHistory)
+        ]).subquery()
+        statement = select(*merged.c).order_by(merged.c.created_at.asc(), merged.c.id.asc())
+        result = await session.stream(statement.execution_options(yield_per=batch_size))
+
+    async for partition in result.partitions():
+        yield partition
+
+
+async def get_tasks_by_parent(
+    session: AsyncSession,
+    parent_task_id: int,
+    include_history: bool = False
+) -> list[Task]:
+    """
+    查詢子任務
+
+    Args:
+        session: 非同步資料庫 Session
+        parent_task_id: 父任務 ID
+        include_history: 是否包含歷史表中的子任務
+
+    Returns:
+        子任務列表
+    """
+    if not include_history:
+        statement = select(Task).where(Task.parent_task_id == parent_task_id)
+        return list((await session.exec(statement)).all())
+
+    statement = union_all(*[
+        _task_columns(model).where(model.parent_task_id == parent_task_id) for model in (Task, TaskHistory)
+    ])
+    return [_as_task(row) for row in (await session.exec(statement)).all()]
+
+
+async def get_task_tree(session: AsyncSession, root_task_id: int, max_depth: int) -> list[tuple[Task, int]]:
+    """
+    以單一 WITH RECURSIVE 查詢取得任務及其所有子孫任務
+
+    Args:
+        session: 非同步資料庫 Session
+        root_task_id: 根任務 ID
+        max_depth: 最多往下查詢的層數（根任務為第 0 層）
+
+    Returns:
+        (Task 物件, 層數) 列表，依層數、優先級和創建時間排序；根任務不存在時為空列表
+    """
+    tree = (
+        _task_columns(Task)
+        # 以字面值輸出：遞迴 CTE 起始項的繫結參數在 PostgreSQL 推斷不出型別
+        .add_columns(literal_column("0").label("depth"))
+        .where(Task.id == root_task_id)
+        .cte("tree", recursive=True)
+    )
+    child = aliased(Task)
+    tree = tree.union_all(
+        _task_columns(child)
+        .add_columns((tree.c.depth + 1).label("depth"))
+        .where(child.parent_task_id == tree.c.id, tree.c.depth < max_depth)
+    )
+    statement = select(*tree.c).order_by(
+        tree.c.depth, tree.c.priority.desc(), tree.c.created_at.asc(), tree.c.id.asc()
+    )
+
+    result = []
+    for row in (await session.exec(statement)).all():
+        values = dict(row._mapping)
+        depth = values.pop("depth")
+        result.append((Task(**values), depth))
+    return result
+
+
+async def update_task(session: AsyncSession, task_id: int, task_data: dict) -> Task | None:
+    """
+    更新 Task
+
+    Args:
+        session: 非同步資料庫 Session
+        task_id: Task ID
+        task_data: 要更新的資料（字典）
+
+    Returns:
+        更新後的 Task 物件或 None（不存在時）
+
+    Raises:
+        IntegrityError: 違反 NOT NULL 約束（例如把 work_id / status_id 設為 None；task 表沒有唯一或外鍵約束）
+    """
+    values = {
+        key: value for key, value in task_data.items()
+        if key in Task.model_fields and key not in ['id', 'created_at']  # 不允許更新 id 和 created_at
+    }
+    # 更新時間戳
+    values['updated_at'] = datetime.now()
+
+    # 單一 UPDATE ... RETURNING：0 筆即代表不存在
+    statement = update(Task).where(Task.id == task_id).values(**values).returning(Task)
+    try:
+        task = (await session.scalars(statement, execution_options={"synchronize_session": False})).one_or_none()
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        raise
+    return task
+
+
+async def update_task_parameter(session: AsyncSession, task_id: int, values: dict) -> Task | None:
+    """
+    部分更新 Task 的 parameter（資料庫端合併，不覆寫整份文件）
+
+    Args:
+        session: 非同步資料庫 Session
+        task_id: Task ID
+        values: 要設定的鍵值（第一層）；值為 None 表示刪除該鍵
+
+    Returns:
+        更新後的 Task 物件或 None（不存在時）
+    """
+    statement = (
+        update(Task)
+        .where(Task.id == task_id)
+        .values(parameter=merge_json(Task.parameter, values), updated_at=datetime.now())
+        .returning(Task)
+    )
+    task = (await session.scalars(statement, execution_options={"synchronize_session": False})).one_or_none()
+    await session.commit()
+    return task
+
+
+async def update_tasks(
+    session: AsyncSession,
+    task_data: dict,
+    ids: Optional[list[int]] = None,
+    status_id: Optional[int] = None,
+    agv_name: Optional[str] = None,
+    work_id: Optional[int] = None,
+    return_rows: bool = True
+) -> tuple[int, list[Task]]:
+    """
+    批次更新 Task
+
+    以單一 UPDATE ... RETURNING 語句更新所有符合條件的任務，並更新 updated_at
+
+    Args:
+        session: 非同步資料庫 Session
+        task_data: 要更新的資料（字典）
+        ids: 任務 ID 列表（選填）
+        status_id: 按狀態 ID 篩選（選填）
+        agv_name: 按 AGV 名稱篩選（選填）
+        work_id: 按工作 ID 篩選（選填）
+        return_rows: 是否回傳更新後的 Task 物件
+
+    Returns:
+        (更新筆數, 更新後的 Task 物件列表；return_rows=False 時為空列表)
+
+    Raises:
+        IntegrityError: 違反 NOT NULL 約束（例如把 status_id 設為 None）
+    """
+    values = {key: value for key, value in task_data.items() if key not in ['id', 'created_at']}
+    # 更新時間戳
+    values['updated_at'] = datetime.now()
+
+    statement = update(Task).values(**values)
+
+    # 篩選條件
+    if ids is not None:
+        # 單一陣列參數：不論 ID 筆數多少都是同一個語句形狀
+        statement = statement.where(any_of(Task.id, ids))
+    if status_id is not None:
+        statement = statement.where(Task.status_id == status_id)
+    if agv_name:
+        statement = statement.where(Task.agv_name == agv_name)
+    if work_id is not None:
+        statement = statement.where(Task.work_id == work_id)
+
+    options = {"synchronize_session": False}
+    try:
+        if return_rows:
+            tasks = list((await session.scalars(statement.returning(Task), execution_options=options)).all())
+            await session.commit()
+            return len(tasks), tasks
+
+        result = await session.exec(statement, execution_options=options)
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        raise
+    return result.rowcount, []
+
+
+async def claim_tasks(
+    session: AsyncSession,
+    agv_name: str,
+    from_status_id: int,
+    to_status_id: int,
+    limit: int = 1,
+    work_id: Optional[int] = None,
+    unassigned_only: bool = True
+) -> list[Task]:
+    """
+    領取 Task
+
+    以 SELECT ... FOR UPDATE SKIP LOCKED 選出最高優先、最早建立的可領取任務，
+    並在同一語句中指派 agv_name / status_id。多個派車器同時領取時，
+    已被鎖定的任務會直接略過，不會重複領取也不需要重試
+
+    Args:
+        session: 非同步資料庫 Session
+        agv_name: 領取任務的 AGV 名稱
+        from_status_id: 可領取的任務狀態 ID
+        to_status_id: 領取後的任務狀態 ID
+        limit: 最多領取筆數
+        work_id: 只領取指定工作 ID 的任務（選填）
+        unassigned_only: 只領取尚未指派 AGV 的任務
+
+    Returns:
+        領取到的 Task 物件列表（按優先級和創建時間排序，可能為空）
+    """
+    candidates = select(Task.id).where(Task.status_id == from_status_id)
+    if unassigned_only:
+        candidates = candidates.where(Task.agv_name == "na")
+    if work_id is not None:
+        candidates = candidates.where(Task.work_id == work_id)
+    candidates = (
+        candidates
+        .order_by(Task.priority.desc(), Task.created_at.asc(), Task.id.asc())
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .cte("candidates")
+    )
+
+    statement = (
+        update(Task)
+        .where(Task.id.in_(select(candidates.c.id)))
+        .values(agv_name=agv_name, status_id=to_status_id, updated_at=datetime.now())
+        .returning(Task)
+    )
+    tasks = list((await session.scalars(statement, execution_options={"synchronize_session": False})).all())
+    await session.commit()
+
+    # UPDATE ... RETURNING 不保證順序
+    tasks.sort(key=lambda task: (-task.priority, task.created_at, task.id))
+    return tasks
+
+
+async def delete_task(session: AsyncSession, task_id: int) -> bool:
+    """
+    刪除 Task
+
+    Args:
+        session: 非同步資料庫 Session
+        task_id: Task ID
+
+    Returns:
+        是否成功刪除
+    """
+    # 單一 DELETE ... RETURNING id：不需先載入整筆資料
+    statement = delete(Task).where(Task.id == task_id).returning(Task.id)
+    deleted_id = (await session.scalars(statement, execution_options={"synchronize_session": False})).first()
+    await session.commit()
+    return deleted_id is not None
+
+
+async def count_tasks(
+    session: AsyncSession,
+    status_id: Optional[int] = None,
+    agv_name: Optional[str] = None,
+    approximate: bool = False,
+    include_history: bool = False
+) -> int:
+    """
+    計算 Task 總數
+
+    Args:
+        session: 非同步資料庫 Session
+        status_id: 按狀態 ID 篩選（選填）
+        agv_name: 按 AGV 名稱篩選（選填）
+        approximate: 無篩選條件時改用 pg_class.reltuples 估計值（不掃描資料表）
+        include_history: 是否包含歷史表中的任務
+
+    Returns:
+        Task 總數
+    """
+    # 估計值只適用於全表總數；沒有統計資料時回退為精確計數
+    if approximate and status_id is None and not agv_name:
+        estimate = parse_estimate(
+            (await session.exec(ESTIMATE_ROW_COUNT, params={"table_name": Task.__tablename__})).scalar()
+        )
+        if estimate is not None and include_history:
+            history_estimate = parse_estimate((await session.exec(
+                ESTIMATE_PARTITIONED_ROW_COUNT, params={"table_name": TaskHistory.__tablename__}
+            )).scalar())
+            estimate = None if history_estimate is None else estimate + history_estimate
+        if estimate is not None:
+            return estimate
+
+    total = 0
+    for model in (Task, TaskHistory) if include_history else (Task,):
+        statement = _filter_tasks(
+            select(func.count()).select_from(model), model, status_id=status_id, agv_name=agv_name
+        )
+        total += (await session.exec(statement)).one()
+    return total
@@ -0,0 +1,101 @@
+"""
+TaskEvent 非同步 CRUD 操作
+
+事件由 task 表的觸發器寫入，這裡只提供 SSE 串流需要的讀取與過期清理
+"""
+from typing import Optional
+from datetime import datetime
+from sqlmodel import select, func, or_
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import delete
+from app.models.task_event import TaskEvent
+
+
+async def get_task_events(
+    session: AsyncSession,
+    after_id: int,
+    until_id: Optional[int] = None,
+    status_ids: Optional[list[int]] = None,
+    agv_name: Optional[str] = None,
+    limit: int = 500
+) -> list[TaskEvent]:
+    """
+    依事件 ID 順序查詢 after_id 之後的事件
+
+    Args:
+        session: 非同步資料庫 Session
+        after_id: 只回傳 ID 大於此值的事件
+        until_id: 只回傳 ID 小於等於此值的事件（選填）
+        status_ids: 按任務狀態 ID 篩選，變更前或變更後符合即可（選填）
+        agv_name: 按 AGV 名稱篩選，變更前或變更後符合即可（選填）
+        limit: 限制筆數
+
+    Returns:
+        TaskEvent 物件列表
+    """
+    statement = select(TaskEvent).where(TaskEvent.id > after_id)
+
+    if until_id is not None:
+        statement = statement.where(TaskEvent.id <= until_id)
+    if status_ids:
+        statement = statement.where(or_(
+            TaskEvent.status_id.in_(status_ids),
+            TaskEvent.old_status_id.in_(status_ids)
+        ))
+    if agv_name:
+        statement = statement.where(or_(
+            TaskEvent.agv_name == agv_name,
+            TaskEvent.old_agv_name == agv_name
+        ))
+
+    statement = statement.order_by(TaskEvent.id).limit(limit)
+    return list((await session.exec(statement)).all())
+
+
+async def get_task_events_by_ids(session: AsyncSession, event_ids: list[int]) -> list[TaskEvent]:
+    """
+    根據 ID 列表查詢事件（依 ID 排序）
+
+    Args:
+        session: 非同步資料庫 Session
+        event_ids: 事件 ID 列表
+
+    Returns:
+        TaskEvent 物件列表（不存在的 ID 會被略過）
+    """
+    if not event_ids:
+        return []
+    statement = select(TaskEvent).where(TaskEvent.id.in_(event_ids)).order_by(TaskEvent.id)
+    return list((await session.exec(statement)).all())
+
+
+async def get_task_event_id_range(session: AsyncSession) -> tuple[Optional[int], Optional[int]]:
+    """
+    取得目前保留的事件 ID 範圍
+
+    Args:
+        session: 非同步資料庫 Session
+
+    Returns:
+        (最小 ID, 最大 ID)，沒有事件時為 (None, None)
+    """
+    statement = select(func.min(TaskEvent.id), func.max(TaskEvent.id))
+    first_id, last_id = (await session.exec(statement)).one()
+    return first_id, last_id
+
+
+async def delete_task_events_before(session: AsyncSession, before: datetime) -> int:
+    """
+    刪除早於指定時間的事件
+
+    Args:
+        session: 非同步資料庫 Session
+        before: 刪除 created_at 早於此時間的事件
+
+    Returns:
+        刪除筆數
+    """
+    statement = delete(TaskEvent).where(TaskEvent.created_at < before)
+    result = await session.exec(statement, execution_options={"synchronize_session": False})
+    await session.commit()
+    return result.rowcount
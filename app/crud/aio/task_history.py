@@ -0,0 +1,123 @@
+"""
+TaskHistory 非同步 CRUD 操作
+
+已完成任務從 task 表搬移至分區的 task_history 表（PostgreSQL 專用）
+"""
+from datetime import datetime
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import delete, insert, literal_column, text
+from app.models.task import Task
+from app.models.task_history import TaskHistory
+
+# 搬移工作的 advisory lock 鍵值：多個 worker 同時只有一個在搬移
+ARCHIVE_LOCK_KEY = 0x61677663  # "agvc"
+
+
+def partition_name(month: datetime) -> str:
+    """月分區名稱，例如 task_history_p202501"""
+    return f"{TaskHistory.__tablename__}_p{month:%Y%m}"
+
+
+async def get_archivable_months(
+    session: AsyncSession,
+    finished_status_ids: list[int],
+    before: datetime
+) -> list[datetime]:
+    """
+    查詢可搬移任務的建立月份（用於預先建立分區）
+
+    Args:
+        session: 非同步資料庫 Session
+        finished_status_ids: 已完成的任務狀態 ID
+        before: 只計算 updated_at 早於此時間的任務
+
+    Returns:
+        各月份第一天的列表
+    """
+    # 'month' 以字面值輸出，避免 SELECT DISTINCT 的運算式含有繫結參數
+    month = func.date_trunc(literal_column("'month'"), Task.created_at)
+    statement = (
+        select(month)
+        .where(Task.status_id.in_(finished_status_ids), Task.updated_at < before)
+        .distinct()
+    )
+    return list((await session.exec(statement)).all())
+
+
+async def create_history_partition(session: AsyncSession, month: datetime) -> str:
+    """
+    建立月分區（已存在時略過）
+
+    若 DEFAULT 分區已有該月份的資料，PostgreSQL 會拒絕建立，由呼叫端處理例外
+
+    Args:
+        session: 非同步資料庫 Session
+        month: 月份（任意日期，取其所在月份）
+
+    Returns:
+        分區名稱
+    """
+    start = month.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    name = partition_name(start)
+    await session.exec(text(
+        f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF {TaskHistory.__tablename__} '
+        f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+    ))
+    await session.commit()
+    return name
+
+
+async def archive_finished_tasks(
+    session: AsyncSession,
+    finished_status_ids: list[int],
+    before: datetime,
+    limit: int
+) -> int | None:
+    """
+    搬移一批已完成的任務到歷史表
+
+    單一語句：DELETE ... RETURNING 後直接 INSERT INTO task_history，
+    以 FOR UPDATE SKIP LOCKED 選取，不會等待或阻擋正在更新任務的交易
+
+    Args:
+        session: 非同步資料庫 Session
+        finished_status_ids: 已完成的任務狀態 ID
+        before: 只搬移 updated_at 早於此時間的任務
+        limit: 本批最多搬移筆數
+
+    Returns:
+        搬移筆數；其他 worker 正在搬移時回傳 None
+    """
+    locked = (await session.exec(
+        select(func.pg_try_advisory_xact_lock(ARCHIVE_LOCK_KEY))
+    )).one()
+    if not locked:
+        await session.rollback()
+        return None
+
+    # task_event 觸發器以此區分搬移與一般刪除（事件類型為 ARCHIVE）
+    await session.exec(text("SET LOCAL agvc.archiving = 'on'"))
+
+    candidates = (
+        select(Task.id)
+        .where(Task.status_id.in_(finished_status_ids), Task.updated_at < before)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    columns = [column.name for column in Task.__table__.c]
+    moved = (
+        delete(Task)
+        .where(Task.id.in_(candidates.scalar_subquery()))
+        .returning(*Task.__table__.c)
+        .cte("moved")
+    )
+    statement = insert(TaskHistory).from_select(
+        columns + ["archived_at"],
+        select(*[moved.c[name] for name in columns], func.now())
+    )
+
+    result = await session.exec(statement)
+    await session.commit()
+    return result.rowcount
@@ -0,0 +1,92 @@
+"""
+CRUD 共用工具
+
+同步與非同步 CRUD 共用的查詢片段
+"""
+from typing import Any, Iterable
+
+from sqlalchemy import Text, any_, bindparam, cast, func, text, type_coerce
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+
+# PostgreSQL 統計資訊中的估計列數（由 ANALYZE / autovacuum 維護）
+# 從未分析過的資料表 reltuples 為 -1
+ESTIMATE_ROW_COUNT = text(
+    "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table_name)"
+)
+
+# 分區表本身沒有資料，估計列數為各分區 reltuples 的總和（略過未分析的分區）
+ESTIMATE_PARTITIONED_ROW_COUNT = text("""
+    SELECT sum(c.reltuples)::bigint FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = to_regclass(:table_name) AND c.reltuples >= 0
+""")
+
+
+def parse_estimate(value: int | None) -> int | None:
+    """
+    將 reltuples 轉換為估計列數
+
+    Args:
+        value: pg_class.reltuples 查詢結果
+
+    Returns:
+        估計列數，沒有可用統計資料時回傳 None
+    """
+    if value is None or value < 0:
+        return None
+    return int(value)
+
+
+def any_of(column, values: Iterable[Any]):
+    """
+    column = ANY(:values) 條件
+
+    整個列表以單一陣列參數傳遞：不論筆數多少 SQL 文字都相同，
+    可重複使用預備語句（IN (...) 會依筆數展開成不同的語句）
+
+    Args:
+        column: 欄位
+        values: 值列表
+
+    Returns:
+        WHERE 條件運算式
+    """
+    return column == any_(bindparam(None, list(values), type_=ARRAY(column.type)))
+
+
+def json_contains(column, value: dict[str, Any]):
+    """
+    column @> :value 條件（JSONB 包含查詢，可使用 jsonb_path_ops GIN 索引）
+
+    Args:
+        column: JSONB 欄位（parameter）
+        value: 要包含的 JSON 物件，例如 {"ip": "10.0.0.1"}
+
+    Returns:
+        WHERE 條件運算式
+    """
+    return type_coerce(column, JSONB).contains(value)
+
+
+def merge_json(column, values: dict[str, Any]):
+    """
+    部分更新 JSONB 欄位的運算式：第一層合併（||），值為 None 的鍵刪除
+
+    在資料庫端合併，不需要先讀出整份文件，也不會覆蓋同時更新的其他鍵
+
+    Args:
+        column: JSONB 欄位（parameter）
+        values: 要設定的鍵值；值為 None 表示刪除該鍵
+
+    Returns:
+        可用於 UPDATE ... SET 的運算式
+    """
+    updates = {key: value for key, value in values.items() if value is not None}
+    removed = [key for key, value in values.items() if value is None]
+
+    document = func.coalesce(type_coerce(column, JSONB), cast({}, JSONB))
+    if updates:
+        document = document.op("||")(bindparam(None, updates, type_=JSONB))
+    if removed:
+        document = document.op("-")(bindparam(None, removed, type_=ARRAY(Text)))
+    return type_coerce(document, JSONB)
@@ -3,8 +3,11 @@ EqpPort CRUD 操作
 
 提供資料庫層的增刪改查操作
 """
-from sqlmodel import Session, select
+from sqlmodel import Session, select, func
+from sqlalchemy import update, delete
+from sqlalchemy.exc import IntegrityError
 from app.models.eqp_port import EqpPort
+from app.crud.common import ESTIMATE_ROW_COUNT, parse_estimate
 from datetime import datetime
 
 
@@ -91,23 +94,26 @@ def update_eqp_port(session: Session, eqp_port_id: int, eqp_port_data: dict) ->
         eqp_port_data: 要更新的資料（字典）
 
     Returns:
-        更新後的 EqpPort 物件或 None
-    """
-    eqp_port = session.get(EqpPort, eqp_port_id)
-    if not eqp_port:
-        return None
-
-    # 更新欄位
-    for key, value in eqp_port_data.items():
-        if hasattr(eqp_port, key) and key not in ['id', 'created_at']:  # 不允許更新 id 和 created_at
-            setattr(eqp_port, key, value)
+        更新後的 EqpPort 物件或 None（不存在時）
 
+    Raises:
+        IntegrityError: 違反唯一約束（例如名稱重複）
+    """
+    values = {
+        key: value for key, value in eqp_port_data.items()
+        if key in EqpPort.model_fields and key not in ['id', 'created_at']  # 不允許更新 id 和 created_at
+    }
     # 更新時間戳
-    eqp_port.updated_at = datetime.now()
-
-    session.add(eqp_port)
-    session.commit()
-    session.refresh(eqp_port)
+    values['updated_at'] = datetime.now()
+
+    # 單一 UPDATE ... RETURNING：0 筆即代表不存在
+    statement = update(EqpPort).where(EqpPort.id == eqp_port_id).values(**values).returning(EqpPort)
+    try:
+        eqp_port = session.scalars(statement, execution_options={"synchronize_session": False}).one_or_none()
+        session.commit()
+    except IntegrityError:
+        session.rollback()
+        raise
     return eqp_port
 
 
@@ -122,29 +128,36 @@ def delete_eqp_port(session: Session, eqp_port_id: int) -> bool:
     Returns:
         是否成功刪除
     """
-    eqp_port = session.get(EqpPort, eqp_port_id)
-    if not eqp_port:
-        return False
-
-    session.delete(eqp_port)
+    # 單一 DELETE ... RETURNING id：不需先載入整筆資料
+    statement = delete(EqpPort).where(EqpPort.id == eqp_port_id).returning(EqpPort.id)
+    deleted_id = session.scalars(statement, execution_options={"synchronize_session": False}).first()
     session.commit()
-    return True
+    return deleted_id is not None
 
 
-def count_eqp_ports(session: Session, eqp_name: str | None = None) -> int:
+def count_eqp_ports(session: Session, eqp_name: str | None = None, approximate: bool = False) -> int:
     """
     計算 EqpPort 總數
 
     Args:
         session: 資料庫 Session
         eqp_name: 按設備名稱篩選（選填）
+        approximate: 無篩選條件時改用 pg_class.reltuples 估計值（不掃描資料表）
 
     Returns:
         EqpPort 總數
     """
-    statement = select(EqpPort)
+    # 估計值只適用於全表總數；沒有統計資料時回退為精確計數
+    if approximate and not eqp_name:
+        estimate = parse_estimate(
+            session.exec(ESTIMATE_ROW_COUNT, params={"table_name": EqpPort.__tablename__}).scalar()
+        )
+        if estimate is not None:
+            return estimate
+
+    statement = select(func.count()).select_from(EqpPort)
 
     if eqp_name:
         statement = statement.where(EqpPort.eqp_name == eqp_name)
 
-    return len(list(session.exec(statement).all()))
+    return session.exec(statement).one()
@@ -3,8 +3,11 @@ Task CRUD 操作
 
 提供資料庫層的增刪改查操作
 """
-from sqlmodel import Session, select
+from sqlmodel import Session, select, func
+from sqlalchemy import update, delete
+from sqlalchemy.exc import IntegrityError
 from app.models.task import Task
+from app.crud.common import ESTIMATE_ROW_COUNT, parse_estimate
 from datetime import datetime
 from typing import Optional
 
@@ -104,23 +107,26 @@ def update_task(session: Session, task_id: int, task_data: dict) -> Task | None:
         task_data: 要更新的資料（字典）
 
     Returns:
-        更新後的 Task 物件或 None
-    """
-    task = session.get(Task, task_id)
-    if not task:
-        return None
-
-    # 更新欄位
-    for key, value in task_data.items():
-        if hasattr(task, key) and key not in ['id', 'created_at']:  # 不允許更新 id 和 created_at
-            setattr(task, key, value)
+        更新後的 Task 物件或 None（不存在時）
 
+    Raises:
+        IntegrityError: 違反 NOT NULL 約束（例如把 work_id / status_id 設為 None；task 表沒有唯一或外鍵約束）
+    """
+    values = {
+        key: value for key, value in task_data.items()
+        if key in Task.model_fields and key not in ['id', 'created_at']  # 不允許更新 id 和 created_at
+    }
     # 更新時間戳
-    task.updated_at = datetime.now()
-
-    session.add(task)
-    session.commit()
-    session.refresh(task)
+    values['updated_at'] = datetime.now()
+
+    # 單一 UPDATE ... RETURNING：0 筆即代表不存在
+    statement = update(Task).where(Task.id == task_id).values(**values).returning(Task)
+    try:
+        task = session.scalars(statement, execution_options={"synchronize_session": False}).one_or_none()
+        session.commit()
+    except IntegrityError:
+        session.rollback()
+        raise
     return task
 
 
@@ -135,19 +141,18 @@ def delete_task(session: Session, task_id: int) -> bool:
     Returns:
         是否成功刪除
     """
-    task = session.get(Task, task_id)
-    if not task:
-        return False
-
-    session.delete(task)
+    # 單一 DELETE ... RETURNING id：不需先載入整筆資料
+    statement = delete(Task).where(Task.id == task_id).returning(Task.id)
+    deleted_id = session.scalars(statement, execution_options={"synchronize_session": False}).first()
     session.commit()
-    return True
+    return deleted_id is not None
 
 
 def count_tasks(
     session: Session,
     status_id: Optional[int] = None,
-    agv_name: Optional[str] = None
+    agv_name: Optional[str] = None,
+    approximate: bool = False
 ) -> int:
     """
     計算 Task 總數
@@ -156,15 +161,24 @@ def count_tasks(
         session: 資料庫 Session
         status_id: 按狀態 ID 篩選（選填）
         agv_name: 按 AGV 名稱篩選（選填）
+        approximate: 無篩選條件時改用 pg_class.reltuples 估計值（不掃描資料表）
 
     Returns:
         Task 總數
     """
-    statement = select(Task)
+    # 估計值只適用於全表總數；沒有統計資料時回退為精確計數
+    if approximate and status_id is None and not agv_name:
+        estimate = parse_estimate(
+            session.exec(ESTIMATE_ROW_COUNT, params={"table_name": Task.__tablename__}).scalar()
+        )
+        if estimate is not None:
+            return estimate
+
+    statement = select(func.count()).select_from(Task)
 
     if status_id is not None:
         statement = statement.where(Task.status_id == status_id)
     if agv_name:
         statement = statement.where(Task.agv_name == agv_name)
 
-    return len(list(session.exec(statement).all()))
+    return session.exec(statement).one()
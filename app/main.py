@@ -1,16 +1,25 @@
 """
 AGVC 系統 FastAPI 主程式
 """
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 import json
 import logging
 
+from app.core import cache
+from app.core.archiver import task_archiver
 from app.core.config import settings
+from app.core.database import async_engine, get_pool_status
 from app.core.logging_config import setup_logging
-from app.api.v1 import agv, eqp_port, task
+from app.core.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, metrics_registry
+from app.core.notify import CHANGE_CHANNEL, TASK_EVENT_CHANNEL, pg_listener
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.sql_stats import sql_stats
+from app.core.state_stream import state_hub
+from app.core.task_stream import task_event_hub
+from app.api.v1 import agv, eqp_port, task, state
 
 # 設置日志
 setup_logging()
@@ -50,8 +59,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
+# 請求指標與每個請求的 SQL 統計（N+1 偵測）：最後加入的中間件在最外層，延遲包含 CORS 等其他中間件
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, registry=metrics_registry)
+
 
 # 請求日誌中間件（用於除錯）- 需要時可啟用
 # @app.middleware("http")
@@ -94,6 +108,82 @@ def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/health/pool", tags=["Health"])
+async def pool_status():
+    """
+    連線池狀態
+
+    - **checked_out**: 使用中的連線數
+    - **idle**: 閒置的連線數
+    - **overflow**: 超出 pool_size 的連線數
+    - **timeouts / wait_ms_***: 取得連線的逾時次數與等待時間，用來判斷延遲是否來自連線池耗盡
+    """
+    return get_pool_status()
+
+
+@app.get("/health/cache", tags=["Health"])
+async def cache_status():
+    """
+    AGV / EqpPort 讀取快取統計
+
+    - **hits / misses / hit_ratio**: 命中與未命中次數
+    - **evictions**: 因容量上限或 TTL 過期而移除的筆數
+    - **invalidations**: 因寫入或變更通知而失效的筆數
+    """
+    return cache.get_cache_stats()
+
+
+@app.get("/health/archive", tags=["Health"])
+async def archive_status():
+    """
+    已完成任務搬移（task -> task_history）狀態
+
+    - **enabled**: 是否已設定 TASK_FINISHED_STATUS_IDS
+    - **archived**: 本行程啟動後搬移的筆數
+    """
+    return task_archiver.stats()
+
+
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def metrics():
+    """
+    請求與資料庫指標（Prometheus 文字格式）
+
+    - **agvc_http_requests_total**: 各路由、狀態碼的請求數
+    - **agvc_http_request_duration_seconds**: 各路由的延遲直方圖
+    - **agvc_http_db_statements_total / agvc_http_db_seconds_total**: 各路由執行的資料庫語句數與耗時
+    - **agvc_http_requests_in_flight**: 進行中的請求數
+    - **agvc_threadpool_***: 同步路由執行緒池的使用量與等待數
+    - **agvc_db_pool_***: 資料庫連線池狀態
+    """
+    return PlainTextResponse(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+@app.get("/admin/sql/top", tags=["Admin"])
+async def sql_top(
+    k: int = Query(20, ge=1, le=500, description="筆數"),
+    order_by: str = Query("total", pattern="^(total|mean|max|calls)$", description="排序：total / mean / max / calls")
+):
+    """
+    啟動以來（或上次重設後）依語句形狀彙整的 SQL 統計
+
+    - **statement**: 正規化後的語句（參數與字面值以 ? 表示）
+    - **calls / total_ms / mean_ms / max_ms**: 執行次數與耗時
+    - **rows**: 累計回傳 / 影響筆數
+    """
+    return {
+        "since": sql_stats.started_at,
+        "dropped": sql_stats.dropped,
+        "statements": sql_stats.top(k, order_by),
+    }
+
+
+@app.delete("/admin/sql/top", tags=["Admin"], status_code=204)
+async def reset_sql_top():
+    """重設 SQL 統計"""
+    sql_stats.reset()
+
+
 # 註冊 API 路由
 app.include_router(
     agv.router,
@@ -113,6 +203,12 @@ app.include_router(
     tags=["Task"]
 )
 
+app.include_router(
+    state.router,
+    prefix=f"{settings.API_V1_PREFIX}/state",
+    tags=["State"]
+)
+
 
 # 啟動事件
 @app.on_event("startup")
@@ -120,6 +216,26 @@ async def startup_event():
     """
     應用啟動時執行
     """
+    # 跨行程快取失效：其他 worker 的寫入透過 LISTEN/NOTIFY 通知
+    if settings.CACHE_ENABLED:
+        pg_listener.add_listener(CHANGE_CHANNEL, cache.handle_change_notification)
+        pg_listener.add_reconnect_callback(cache.clear_all)
+
+    # 任務變更串流：通知只用來喚醒，事件從 task_event 讀取，重新連線後補讀斷線期間的事件
+    pg_listener.add_listener(TASK_EVENT_CHANNEL, task_event_hub.notify)
+    pg_listener.add_reconnect_callback(task_event_hub.notify)
+    await task_event_hub.start()
+
+    # AGV / EqpPort 狀態訂閱：與快取共用同一個變更通知頻道
+    pg_listener.add_listener(CHANGE_CHANNEL, state_hub.handle_change_notification)
+    pg_listener.add_reconnect_callback(state_hub.resync)
+    await state_hub.start()
+
+    await pg_listener.start()
+
+    # 已完成任務搬移至 task_history（多個 worker 以 advisory lock 輪流執行）
+    await task_archiver.start()
+
     logger.info(f"[啟動] {settings.PROJECT_NAME} v{settings.VERSION}")
     logger.info(f"[文檔] API Docs: http://localhost:8000/docs")
     logger.info(f"[文檔] ReDoc: http://localhost:8000/redoc")
@@ -134,4 +250,9 @@ async def shutdown_event():
     """
     應用關閉時執行
     """
+    await task_archiver.stop()
+    await pg_listener.stop()
+    await task_event_hub.stop()
+    await state_hub.stop()
+    await async_engine.dispose()
     print(f"[關閉] {settings.PROJECT_NAME}")
@@ -4,5 +4,7 @@
 from .agv import AGV
 from .eqp_port import EqpPort
 from .task import Task
+from .task_event import TaskEvent
+from .task_history import TaskHistory
 
-__all__ = ["AGV", "EqpPort", "Task"]
+__all__ = ["AGV", "EqpPort", "Task", "TaskEvent", "TaskHistory"]
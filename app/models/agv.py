@@ -5,9 +5,11 @@ AGVC 系統資料模型定義
 """
 from typing import Optional, Dict, Any
 from datetime import datetime
-from sqlmodel import SQLModel, Field, Column, JSON
+from sqlmodel import SQLModel, Field, Column
 from pydantic import ConfigDict
 
+from app.models.types import JSONDocument, json_document_index
+
 
 class AGV(SQLModel, table=True):
     """AGV 車輛主表 - 只包含靜態屬性"""
@@ -38,7 +40,7 @@ class AGV(SQLModel, table=True):
     # 參數設定（JSON 欄位）
     parameter: Optional[Dict[str, Any]] = Field(
         default_factory=lambda: {"ip": "", "port": 0, "work_id": 0},
-        sa_column=Column(JSON),
+        sa_column=Column(JSONDocument),
         description="AGV 參數設定（JSON 格式）"
     )
 
@@ -53,3 +55,7 @@ class AGV(SQLModel, table=True):
     )
 
     model_config = ConfigDict(from_attributes=True)
+
+
+# WHERE parameter @> ?（param.<key>=<value> 篩選）
+json_document_index("ix_agv_parameter", AGV.parameter)
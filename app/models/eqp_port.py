@@ -3,9 +3,11 @@ AGVC 系統資料模型 - 設備端口
 """
 from typing import Optional, Dict, Any
 from datetime import datetime
-from sqlmodel import SQLModel, Field, Column, JSON
+from sqlmodel import SQLModel, Field, Column
 from pydantic import ConfigDict
 
+from app.models.types import JSONDocument, json_document_index
+
 
 class EqpPort(SQLModel, table=True):
     """設備端口表 - 記錄設備的端口資訊"""
@@ -38,7 +40,7 @@ class EqpPort(SQLModel, table=True):
     # 參數設定（JSON 欄位）
     parameter: Optional[Dict[str, Any]] = Field(
         default=None,
-        sa_column=Column(JSON),
+        sa_column=Column(JSONDocument),
         description="端口參數設定（JSON 格式）"
     )
 
@@ -53,3 +55,7 @@ class EqpPort(SQLModel, table=True):
     )
 
     model_config = ConfigDict(from_attributes=True)
+
+
+# WHERE parameter @> ?（param.<key>=<value> 篩選）
+json_document_index("ix_eqp_port_parameter", EqpPort.parameter)
@@ -3,9 +3,11 @@ AGVC 系統資料模型 - 任務表
 """
 from typing import Optional, Dict, Any
 from datetime import datetime
-from sqlmodel import SQLModel, Field, Column, JSON
+from sqlmodel import SQLModel, Field, Column, Index
 from pydantic import ConfigDict
 
+from app.models.types import JSONDocument, json_document_index
+
 
 class Task(SQLModel, table=True):
     """任務表 - 記錄 AGV 執行的任務資訊"""
@@ -17,7 +19,6 @@ class Task(SQLModel, table=True):
     # 任務關聯
     parent_task_id: int = Field(
         default=0,
-        index=True,
         description="父任務 ID，用於子任務關聯，0 表示無父任務"
     )
     work_id: int = Field(
@@ -39,13 +40,11 @@ class Task(SQLModel, table=True):
 
     # 狀態和執行資訊
     status_id: int = Field(
-        index=True,
         description="任務狀態 ID"
     )
     agv_name: str = Field(
         default="na",
         max_length=20,
-        index=True,
         description="執行任務的 AGV 名稱"
     )
 
@@ -63,7 +62,7 @@ class Task(SQLModel, table=True):
     # 參數設定（JSON 欄位）
     parameter: Optional[Dict[str, Any]] = Field(
         default_factory=lambda: {"pr1": "na"},
-        sa_column=Column(JSON),
+        sa_column=Column(JSONDocument),
         description="任務參數設定（JSON 格式）"
     )
 
@@ -78,3 +77,26 @@ class Task(SQLModel, table=True):
     )
 
     model_config = ConfigDict(from_attributes=True)
+
+
+# parent_task_id / status_id / agv_name 不另建單欄索引：以下複合索引的第一欄即可涵蓋單欄查詢，
+# 多一個索引只會增加每次寫入的維護成本（既有資料庫的舊索引由 scripts/db_init.py 刪除）
+
+# 複合索引：對應派車器的主要查詢
+# WHERE status_id = ? ORDER BY priority DESC, created_at ASC, id ASC
+Index(
+    "ix_task_status_priority_created",
+    Task.status_id, Task.priority.desc(), Task.created_at, Task.id,
+)
+# WHERE created_at >= ? AND created_at < ? ORDER BY created_at, id（匯出報表）
+Index("ix_task_created_at", Task.created_at, Task.id)
+# WHERE agv_name = ? AND status_id = ?（查詢某台 AGV 的任務）
+Index("ix_task_agv_name_status", Task.agv_name, Task.status_id)
+# WHERE parent_task_id = ?（子任務、任務樹的遞迴查詢；含 status_id 供狀態統計只讀索引）
+Index("ix_task_parent_status", Task.parent_task_id, Task.status_id)
+
+# 不建立只涵蓋進行中任務的部分索引：派車器與列表都以 status_id = ? 查詢，
+# 規劃器無法證明符合 status_id IN (...) 的部分索引條件，由 ix_task_status_priority_created 處理
+
+# WHERE parameter @> ?（GET /task/ 的 param.<key>=<value> 篩選）
+json_document_index("ix_task_parameter", Task.parameter)
@@ -0,0 +1,52 @@
+"""
+AGVC 系統資料模型 - 任務變更事件
+"""
+from typing import Optional, Dict, Any
+from datetime import datetime
+from sqlmodel import SQLModel, Field, Column
+from sqlalchemy import BigInteger, Integer
+from pydantic import ConfigDict
+
+from app.models.types import JSONDocument
+
+
+class TaskEvent(SQLModel, table=True):
+    """
+    任務變更事件表 - 由 task 表的觸發器寫入（scripts/db_init.py 建立）
+
+    事件 ID 遞增，作為 SSE 串流的事件 ID 與重新連線時的續傳依據；
+    超過保留時間的事件會被定期刪除
+    """
+    __tablename__ = "task_event"
+
+    # 主鍵（bigserial）
+    id: Optional[int] = Field(
+        default=None,
+        sa_column=Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    )
+
+    # 事件內容
+    task_id: int = Field(description="任務 ID")
+    op: str = Field(max_length=10, description="變更類型：INSERT, UPDATE, DELETE, ARCHIVE（搬移至歷史表）")
+
+    # 篩選欄位（UPDATE 同時記錄變更前的值，讓「離開」篩選條件的任務也能被通知）
+    status_id: int = Field(description="任務狀態 ID（DELETE / ARCHIVE 為刪除前的值）")
+    agv_name: str = Field(max_length=20, description="AGV 名稱（DELETE / ARCHIVE 為刪除前的值）")
+    old_status_id: Optional[int] = Field(default=None, description="變更前的任務狀態 ID（僅 UPDATE）")
+    old_agv_name: Optional[str] = Field(default=None, max_length=20, description="變更前的 AGV 名稱（僅 UPDATE）")
+
+    # 任務資料列（DELETE / ARCHIVE 為刪除前的資料）；觸發器以 to_jsonb() 寫入，JSONB 欄位不需再轉型
+    data: Optional[Dict[str, Any]] = Field(
+        default=None,
+        sa_column=Column(JSONDocument),
+        description="任務資料（JSON 格式）"
+    )
+
+    # 時間戳記
+    created_at: datetime = Field(
+        default_factory=datetime.now,
+        index=True,
+        description="事件時間"
+    )
+
+    model_config = ConfigDict(from_attributes=True)
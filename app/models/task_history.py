@@ -0,0 +1,70 @@
+"""
+AGVC 系統資料模型 - 任務歷史表
+"""
+from typing import Optional, Dict, Any
+from datetime import datetime
+from sqlmodel import SQLModel, Field, Column, Index
+from pydantic import ConfigDict
+
+from app.models.types import JSONDocument, json_document_index
+
+
+class TaskHistory(SQLModel, table=True):
+    """
+    任務歷史表 - 已完成的任務由背景工作從 task 表搬移至此（app/core/archiver.py）
+
+    以 created_at 按月分區（RANGE），分區由搬移工作依需要建立，另有 DEFAULT 分區；
+    分區表的主鍵必須包含分區鍵，因此主鍵為 (id, created_at)，id 沿用原任務 ID
+    """
+    __tablename__ = "task_history"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
+
+    # 主鍵
+    id: int = Field(
+        primary_key=True,
+        sa_column_kwargs={"autoincrement": False},
+        description="原任務 ID"
+    )
+    created_at: datetime = Field(
+        primary_key=True,
+        description="建立時間（分區鍵）"
+    )
+
+    # 任務關聯
+    parent_task_id: int = Field(default=0, index=True, description="父任務 ID，0 表示無父任務")
+    work_id: int = Field(index=True, description="工作 ID")
+
+    # 端口資訊
+    from_port: str = Field(default="na", max_length=50, description="起始端口")
+    to_port: str = Field(default="na", max_length=50, description="目標端口")
+
+    # 狀態和執行資訊
+    status_id: int = Field(description="任務狀態 ID")
+    agv_name: str = Field(default="na", max_length=20, description="執行任務的 AGV 名稱")
+
+    # 任務屬性
+    priority: int = Field(default=0, description="優先級（數字越大優先級越高）")
+    material_code: str = Field(default="na", max_length=50, description="物料代碼")
+
+    # 參數設定（JSON 欄位）
+    parameter: Optional[Dict[str, Any]] = Field(
+        default=None,
+        sa_column=Column(JSONDocument),
+        description="任務參數設定（JSON 格式）"
+    )
+
+    # 時間戳記
+    updated_at: Optional[datetime] = Field(default=None, description="更新時間")
+    archived_at: Optional[datetime] = Field(default_factory=datetime.now, description="搬移至歷史表的時間")
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+# 依 ID 查詢使用主鍵 (id, created_at) 的前綴；不知道 created_at 時每個分區各查一次主鍵索引
+# WHERE agv_name = ? ORDER BY created_at（查詢某台 AGV 的歷史任務）
+Index("ix_task_history_agv_name_created", TaskHistory.agv_name, TaskHistory.created_at)
+# WHERE status_id = ? ORDER BY created_at
+Index("ix_task_history_status_created", TaskHistory.status_id, TaskHistory.created_at)
+
+# WHERE parameter @> ?（param.<key>=<value> 篩選）
+json_document_index("ix_task_history_parameter", TaskHistory.parameter)
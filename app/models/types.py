@@ -0,0 +1,27 @@
+"""
+共用欄位型別
+"""
+from sqlalchemy import JSON, Index
+from sqlalchemy.dialects.postgresql import JSONB
+
+# JSON 文件欄位（parameter）：PostgreSQL 使用 JSONB，可建立 GIN 索引、以 @> 查詢、以 || 部分更新；
+# 其他資料庫使用 JSON
+JSONDocument = JSON().with_variant(JSONB(), "postgresql")
+
+
+def json_document_index(name: str, column) -> Index:
+    """
+    JSON 文件欄位的 GIN 索引（WHERE parameter @> ?，即 param.<key>=<value> 篩選）
+
+    使用 jsonb_path_ops 運算子類別：只支援 @>，不支援 ?、?|、?& 等鍵存在查詢，
+    但只索引路徑與值的雜湊，索引比預設的 jsonb_ops 小、@> 查詢也較快；
+    parameter 篩選只會產生 @>，需要鍵存在查詢時改用預設運算子類別
+
+    Args:
+        name: 索引名稱
+        column: 模型上的 JSON 文件欄位，例如 AGV.parameter
+
+    Returns:
+        SQLAlchemy Index（只在 PostgreSQL 上使用 GIN）
+    """
+    return Index(name, column, postgresql_using="gin", postgresql_ops={column.key: "jsonb_path_ops"})
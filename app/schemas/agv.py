@@ -31,6 +31,17 @@ class AGVCreate(BaseModel):
     )
 
 
+class AGVUpsert(BaseModel):
+    """依名稱新增或更新 AGV 的請求模型 - 名稱取自路徑"""
+    model: str = Field(..., description="AGV 型號：K400, Cargo, Loader, Unloader（必填）")
+    description: Optional[str] = Field("N/A", description="AGV 描述，預設為 N/A")
+    enable: int = Field(1, description="啟用狀態：1=啟用, 0=停用")
+    parameter: Dict[str, Any] = Field(
+        default_factory=lambda: {"ip": "", "port": 0, "work_id": 0},
+        description="AGV 參數設定（JSON 格式），預設為 {\"ip\":\"\",\"port\":0,\"work_id\":0}"
+    )
+
+
 class AGVUpdate(BaseModel):
     """更新 AGV 的請求模型 - 所有欄位都是選填"""
     name: Optional[str] = None
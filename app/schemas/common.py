@@ -0,0 +1,33 @@
+"""
+共用 Schemas
+多個資源共用的請求與回應模型
+"""
+from typing import Generic, List, Optional, TypeVar, Union
+from pydantic import BaseModel, Field
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+
+class IdsRequest(BaseModel):
+    """依 ID 列表查詢的請求模型（POST /many）"""
+    ids: List[int] = Field(
+        ..., min_length=1, max_length=settings.MULTI_GET_MAX_SIZE,
+        description=f"ID 列表（最多 {settings.MULTI_GET_MAX_SIZE} 筆）"
+    )
+
+
+class NamesRequest(BaseModel):
+    """依名稱列表查詢的請求模型（POST /many/by-name）"""
+    names: List[str] = Field(
+        ..., min_length=1, max_length=settings.MULTI_GET_MAX_SIZE,
+        description=f"名稱列表（最多 {settings.MULTI_GET_MAX_SIZE} 筆）"
+    )
+
+
+class MultiGetItem(BaseModel, Generic[T]):
+    """multi-get 的單筆結果 - 依請求順序排列，找不到時 found 為 False、data 為 null"""
+    key: Union[int, str]
+    found: bool
+    data: Optional[T] = None
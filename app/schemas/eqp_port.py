@@ -16,6 +16,14 @@ class EqpPortCreate(BaseModel):
     parameter: Optional[Dict[str, Any]] = Field(None, description="端口參數設定（JSON 格式）")
 
 
+class EqpPortUpsert(BaseModel):
+    """依名稱新增或更新 EqpPort 的請求模型 - 名稱取自路徑"""
+    eqp_name: str = Field(..., description="所屬設備名稱")
+    node: str = Field(..., description="節點編號")
+    description: Optional[str] = Field("N/A", description="端口描述，預設為 N/A")
+    parameter: Optional[Dict[str, Any]] = Field(None, description="端口參數設定（JSON 格式）")
+
+
 class EqpPortUpdate(BaseModel):
     """更新 EqpPort 的請求模型 - 所有欄位都是選填"""
     name: Optional[str] = None
@@ -0,0 +1,23 @@
+"""
+State Schemas
+用於 WebSocket 狀態訂閱的訊息模型
+"""
+from typing import List, Literal
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class StateSubscription(BaseModel):
+    """訂閱 / 取消訂閱的請求訊息"""
+    action: Literal["subscribe", "unsubscribe"] = Field(..., description="subscribe 或 unsubscribe")
+    agv_names: List[str] = Field(default_factory=list, description="AGV 名稱列表")
+    eqp_names: List[str] = Field(default_factory=list, description="設備名稱列表（訂閱該設備的所有端口）")
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "action": "subscribe",
+                "agv_names": ["AGV01", "AGV02"],
+                "eqp_names": ["EQ01"]
+            }
+        }
+    )
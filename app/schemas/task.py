@@ -2,9 +2,11 @@
 Task Schemas
 用於 API 請求和回應的資料模型
 """
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+
+from app.core.config import settings
 
 
 class TaskCreate(BaseModel):
@@ -51,6 +53,14 @@ class TaskUpdate(BaseModel):
     material_code: Optional[str] = None
     parameter: Optional[Dict[str, Any]] = None
 
+    @model_validator(mode="after")
+    def reject_nulls(self):
+        """欄位可省略，但不能明確設為 null（task 的欄位皆為 NOT NULL，直接寫入會違反約束）"""
+        nulls = sorted(name for name in self.model_fields_set if getattr(self, name) is None)
+        if nulls:
+            raise ValueError(f"欄位不可為 null: {', '.join(nulls)}")
+        return self
+
 
 class TaskResponse(BaseModel):
     """Task 回應模型 - 固定欄位順序"""
@@ -68,3 +78,63 @@ class TaskResponse(BaseModel):
     updated_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class TaskTreeNode(TaskResponse):
+    """任務樹節點 - 任務欄位加上層數與子任務"""
+    depth: int = Field(..., description="層數，根任務為 0")
+    status_counts: Optional[Dict[int, int]] = Field(
+        None, description="本節點及其子孫任務依 status_id 的筆數（rollup=true 時提供）"
+    )
+    children: List["TaskTreeNode"] = Field(default_factory=list, description="子任務")
+
+
+class TaskBatchUpdate(BaseModel):
+    """批次更新 Task 的請求模型 - 以 ids 或篩選條件選取任務（至少提供一項）"""
+    ids: Optional[List[int]] = Field(
+        None, max_length=settings.MULTI_GET_MAX_SIZE,
+        description=f"任務 ID 列表（最多 {settings.MULTI_GET_MAX_SIZE} 筆）"
+    )
+    status_id: Optional[int] = Field(None, description="按狀態 ID 篩選")
+    agv_name: Optional[str] = Field(None, description="按 AGV 名稱篩選")
+    work_id: Optional[int] = Field(None, description="按工作 ID 篩選")
+    values: TaskUpdate = Field(..., description="要更新的欄位（只更新有提供的欄位）")
+    return_rows: bool = Field(True, description="是否回傳更新後的任務，False 時只回傳筆數")
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "work_id": 1,
+                "status_id": 1,
+                "values": {"status_id": 9},
+                "return_rows": False
+            }
+        }
+    )
+
+
+class TaskBatchUpdateResult(BaseModel):
+    """批次更新 Task 的回應模型"""
+    updated: int
+    tasks: Optional[List[TaskResponse]] = None
+
+
+class TaskClaim(BaseModel):
+    """領取 Task 的請求模型 - 原子性地取得最高優先、最早建立的可執行任務"""
+    agv_name: str = Field(..., description="領取任務的 AGV 名稱（必填）")
+    from_status_id: int = Field(..., description="可領取的任務狀態 ID（必填）")
+    to_status_id: int = Field(..., description="領取後的任務狀態 ID（必填）")
+    limit: int = Field(1, ge=1, le=100, description="最多領取筆數，預設 1")
+    work_id: Optional[int] = Field(None, description="只領取指定工作 ID 的任務（選填）")
+    unassigned_only: bool = Field(True, description="只領取尚未指派 AGV（agv_name 為 na）的任務，預設 True")
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "agv_name": "AGV01",
+                "from_status_id": 1,
+                "to_status_id": 2,
+                "limit": 1
+            }
+        }
+    )
@@ -0,0 +1,135 @@
+"""
+列表回應序列化效能比較
+
+比較列表路由的兩種回應方式（不連線資料庫，以記憶體中的資料列測試）：
+1. response_model：FastAPI 的 serialize_response（逐筆驗證 + 序列化）再由 JSONResponse 轉為 JSON
+2. 快速序列化：app.core.serialization.RowSerializer（orjson 或 pydantic TypeAdapter）
+
+使用方式：
+    python scripts/bench_serialization.py
+    python scripts/bench_serialization.py --sizes 100,1000,5000 --repeat 20 --table agv
+"""
+import sys
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+# 加入專案根目錄到 Python 路徑
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.core import serialization
+from app.models import AGV, EqpPort, Task
+from app.schemas.agv import AGVResponse
+from app.schemas.eqp_port import EqpPortResponse
+from app.schemas.task import TaskResponse
+
+
+def make_rows(table: str, size: int) -> list:
+    """產生測試資料列"""
+    base = datetime(2025, 1, 1, 8, 0, 0)
+    rows = []
+    for i in range(1, size + 1):
+        created_at = base + timedelta(seconds=i)
+        if table == "task":
+            rows.append(Task(
+                id=i, parent_task_id=0, work_id=i % 50, from_port=f"P{i % 200:03d}",
+                to_port=f"P{(i + 7) % 200:03d}", status_id=i % 5, agv_name=f"AGV{i % 20:02d}",
+                priority=i % 10, material_code=f"M{i:06d}",
+                parameter={"pr1": "na", "lot": f"L{i}", "qty": i % 25, "tags": ["a", "b"]},
+                created_at=created_at, updated_at=created_at,
+            ))
+        elif table == "agv":
+            rows.append(AGV(
+                id=i, name=f"AGV{i:04d}", description="測試車輛", model="K400", enable=1,
+                parameter={"ip": f"10.0.{i // 256}.{i % 256}", "port": 502, "work_id": i % 50},
+                created_at=created_at, updated_at=created_at,
+            ))
+        else:
+            rows.append(EqpPort(
+                id=i, name=f"PORT{i:05d}", eqp_name=f"EQ{i % 100:03d}", node=f"N{i}",
+                description=None, parameter={"slot": i % 4},
+                created_at=created_at, updated_at=created_at,
+            ))
+    return rows
+
+
+def measure(func, repeat: int) -> tuple[float, float]:
+    """執行 repeat 次，回傳 (平均, 最小) 毫秒"""
+    func()  # 預熱
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.mean(timings), min(timings)
+
+
+def main():
+    """主函數"""
+    parser = argparse.ArgumentParser(description="列表回應序列化效能比較")
+    parser.add_argument("--sizes", default="100,1000,5000", help="資料列數（逗號分隔）")
+    parser.add_argument("--repeat", type=int, default=20, help="每種方式重複次數")
+    parser.add_argument("--table", choices=["task", "agv", "eqp_port"], default="task")
+    args = parser.parse_args()
+
+    model, schema = {
+        "task": (Task, TaskResponse),
+        "agv": (AGV, AGVResponse),
+        "eqp_port": (EqpPort, EqpPortResponse),
+    }[args.table]
+    field = create_model_field(name="Response", type_=List[model], mode="serialization")
+    serializer = serialization.get_serializer(schema)
+    orjson = serialization.orjson
+
+    def response_model_path(rows):
+        content = asyncio.run(serialize_response(field=field, response_content=rows))
+        return JSONResponse(content).body
+
+    def type_adapter_path(rows):
+        # 強制使用 TypeAdapter（模擬未安裝 orjson）
+        serialization.orjson = None
+        try:
+            return serializer.dumps(rows)
+        finally:
+            serialization.orjson = orjson
+
+    paths = [("response_model", response_model_path)]
+    if orjson is not None:
+        paths.append(("fast (orjson)", serializer.dumps))
+    paths.append(("fast (TypeAdapter)", type_adapter_path))
+
+    print("=" * 70)
+    print(f"列表回應序列化效能比較 - {args.table}（{schema.__name__} 欄位順序）")
+    print("=" * 70)
+    print(f"{'筆數':>8}  {'方式':<20}{'平均(ms)':>12}{'最小(ms)':>12}{'加速':>10}")
+    print("-" * 70)
+
+    for size in [int(s) for s in args.sizes.split(",")]:
+        rows = make_rows(args.table, size)
+
+        # 確認輸出內容一致（欄位順序可能不同，以解析後的內容比較）
+        expected = json.loads(response_model_path(rows))
+        for name, func in paths[1:]:
+            if json.loads(func(rows)) != expected:
+                print(f"[警告] {name} 的輸出與 response_model 不一致")
+
+        baseline = None
+        for name, func in paths:
+            mean, best = measure(lambda: func(rows), args.repeat)
+            baseline = baseline or mean
+            print(f"{size:>8}  {name:<20}{mean:>12.2f}{best:>12.2f}{baseline / mean:>9.1f}x")
+        print("-" * 70)
+
+
+if __name__ == '__main__':
+    main()
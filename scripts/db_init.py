@@ -5,6 +5,12 @@
 1. 測試資料庫連線
 2. 使用 SQLModel 建立資料表
 3. 列出所有資料庫
+4. 以 CREATE INDEX CONCURRENTLY 補建模型上新增的索引（不鎖表）
+5. 建立資料變更通知觸發器（LISTEN/NOTIFY，供 API 快取跨行程失效）
+6. 建立任務變更事件觸發器（寫入 task_event 並通知，供 SSE 串流使用）
+7. 建立 task_history 的 DEFAULT 分區與當月、下月分區
+8. 將 JSON 欄位（parameter、task_event.data）轉為 JSONB（需在建立 GIN 索引前完成）
+9. 以 DROP INDEX CONCURRENTLY 刪除已被複合索引涵蓋的舊索引（不鎖表）
 """
 import sys
 from pathlib import Path
@@ -13,9 +19,17 @@ from pathlib import Path
 ROOT_DIR = Path(__file__).parent.parent
 sys.path.insert(0, str(ROOT_DIR))
 
+from datetime import datetime, timedelta
+
 import psycopg2
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.schema import CreateIndex
 from sqlmodel import SQLModel, create_engine
-from app.models import AGV, EqpPort, Task
+from app.models import AGV, EqpPort, Task, TaskEvent, TaskHistory
+from app.crud.aio.task_history import partition_name
+from app.core.notify import CHANGE_CHANNEL, TASK_EVENT_CHANNEL
 
 # 從 docker-compose.yaml 讀取的資料庫連線資訊
 DB_CONFIG = {
@@ -110,6 +124,257 @@ def create_tables():
         return False
 
 
+def migrate_json_columns():
+    """
+    將模型宣告為 JSONB、但資料庫中仍為 json 的欄位轉為 jsonb
+
+    ALTER COLUMN ... TYPE jsonb 會重寫整張表並持有 ACCESS EXCLUSIVE 鎖，
+    大表請在維護時段執行；已是 jsonb 的欄位會略過，可重複執行
+    """
+    try:
+        print("\n" + "=" * 50)
+        print("開始轉換 JSON 欄位為 JSONB...")
+        print("=" * 50)
+
+        engine = create_engine(DATABASE_URL)
+        dialect = postgresql.dialect()
+
+        with engine.begin() as conn:
+            for table in SQLModel.metadata.sorted_tables:
+                for column in table.columns:
+                    if not isinstance(column.type.dialect_impl(dialect), JSONB):
+                        continue
+                    data_type = conn.execute(text("""
+                        SELECT data_type FROM information_schema.columns
+                        WHERE table_schema = current_schema() AND table_name = :table AND column_name = :column
+                    """), {"table": table.name, "column": column.name}).scalar()
+                    if data_type != "json":
+                        continue
+                    conn.execute(text(
+                        f'ALTER TABLE {table.name} ALTER COLUMN "{column.name}" TYPE jsonb USING "{column.name}"::jsonb'
+                    ))
+                    print(f"  - {table.name}.{column.name}")
+
+        print("\n[成功] 欄位轉換完成！")
+        return True
+
+    except Exception as e:
+        print(f"\n[失敗] 轉換欄位時發生錯誤: {e}")
+        return False
+
+
+# 已由其他索引涵蓋、從模型移除的索引（既有資料庫中需刪除，避免每次寫入都要維護）
+DROPPED_INDEXES = [
+    # 由 ix_task_parent_status / ix_task_status_priority_created / ix_task_agv_name_status 的第一欄涵蓋
+    "ix_task_parent_task_id",
+    "ix_task_status_id",
+    "ix_task_agv_name",
+    # 進行中任務的部分索引：查詢以 status_id = ? 篩選，規劃器不會使用
+    "ix_task_active_priority_created",
+    "ix_task_active_agv_name",
+]
+
+
+def drop_indexes():
+    """
+    以 DROP INDEX CONCURRENTLY 刪除 DROPPED_INDEXES 中的索引
+
+    不會阻擋讀寫，但不能在交易內執行，因此使用 AUTOCOMMIT 連線；不存在的索引會略過，可重複執行
+    """
+    try:
+        print("\n" + "=" * 50)
+        print("開始刪除多餘索引（CONCURRENTLY）...")
+        print("=" * 50)
+
+        engine = create_engine(DATABASE_URL)
+
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for name in DROPPED_INDEXES:
+                conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+                print(f"  - {name}")
+
+        print("\n[成功] 索引刪除完成！")
+        return True
+
+    except Exception as e:
+        print(f"\n[失敗] 刪除索引時發生錯誤: {e}")
+        return False
+
+
+def create_indexes():
+    """
+    以 CREATE INDEX CONCURRENTLY 建立模型上宣告、但資料庫中尚未存在的索引
+
+    create_all 只會為新建的資料表建立索引，既有資料表上新增的索引需要另外補建；
+    CONCURRENTLY 不會阻擋寫入，但不能在交易內執行，因此使用 AUTOCOMMIT 連線。
+    先前中斷而留下的無效（INVALID）索引會先刪除再重建。
+    分區表（task_history）不支援 CONCURRENTLY，改用一般的 CREATE INDEX
+    """
+    try:
+        print("\n" + "=" * 50)
+        print("開始建立索引（CONCURRENTLY）...")
+        print("=" * 50)
+
+        engine = create_engine(DATABASE_URL)
+        dialect = postgresql.dialect()
+
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for table in SQLModel.metadata.sorted_tables:
+                for index in sorted(table.indexes, key=lambda i: i.name):
+                    invalid = conn.execute(text("""
+                        SELECT 1 FROM pg_index i
+                        JOIN pg_class c ON c.oid = i.indexrelid
+                        WHERE c.relname = :name AND NOT i.indisvalid
+                    """), {"name": index.name}).first()
+                    if invalid:
+                        print(f"  - 刪除無效索引 {index.name}")
+                        conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{index.name}"'))
+
+                    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect))
+                    if not table.dialect_options["postgresql"].get("partition_by"):
+                        ddl = ddl.replace("INDEX IF NOT EXISTS", "INDEX CONCURRENTLY IF NOT EXISTS", 1)
+                    conn.execute(text(ddl))
+                    print(f"  - {table.name}.{index.name}")
+
+        print("\n[成功] 索引建立完成！")
+        return True
+
+    except Exception as e:
+        print(f"\n[失敗] 建立索引時發生錯誤: {e}")
+        return False
+
+
+# 資料變更通知觸發器：資料列新增/更新/刪除時送出 {"table", "op", "id", "name", "eqp_name"}
+# （eqp_name 只有 eqp_port 有值，供 WebSocket 依設備名稱訂閱）
+NOTIFY_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION agvc_notify_change() RETURNS trigger AS $$
+DECLARE
+    row_data jsonb;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        row_data := to_jsonb(OLD);
+    ELSE
+        row_data := to_jsonb(NEW);
+    END IF;
+    PERFORM pg_notify('{CHANGE_CHANNEL}', jsonb_build_object(
+        'table', TG_TABLE_NAME,
+        'op', TG_OP,
+        'id', row_data->'id',
+        'name', row_data->'name',
+        'eqp_name', row_data->'eqp_name'
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# 需要發送變更通知的資料表
+NOTIFY_TABLES = [AGV.__tablename__, EqpPort.__tablename__]
+
+# 任務變更事件觸發器：寫入 task_event 後送出內容為空的通知
+# （同一交易內相同的通知只會送出一次，批次更新不會產生大量通知）
+# 搬移工作在交易內設定 agvc.archiving = 'on'，此時刪除記錄為 ARCHIVE 而非 DELETE
+TASK_EVENT_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION agvc_task_event() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO {TaskEvent.__tablename__} (task_id, op, status_id, agv_name, data, created_at)
+        VALUES (
+            OLD.id,
+            CASE WHEN current_setting('agvc.archiving', true) = 'on' THEN 'ARCHIVE' ELSE TG_OP END,
+            OLD.status_id, OLD.agv_name, to_jsonb(OLD), now()
+        );
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO {TaskEvent.__tablename__} (task_id, op, status_id, agv_name, old_status_id, old_agv_name, data, created_at)
+        VALUES (NEW.id, TG_OP, NEW.status_id, NEW.agv_name, OLD.status_id, OLD.agv_name, to_jsonb(NEW), now());
+    ELSE
+        INSERT INTO {TaskEvent.__tablename__} (task_id, op, status_id, agv_name, data, created_at)
+        VALUES (NEW.id, TG_OP, NEW.status_id, NEW.agv_name, to_jsonb(NEW), now());
+    END IF;
+    PERFORM pg_notify('{TASK_EVENT_CHANNEL}', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def create_triggers():
+    """
+    建立資料變更通知觸發器
+
+    API 的 AGV / EqpPort 快取與 WebSocket 狀態訂閱依賴此通知在多個 worker 間同步；
+    任務變更串流（GET /task/stream）依賴 task 表的事件觸發器
+    """
+    try:
+        print("\n" + "=" * 50)
+        print("開始建立通知觸發器...")
+        print("=" * 50)
+
+        engine = create_engine(DATABASE_URL)
+        with engine.begin() as conn:
+            conn.execute(text(NOTIFY_FUNCTION_SQL))
+            for table_name in NOTIFY_TABLES:
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {table_name}_notify_change ON {table_name}"))
+                conn.execute(text(f"""
+                    CREATE TRIGGER {table_name}_notify_change
+                    AFTER INSERT OR UPDATE OR DELETE ON {table_name}
+                    FOR EACH ROW EXECUTE FUNCTION agvc_notify_change()
+                """))
+                print(f"  - {table_name}_notify_change")
+
+            conn.execute(text(TASK_EVENT_FUNCTION_SQL))
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {Task.__tablename__}_event ON {Task.__tablename__}"))
+            conn.execute(text(f"""
+                CREATE TRIGGER {Task.__tablename__}_event
+                AFTER INSERT OR UPDATE OR DELETE ON {Task.__tablename__}
+                FOR EACH ROW EXECUTE FUNCTION agvc_task_event()
+            """))
+            print(f"  - {Task.__tablename__}_event")
+
+        print("\n[成功] 觸發器建立完成！")
+        return True
+
+    except Exception as e:
+        print(f"\n[失敗] 建立觸發器時發生錯誤: {e}")
+        return False
+
+
+def create_partitions():
+    """
+    建立 task_history 的 DEFAULT 分區與當月、下月分區
+
+    之後的月分區由搬移工作在需要時建立；沒有對應月分區的資料寫入 DEFAULT 分區
+    """
+    try:
+        print("\n" + "=" * 50)
+        print("開始建立歷史表分區...")
+        print("=" * 50)
+
+        table_name = TaskHistory.__tablename__
+        this_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        next_month = (this_month.replace(day=28) + timedelta(days=4)).replace(day=1)
+        month_after = (next_month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+        engine = create_engine(DATABASE_URL)
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE TABLE IF NOT EXISTS {table_name}_default PARTITION OF {table_name} DEFAULT"))
+            print(f"  - {table_name}_default")
+            for start, end in ((this_month, next_month), (next_month, month_after)):
+                name = partition_name(start)
+                conn.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table_name} "
+                    f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+                ))
+                print(f"  - {name}")
+
+        print("\n[成功] 分區建立完成！")
+        return True
+
+    except Exception as e:
+        print(f"\n[失敗] 建立分區時發生錯誤: {e}")
+        return False
+
+
 def main():
     """主函數"""
     print("=" * 50)
@@ -130,6 +395,21 @@ def main():
     # 2. 建立資料表
     create_tables()
 
+    # 3. 建立歷史表分區
+    create_partitions()
+
+    # 4. 轉換 JSON 欄位為 JSONB
+    migrate_json_columns()
+
+    # 5. 補建索引
+    create_indexes()
+
+    # 6. 刪除多餘索引
+    drop_indexes()
+
+    # 7. 建立通知觸發器
+    create_triggers()
+
     print("\n" + "=" * 50)
     print("操作完成！")
     print("=" * 50)
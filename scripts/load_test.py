@@ -0,0 +1,404 @@
+"""
+API 負載測試
+
+以 asyncio 模擬多個同時連線的用戶端，對 API 送出接近實際使用情境的混合請求，
+統計各端點的吞吐量與 p50 / p95 / p99 延遲（取代只能在 Windows 執行的 test_concurrent.ps1）：
+- dispatcher：派車器輪詢待執行任務與可用 AGV
+- agv：任務生命週期，新增任務 -> 領取（POST /task/claim）-> 完成（PATCH）
+- hmi：畫面輪詢任務列表（展開端口 / AGV）、任務數、AGV 與端口列表
+- 列表輪詢都帶 If-None-Match，資料未變更時為 304（與實際用戶端相同）
+
+未指定 --url 時以 httpx.ASGITransport 在同一行程內呼叫 app（仍使用 Settings 設定的資料庫，
+並執行啟動 / 關閉事件）；指定時對已啟動的服務（例如 http://localhost:8000）送出請求。
+測試建立的任務以 --work-id 區隔，結束時刪除（--keep-tasks 保留）。
+
+使用方式：
+    python scripts/load_test.py
+    python scripts/load_test.py --url http://localhost:8000 --stages 10@30,50@60,50@120,0@10
+    python scripts/load_test.py --mix dispatcher=2,agv=5,hmi=3 --output results/run1.json
+    python scripts/load_test.py --compare results/run1.json --output results/run2.json
+"""
+import sys
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import math
+import platform
+import random
+import time
+from datetime import datetime
+from pathlib import Path
+
+# 加入專案根目錄到 Python 路徑
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+import httpx
+
+API = "/api/v1"
+
+
+class EndpointStats:
+    """單一端點的延遲與狀態碼統計"""
+
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.statuses: dict[str, int] = {}
+        self.errors = 0
+
+    def record(self, status: str, elapsed: float, failed: bool):
+        self.latencies.append(elapsed)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if failed:
+            self.errors += 1
+
+    def summary(self, duration: float) -> dict:
+        """
+        統計結果
+
+        Args:
+            duration: 測試總秒數（計算吞吐量）
+
+        Returns:
+            {"requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms", "max_ms", "statuses"}
+        """
+        latencies = sorted(self.latencies)
+        return {
+            "requests": len(latencies),
+            "errors": self.errors,
+            "rps": round(len(latencies) / duration, 2) if duration > 0 else 0.0,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "max_ms": round(latencies[-1] * 1000, 3) if latencies else None,
+            "statuses": dict(sorted(self.statuses.items())),
+        }
+
+
+def percentile(sorted_values: list[float], p: float) -> float | None:
+    """最近排名法百分位數（秒 -> 毫秒）"""
+    if not sorted_values:
+        return None
+    rank = min(len(sorted_values), max(1, math.ceil(len(sorted_values) * p / 100)))
+    return round(sorted_values[rank - 1] * 1000, 3)
+
+
+class LoadTest:
+    """負載測試執行狀態"""
+
+    def __init__(self, client: httpx.AsyncClient, args):
+        self.client = client
+        self.args = args
+        self.stats: dict[str, EndpointStats] = {}
+        self.created_task_ids: set[int] = set()
+        self._agv_numbers = itertools.count(1)
+
+    async def request(self, label: str, method: str, url: str, **kwargs) -> httpx.Response | None:
+        """
+        送出請求並記錄延遲
+
+        Args:
+            label: 統計用的端點名稱
+            method: HTTP 方法
+            url: 路徑（相對於 base_url）
+
+        Returns:
+            Response；連線錯誤或逾時時為 None
+        """
+        stats = self.stats.get(label)
+        if stats is None:
+            stats = self.stats[label] = EndpointStats()
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            stats.record(type(e).__name__, time.perf_counter() - start, True)
+            return None
+        stats.record(str(response.status_code), time.perf_counter() - start, response.status_code >= 400)
+        return response
+
+    async def think(self):
+        """用戶端操作間隔（±50% 隨機，避免所有用戶同步送出）"""
+        await asyncio.sleep(self.args.think * random.uniform(0.5, 1.5))
+
+    async def poll(self, label: str, url: str, etags: dict[str, str], params: dict | None = None):
+        """
+        條件式 GET：帶上次的 ETag 輪詢，資料未變更時伺服器回傳 304
+
+        Args:
+            label: 統計用的端點名稱（同時作為 etags 的鍵）
+            url: 路徑
+            etags: 此用戶端各端點最後收到的 ETag
+            params: 查詢參數
+        """
+        headers = {"If-None-Match": etags[label]} if label in etags else {}
+        response = await self.request(label, "GET", url, params=params, headers=headers)
+        if response is not None and "etag" in response.headers:
+            etags[label] = response.headers["etag"]
+
+    async def dispatcher_user(self):
+        """派車器：輪詢待執行任務與可用 AGV"""
+        etags: dict[str, str] = {}
+        while True:
+            await self.poll(
+                "GET /task?status_id", f"{API}/task/", etags,
+                params={"status_id": self.args.pending_status, "limit": 50},
+            )
+            await self.poll("GET /agv?enabled_only", f"{API}/agv/", etags, params={"enabled_only": "true"})
+            await self.think()
+
+    async def agv_user(self):
+        """AGV：新增任務 -> 領取 -> 完成"""
+        agv_name = f"LOAD{next(self._agv_numbers):03d}"
+        while True:
+            response = await self.request("POST /task", "POST", f"{API}/task/", json={
+                "work_id": self.args.work_id,
+                "status_id": self.args.pending_status,
+                "from_port": "na",
+                "to_port": "na",
+                "priority": random.randint(0, 9),
+            })
+            if response is not None and response.status_code == 201:
+                self.created_task_ids.add(response.json()["id"])
+            await self.think()
+
+            response = await self.request("POST /task/claim", "POST", f"{API}/task/claim", json={
+                "agv_name": agv_name,
+                "from_status_id": self.args.pending_status,
+                "to_status_id": self.args.running_status,
+                "work_id": self.args.work_id,
+            })
+            claimed = response.json() if response is not None and response.status_code == 200 else []
+            await self.think()
+
+            for task in claimed:
+                await self.request(
+                    "PATCH /task/{task_id}", "PATCH", f"{API}/task/{task['id']}",
+                    json={"status_id": self.args.done_status},
+                )
+            await self.think()
+
+    async def hmi_user(self):
+        """HMI：輪詢任務列表、任務數、AGV 與端口列表"""
+        etags: dict[str, str] = {}
+        while True:
+            await self.poll(
+                "GET /task?expand", f"{API}/task/", etags,
+                params={"limit": 100, "expand": "from_port,to_port,agv"},
+            )
+            await self.request("GET /task/count/total", "GET", f"{API}/task/count/total")
+            await self.poll("GET /agv", f"{API}/agv/", etags)
+            await self.poll("GET /eqp_port", f"{API}/eqp_port/", etags)
+            await self.think()
+
+    async def cleanup(self):
+        """刪除測試建立的任務"""
+        semaphore = asyncio.Semaphore(20)
+
+        async def delete(task_id):
+            async with semaphore:
+                with contextlib.suppress(httpx.HTTPError):
+                    await self.client.delete(f"{API}/task/{task_id}")
+
+        await asyncio.gather(*(delete(task_id) for task_id in self.created_task_ids))
+
+
+def parse_stages(value: str) -> list[tuple[int, float]]:
+    """
+    解析負載階段
+
+    Args:
+        value: 例如 "10@30,50@60,0@10"：30 秒內線性增加到 10 個用戶，再 60 秒增加到 50 個，最後 10 秒降到 0
+
+    Returns:
+        [(目標用戶數, 秒數)]
+    """
+    stages = []
+    for item in value.split(","):
+        users, _, seconds = item.partition("@")
+        stages.append((int(users), float(seconds)))
+    return stages
+
+
+def parse_mix(value: str) -> list[str]:
+    """
+    解析用戶類型比例
+
+    Args:
+        value: 例如 "dispatcher=2,agv=5,hmi=3"
+
+    Returns:
+        依比例展開並交錯排列的用戶類型序列（依序指派給新加入的用戶，用戶數少時也涵蓋各類型）
+    """
+    slots = []
+    for item in value.split(","):
+        role, _, weight = item.partition("=")
+        if role not in ("dispatcher", "agv", "hmi"):
+            raise ValueError(f"不支援的用戶類型: {role}")
+        count = int(weight)
+        slots += [((k + 0.5) / count, role) for k in range(count)]
+    if not slots:
+        raise ValueError("至少需要一種用戶類型")
+    return [role for _, role in sorted(slots)]
+
+
+def target_users(stages: list[tuple[int, float]], elapsed: float) -> int:
+    """依經過時間計算目前應有的用戶數（各階段內線性變化）"""
+    previous = 0
+    for users, seconds in stages:
+        if elapsed < seconds:
+            return round(previous + (users - previous) * elapsed / seconds)
+        elapsed -= seconds
+        previous = users
+    return previous
+
+
+async def run(test: LoadTest, stages: list[tuple[int, float]], roles: list[str]) -> tuple[float, list[dict]]:
+    """
+    依負載階段增減用戶
+
+    Returns:
+        (實際執行秒數, 每秒的用戶數與累計請求數)
+    """
+    users: list[asyncio.Task] = []
+    role_cycle = itertools.cycle(roles)
+    timeline = []
+    total = sum(seconds for _, seconds in stages)
+    start = time.perf_counter()
+
+    while (elapsed := time.perf_counter() - start) < total:
+        target = target_users(stages, elapsed)
+        while len(users) < target:
+            users.append(asyncio.create_task(getattr(test, f"{next(role_cycle)}_user")()))
+        while len(users) > target:
+            users.pop().cancel()
+        timeline.append({
+            "second": round(elapsed, 1),
+            "users": len(users),
+            "requests": sum(len(stats.latencies) for stats in test.stats.values()),
+        })
+        await asyncio.sleep(1.0)
+
+    for user in users:
+        user.cancel()
+    await asyncio.gather(*users, return_exceptions=True)
+    return time.perf_counter() - start, timeline
+
+
+def print_report(results: dict, previous: dict | None):
+    """輸出各端點統計；提供前次結果時同時列出 p95 與吞吐量的變化"""
+    print("=" * 100)
+    print(f"{'端點':<26}{'請求數':>8}{'錯誤':>6}{'req/s':>9}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}"
+          f"{'max(ms)':>10}  {'與前次相比':<}")
+    print("-" * 100)
+    endpoints = dict(results["endpoints"])
+    endpoints["(全部)"] = results["total"]
+    for label, summary in endpoints.items():
+        if summary["requests"] == 0:
+            continue
+        diff = ""
+        before = (previous or {}).get(label)
+        if before and before.get("p95_ms") and summary["p95_ms"] is not None:
+            diff = (f"p95 {(summary['p95_ms'] / before['p95_ms'] - 1):+.0%}"
+                    f" / req/s {(summary['rps'] / before['rps'] - 1) if before['rps'] else 0:+.0%}")
+        print(f"{label:<26}{summary['requests']:>8}{summary['errors']:>6}{summary['rps']:>9.1f}"
+              f"{summary['p50_ms']:>10.2f}{summary['p95_ms']:>10.2f}{summary['p99_ms']:>10.2f}"
+              f"{summary['max_ms']:>10.2f}  {diff}")
+    print("=" * 100)
+
+
+async def main_async(args) -> int:
+    stages = parse_stages(args.stages) if args.stages else [(args.users, args.ramp), (args.users, args.duration)]
+    roles = parse_mix(args.mix)
+
+    if args.url:
+        transport = None
+        lifespan = contextlib.nullcontext()
+        base_url = args.url
+    else:
+        from app.main import app
+        transport = httpx.ASGITransport(app=app)
+        # ASGITransport 不會送出 lifespan 事件，由這裡執行 app 的啟動 / 關閉
+        lifespan = app.router.lifespan_context(app)
+        base_url = "http://loadtest"
+
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with lifespan, httpx.AsyncClient(
+        base_url=base_url, transport=transport, timeout=args.timeout, limits=limits
+    ) as client:
+        response = await client.get("/health")
+        response.raise_for_status()
+
+        test = LoadTest(client, args)
+        print(f"負載測試：{base_url}，階段 {stages}，用戶類型 {args.mix}")
+        duration, timeline = await run(test, stages, roles)
+        if not args.keep_tasks:
+            await test.cleanup()
+
+    all_stats = EndpointStats()
+    for stats in test.stats.values():
+        all_stats.latencies += stats.latencies
+        all_stats.errors += stats.errors
+        for status, count in stats.statuses.items():
+            all_stats.statuses[status] = all_stats.statuses.get(status, 0) + count
+
+    results = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "target": args.url or "asgi",
+        "python": platform.python_version(),
+        "stages": stages,
+        "mix": args.mix,
+        "think_seconds": args.think,
+        "duration_seconds": round(duration, 3),
+        "endpoints": {label: stats.summary(duration) for label, stats in sorted(test.stats.items())},
+        "total": all_stats.summary(duration),
+        "timeline": timeline,
+    }
+
+    previous = None
+    if args.compare:
+        previous_results = json.loads(args.compare.read_text(encoding="utf-8"))
+        previous = dict(previous_results["endpoints"])
+        previous["(全部)"] = previous_results["total"]
+    print_report(results, previous)
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"[資訊] 結果已寫入 {args.output}")
+
+    error_ratio = all_stats.errors / len(all_stats.latencies) if all_stats.latencies else 0.0
+    if error_ratio > args.max_error_ratio:
+        print(f"[失敗] 錯誤比例 {error_ratio:.1%} 超過 {args.max_error_ratio:.1%}")
+        return 1
+    return 0
+
+
+def main():
+    """主函數"""
+    parser = argparse.ArgumentParser(description="API 負載測試")
+    parser.add_argument("--url", default=None, help="服務位址，例如 http://localhost:8000（未指定時在行程內呼叫 app）")
+    parser.add_argument("--users", type=int, default=20, help="用戶數（未指定 --stages 時使用）")
+    parser.add_argument("--ramp", type=float, default=10, help="增加到 --users 的秒數（未指定 --stages 時使用）")
+    parser.add_argument("--duration", type=float, default=60, help="維持 --users 的秒數（未指定 --stages 時使用）")
+    parser.add_argument("--stages", default=None, help="負載階段，例如 10@30,50@60,0@10（用戶數@秒數，線性變化）")
+    parser.add_argument("--mix", default="dispatcher=2,agv=5,hmi=3", help="用戶類型比例")
+    parser.add_argument("--think", type=float, default=0.5, help="每個用戶操作間隔的平均秒數")
+    parser.add_argument("--pending-status", type=int, default=1, help="待執行任務的狀態 ID")
+    parser.add_argument("--running-status", type=int, default=2, help="領取後的任務狀態 ID")
+    parser.add_argument("--done-status", type=int, default=3, help="完成後的任務狀態 ID")
+    parser.add_argument("--work-id", type=int, default=9999, help="測試任務使用的工作 ID")
+    parser.add_argument("--keep-tasks", action="store_true", help="結束時保留測試建立的任務")
+    parser.add_argument("--timeout", type=float, default=30, help="單一請求逾時秒數")
+    parser.add_argument("--max-connections", type=int, default=200, help="HTTP 連線數上限")
+    parser.add_argument("--max-error-ratio", type=float, default=0.01, help="錯誤比例超過此值時以結束碼 1 結束")
+    parser.add_argument("--output", type=Path, default=None, help="結果 JSON 路徑")
+    parser.add_argument("--compare", type=Path, default=None, help="前次結果 JSON，列出 p95 與吞吐量的變化")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == '__main__':
+    main()
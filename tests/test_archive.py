@@ -0,0 +1,121 @@
+"""
+已完成任務搬移（task -> task_history）
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+from sqlmodel import func, select
+
+from app.core import archiver as archiver_module
+from app.core.archiver import TaskArchiver
+from app.crud.aio import task as crud_task
+from app.crud.aio import task_history as crud_task_history
+from app.models import Task
+
+FINISHED = [4]
+
+
+async def make_tasks(session_factory, statuses, age: timedelta):
+    async with session_factory() as session:
+        tasks = await crud_task.create_tasks(session, [Task(work_id=1, status_id=s) for s in statuses])
+        await session.exec(
+            update(Task).where(Task.id.in_([task.id for task in tasks]))
+            .values(updated_at=datetime.now() - age)
+        )
+        await session.commit()
+    return [task.id for task in tasks]
+
+
+@pytest.mark.postgres
+@pytest.mark.anyio
+async def test_archive_moves_only_old_finished_tasks(session_factory):
+    old_done = await make_tasks(session_factory, [4, 4, 4], timedelta(days=2))
+    old_active = await make_tasks(session_factory, [1], timedelta(days=2))
+    new_done = await make_tasks(session_factory, [4], timedelta(minutes=1))
+    before = datetime.now() - timedelta(days=1)
+
+    async with session_factory() as session:
+        months = await crud_task_history.get_archivable_months(session, FINISHED, before)
+        for month in months:
+            await crud_task_history.create_history_partition(session, month)
+        moved = await crud_task_history.archive_finished_tasks(session, FINISHED, before, limit=2)
+        moved_again = await crud_task_history.archive_finished_tasks(session, FINISHED, before, limit=2)
+        remaining = await crud_task_history.archive_finished_tasks(session, FINISHED, before, limit=2)
+
+    assert (moved, moved_again, remaining) == (2, 1, 0)
+
+    async with session_factory() as session:
+        live_ids = {task.id for task in await crud_task.get_all_tasks(session, limit=100)}
+        all_ids = {task.id for task in await crud_task.get_all_tasks(session, limit=100, include_history=True)}
+        archived = await crud_task.get_task(session, old_done[0], include_history=True)
+
+    assert live_ids == set(old_active + new_done)
+    assert all_ids == set(old_done + old_active + new_done)
+    assert archived is not None and archived.status_id == 4
+
+
+@pytest.mark.postgres
+@pytest.mark.anyio
+async def test_archive_returns_none_while_locked(session_factory):
+    await make_tasks(session_factory, [4], timedelta(days=2))
+    before = datetime.now() - timedelta(days=1)
+
+    async with session_factory() as holder, session_factory() as other:
+        # 第一個交易持有 advisory lock 尚未提交時，其他 worker 直接放棄本輪
+        await holder.exec(select(func.pg_advisory_xact_lock(crud_task_history.ARCHIVE_LOCK_KEY)))
+        assert await crud_task_history.archive_finished_tasks(other, FINISHED, before, limit=10) is None
+        await holder.rollback()
+
+
+@pytest.mark.postgres
+def test_archived_task_visible_through_api(client, session_factory):
+    async def archive():
+        ids = await make_tasks(session_factory, [4], timedelta(days=2))
+        async with session_factory() as session:
+            await crud_task_history.archive_finished_tasks(
+                session, FINISHED, datetime.now() - timedelta(days=1), limit=10
+            )
+        return ids[0]
+
+    task_id = asyncio.run(archive())
+
+    assert client.get(f"/api/v1/task/{task_id}").status_code == 404
+    response = client.get(f"/api/v1/task/{task_id}", params={"include_history": True})
+    assert response.status_code == 200
+    assert response.json()["id"] == task_id
+
+
+@pytest.mark.anyio
+async def test_failed_partition_warns_once_and_backs_off(monkeypatch, caplog):
+    attempts = []
+
+    async def get_archivable_months(session, finished_status_ids, before):
+        return [datetime(2025, 1, 1)]
+
+    async def create_history_partition(session, month):
+        attempts.append(month)
+        raise RuntimeError("permission denied")
+
+    async def archive_finished_tasks(session, finished_status_ids, before, limit):
+        return None
+
+    monkeypatch.setattr(archiver_module.crud_task_history, "get_archivable_months", get_archivable_months)
+    monkeypatch.setattr(archiver_module.crud_task_history, "create_history_partition", create_history_partition)
+    monkeypatch.setattr(archiver_module.crud_task_history, "archive_finished_tasks", archive_finished_tasks)
+
+    archiver = TaskArchiver(FINISHED, timedelta(days=1), batch_size=10, interval=60)
+    await archiver.run_once()
+    await archiver.run_once()
+
+    # 重試時間未到：不再執行 DDL，也不重複警告
+    assert len(attempts) == 1
+    assert sum("無法建立分區" in record.message for record in caplog.records) == 1
+
+    # 重試時間已到仍失敗：重試一次但不再警告
+    archiver._failed_partitions["task_history_p202501"] = datetime.now()
+    await archiver.run_once()
+
+    assert len(attempts) == 2
+    assert sum("無法建立分區" in record.message for record in caplog.records) == 1
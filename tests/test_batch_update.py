@@ -0,0 +1,48 @@
+"""
+批次更新任務（PATCH /task/batch）
+"""
+import pytest
+
+from app.core.config import settings
+
+BATCH_URL = "/api/v1/task/batch"
+
+
+def test_batch_update_by_filter(client):
+    client.post("/api/v1/task/bulk", json=[{"work_id": 1, "status_id": 1}, {"work_id": 1, "status_id": 3}])
+
+    response = client.patch(BATCH_URL, json={"status_id": 1, "values": {"status_id": 2}})
+
+    assert response.status_code == 200
+    assert response.json()["updated"] == 1
+    assert [task["status_id"] for task in response.json()["tasks"]] == [2]
+
+
+@pytest.mark.parametrize("field", ["status_id", "agv_name", "parameter"])
+def test_batch_update_rejects_null_values(client, field):
+    client.post("/api/v1/task/", json={"work_id": 1, "status_id": 1})
+
+    response = client.patch(BATCH_URL, json={"status_id": 1, "values": {field: None}})
+
+    assert response.status_code == 422
+    assert client.get("/api/v1/task/").json()[0]["status_id"] == 1
+
+
+def test_batch_update_requires_selection(client):
+    assert client.patch(BATCH_URL, json={"values": {"status_id": 2}}).status_code == 400
+
+
+def test_batch_update_caps_ids(client):
+    ids = list(range(1, settings.MULTI_GET_MAX_SIZE + 2))
+
+    assert client.patch(BATCH_URL, json={"ids": ids, "values": {"status_id": 2}}).status_code == 422
+
+
+@pytest.mark.postgres
+def test_batch_update_by_ids(client):
+    tasks = client.post("/api/v1/task/bulk", json=[{"work_id": 1, "status_id": 1} for _ in range(3)]).json()
+    ids = [task["id"] for task in tasks[:2]]
+
+    response = client.patch(BATCH_URL, json={"ids": ids, "values": {"priority": 7}, "return_rows": False})
+
+    assert response.json() == {"updated": 2, "tasks": None}
@@ -0,0 +1,90 @@
+"""
+AGV / EqpPort 讀取快取
+"""
+from app.core.cache import RowCache
+
+
+def make_cache():
+    return RowCache("test", maxsize=4, ttl=60)
+
+
+def row(row_id=1, name="A1", **fields):
+    return {"id": row_id, "name": name, "parameter": {"ip": "10.0.0.1"}, **fields}
+
+
+def test_put_and_get():
+    cache = make_cache()
+
+    cache.put(row(), cache.generation())
+
+    assert cache.get_by_id(1)["name"] == "A1"
+    assert cache.get_by_name("A1")["id"] == 1
+
+
+def test_put_skipped_after_concurrent_invalidation():
+    cache = make_cache()
+    since = cache.generation()
+    # 查詢期間另一個請求更新並失效（此時快取中沒有該列）
+    cache.invalidate(1, "A1")
+
+    cache.put(row(description="old"), since)
+
+    assert cache.get_by_id(1) is None
+    assert cache.stats()["stale_puts"] == 1
+
+
+def test_put_skipped_when_invalidated_by_name_only():
+    cache = make_cache()
+    since = cache.generation()
+    cache.invalidate(name="A1")
+
+    cache.put(row(), since)
+
+    assert cache.get_by_name("A1") is None
+
+
+def test_invalidation_of_other_rows_does_not_block_put():
+    cache = make_cache()
+    since = cache.generation()
+    cache.invalidate(2, "A2")
+
+    cache.put(row(), since)
+
+    assert cache.get_by_id(1) is not None
+
+
+def test_put_skipped_after_clear():
+    cache = make_cache()
+    since = cache.generation()
+    cache.clear()
+
+    cache.put(row(), since)
+
+    assert cache.get_by_id(1) is None
+    cache.put(row(), cache.generation())
+    assert cache.get_by_id(1) is not None
+
+
+def test_put_skipped_after_invalidation_log_is_trimmed():
+    cache = make_cache()
+    since = cache.generation()
+    for i in range(100, 120):
+        cache.invalidate(i)
+
+    cache.put(row(), since)
+
+    assert cache.get_by_id(1) is None
+
+
+def test_get_returns_copies():
+    cache = make_cache()
+    data = row()
+    cache.put(data, cache.generation())
+    data["parameter"]["ip"] = "changed"
+
+    first = cache.get_by_id(1)
+    first["parameter"]["ip"] = "changed"
+    first["name"] = "changed"
+
+    assert cache.get_by_id(1)["parameter"] == {"ip": "10.0.0.1"}
+    assert cache.get_by_name("A1")["name"] == "A1"
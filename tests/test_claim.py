@@ -0,0 +1,68 @@
+"""
+領取任務（POST /task/claim，FOR UPDATE SKIP LOCKED）
+"""
+import asyncio
+
+import pytest
+
+from app.crud.aio import task as crud_task
+from app.models import Task
+
+TASK_URL = "/api/v1/task/"
+
+
+def claim(client, agv_name, **fields):
+    body = {"agv_name": agv_name, "from_status_id": 1, "to_status_id": 2, **fields}
+    response = client.post(f"{TASK_URL}claim", json=body)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_claim_takes_highest_priority_first(client):
+    bulk = [{"work_id": 1, "status_id": 1, "priority": priority} for priority in (1, 5, 3)]
+    client.post(f"{TASK_URL}bulk", json=bulk)
+
+    claimed = claim(client, "AGV01", limit=2)
+
+    assert [task["priority"] for task in claimed] == [5, 3]
+    assert all(task["agv_name"] == "AGV01" and task["status_id"] == 2 for task in claimed)
+
+
+def test_claim_skips_assigned_and_other_work(client):
+    client.post(f"{TASK_URL}bulk", json=[
+        {"work_id": 1, "status_id": 1, "agv_name": "AGV09"},
+        {"work_id": 2, "status_id": 1},
+        {"work_id": 1, "status_id": 3},
+    ])
+
+    assert claim(client, "AGV01", work_id=1) == []
+    assert len(claim(client, "AGV01", work_id=2)) == 1
+
+
+def test_claim_does_not_return_same_task_twice(client):
+    client.post(TASK_URL, json={"work_id": 1, "status_id": 1})
+
+    assert len(claim(client, "AGV01")) == 1
+    assert claim(client, "AGV02") == []
+
+
+@pytest.mark.postgres
+@pytest.mark.anyio
+async def test_concurrent_claims_never_share_tasks(session_factory):
+    async with session_factory() as session:
+        await crud_task.create_tasks(session, [Task(work_id=1, status_id=1) for _ in range(20)])
+
+    async def claim_all(agv_name):
+        claimed = []
+        while True:
+            async with session_factory() as session:
+                tasks = await crud_task.claim_tasks(session, agv_name, 1, 2, limit=3)
+            if not tasks:
+                return claimed
+            claimed += [task.id for task in tasks]
+
+    results = await asyncio.gather(*(claim_all(f"AGV{i:02d}") for i in range(5)))
+
+    ids = sum(results, [])
+    assert len(ids) == 20
+    assert len(set(ids)) == 20
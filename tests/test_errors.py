@@ -0,0 +1,73 @@
+"""
+錯誤對應：唯一約束 -> 400、不存在 -> 404（單一 RETURNING 語句的更新 / 刪除）
+"""
+import pytest
+
+AGV_URL = "/api/v1/agv/"
+PORT_URL = "/api/v1/eqp_port/"
+TASK_URL = "/api/v1/task/"
+
+
+def create_agv(client, name, **fields):
+    response = client.post(AGV_URL, json={"name": name, "model": "K400", **fields})
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+def test_create_duplicate_agv_returns_400(client):
+    create_agv(client, "A1")
+
+    response = client.post(AGV_URL, json={"name": "A1", "model": "K400"})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "AGV 名稱 'A1' 已存在"
+
+
+@pytest.mark.parametrize("method", ["put", "patch"])
+def test_update_agv_to_existing_name_returns_400(client, method):
+    create_agv(client, "A1")
+    agv = create_agv(client, "A2")
+
+    response = getattr(client, method)(f"{AGV_URL}{agv['id']}", json={"name": "A1", "model": "K400"})
+
+    assert response.status_code == 400
+    # 失敗的更新已回滾，原資料不變
+    assert client.get(f"{AGV_URL}{agv['id']}").json()["name"] == "A2"
+
+
+def test_update_missing_agv_returns_404(client):
+    response = client.patch(f"{AGV_URL}999", json={"description": "x"})
+
+    assert response.status_code == 404
+
+
+def test_update_agv_returns_updated_row(client):
+    agv = create_agv(client, "A1")
+
+    response = client.patch(f"{AGV_URL}{agv['id']}", json={"description": "changed"})
+
+    assert response.status_code == 200
+    assert response.json()["description"] == "changed"
+    assert response.json()["updated_at"] >= agv["updated_at"]
+
+
+def test_delete_agv_then_404(client):
+    agv = create_agv(client, "A1")
+
+    assert client.delete(f"{AGV_URL}{agv['id']}").status_code == 204
+    assert client.delete(f"{AGV_URL}{agv['id']}").status_code == 404
+    assert client.get(f"{AGV_URL}{agv['id']}").status_code == 404
+
+
+def test_create_duplicate_eqp_port_returns_400(client):
+    port = {"name": "P1", "eqp_name": "EQ1", "node": "N1"}
+    assert client.post(PORT_URL, json=port).status_code == 201
+
+    response = client.post(PORT_URL, json=port)
+
+    assert response.status_code == 400
+
+
+def test_update_and_delete_missing_task_return_404(client):
+    assert client.patch(f"{TASK_URL}999", json={"status_id": 2}).status_code == 404
+    assert client.delete(f"{TASK_URL}999").status_code == 404
@@ -0,0 +1,85 @@
+"""
+ETag / If-None-Match 條件式 GET
+"""
+import pytest
+
+AGV_URL = "/api/v1/agv/"
+
+
+def test_agv_list_returns_304_until_changed(client):
+    client.post(AGV_URL, json={"name": "A1", "model": "K400"})
+    etag = client.get(AGV_URL).headers["etag"]
+
+    unchanged = client.get(AGV_URL, headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+
+    client.post(AGV_URL, json={"name": "A2", "model": "K400"})
+    changed = client.get(AGV_URL, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert [agv["name"] for agv in changed.json()] == ["A1", "A2"]
+
+
+def test_agv_list_etag_depends_on_query(client):
+    client.post(AGV_URL, json={"name": "A1", "model": "K400"})
+
+    etag = client.get(AGV_URL).headers["etag"]
+
+    assert client.get(AGV_URL, params={"limit": 1}, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_agv_detail_etag_changes_on_update(client):
+    agv = client.post(AGV_URL, json={"name": "A1", "model": "K400"}).json()
+    url = f"{AGV_URL}{agv['id']}"
+    etag = client.get(url).headers["etag"]
+
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(url, headers={"If-None-Match": f'"other", {etag}'}).status_code == 304
+
+    client.patch(url, json={"description": "changed"})
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_task_detail_etag(client):
+    task = client.post("/api/v1/task/", json={"work_id": 1, "status_id": 1}).json()
+    url = f"/api/v1/task/{task['id']}"
+    etag = client.get(url).headers["etag"]
+
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_task_list_etag_follows_filtered_rows(client):
+    task = client.post("/api/v1/task/", json={"work_id": 1, "status_id": 1}).json()
+    client.post("/api/v1/task/", json={"work_id": 1, "status_id": 3})
+    params = {"status_id": 1, "limit": 50}
+    etag = client.get("/api/v1/task/", params=params).headers["etag"]
+
+    assert client.get("/api/v1/task/", params=params, headers={"If-None-Match": etag}).status_code == 304
+    # 參數順序不影響 ETag
+    reordered = client.get("/api/v1/task/?limit=50&status_id=1", headers={"If-None-Match": etag})
+    assert reordered.status_code == 304
+
+    # 篩選範圍外的新增不影響，範圍內的更新會改變 ETag
+    client.post("/api/v1/task/", json={"work_id": 1, "status_id": 3})
+    assert client.get("/api/v1/task/", params=params, headers={"If-None-Match": etag}).status_code == 304
+    client.patch(f"/api/v1/task/{task['id']}", json={"priority": 5})
+    assert client.get("/api/v1/task/", params=params, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_task_list_etag_changes_on_delete(client):
+    tasks = [client.post("/api/v1/task/", json={"work_id": 1, "status_id": 1}).json() for _ in range(2)]
+    etag = client.get("/api/v1/task/").headers["etag"]
+
+    client.delete(f"/api/v1/task/{tasks[0]['id']}")
+
+    assert client.get("/api/v1/task/", headers={"If-None-Match": etag}).status_code == 200
+
+
+@pytest.mark.parametrize("url", [AGV_URL, "/api/v1/eqp_port/", "/api/v1/task/"])
+@pytest.mark.parametrize("params", [{"cursor": "bogus"}, {"param.": "x"}])
+def test_invalid_query_returns_400_even_when_etag_matches(client, url, params):
+    # ETag 含查詢參數，以 * 確保無論如何都相符
+    response = client.get(url, params=params, headers={"If-None-Match": "*"})
+
+    assert response.status_code == 400
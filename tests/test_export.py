@@ -0,0 +1,49 @@
+"""
+任務串流匯出（GET /task/export）
+"""
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.api.v1 import task as task_api
+
+EXPORT_URL = "/api/v1/task/export"
+
+
+@pytest.fixture
+def export_client(client, engine, monkeypatch):
+    """匯出在串流期間自行建立 Session，改用測試引擎"""
+    monkeypatch.setattr(task_api, "async_engine", engine)
+    return client
+
+
+def test_export_ndjson(export_client):
+    for status_id in (1, 1, 3):
+        export_client.post("/api/v1/task/", json={"work_id": 1, "status_id": status_id})
+
+    response = export_client.get(EXPORT_URL, params={"status_id": 1})
+
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["status_id"] for row in rows] == [1, 1]
+
+
+def test_export_accepts_timezone_aware_range(export_client):
+    export_client.post("/api/v1/task/", json={"work_id": 1, "status_id": 1})
+    # 帶時區的範圍轉為本地時間後比較，而不是在串流開始後才失敗
+    start = (datetime.now() - timedelta(hours=1)).astimezone()
+    end = (datetime.now() + timedelta(hours=1)).astimezone().isoformat()
+
+    response = export_client.get(EXPORT_URL, params={"created_from": start.isoformat(), "created_to": end})
+
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == 1
+
+
+def test_naive_local_converts_aware_values():
+    aware = datetime(2025, 1, 1, 0, 0).astimezone()
+
+    assert task_api._naive_local(None) is None
+    assert task_api._naive_local(aware) == aware.replace(tzinfo=None)
+    assert task_api._naive_local(aware.replace(tzinfo=None)).tzinfo is None
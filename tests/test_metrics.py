@@ -0,0 +1,28 @@
+"""
+請求指標的路由標籤
+"""
+from app.core.metrics import UNMATCHED_ROUTE, metrics_registry
+
+
+def labels():
+    return {route for _, route in metrics_registry.routes}
+
+
+def test_route_label_uses_route_template(client):
+    metrics_registry.routes.clear()
+
+    client.get("/api/v1/agv/")
+    client.get("/api/v1/agv/7")
+    # 參數值與固定路徑段相同時不影響標籤
+    client.get("/api/v1/agv/agv")
+    client.get("/api/v1/task/task")
+
+    assert labels() == {"/api/v1/agv/", "/api/v1/agv/{agv_id}", "/api/v1/task/{task_id}"}
+
+
+def test_unmatched_route_label(client):
+    metrics_registry.routes.clear()
+
+    client.get("/api/v1/nothing/here")
+
+    assert labels() == {UNMATCHED_ROUTE}
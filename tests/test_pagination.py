@@ -0,0 +1,95 @@
+"""
+Keyset（游標）分頁
+"""
+from datetime import datetime
+
+import pytest
+
+from app.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, split_page
+
+TASK_URL = "/api/v1/task/"
+
+
+def walk(client, url, limit, **params):
+    """依 X-Next-Cursor 走完所有頁，回傳每頁的 ID 列表"""
+    pages = []
+    cursor = None
+    while True:
+        query = {"limit": limit, **params}
+        if cursor:
+            query["cursor"] = cursor
+        response = client.get(url, params=query)
+        assert response.status_code == 200, response.text
+        pages.append([row["id"] for row in response.json()])
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return pages
+
+
+def test_cursor_roundtrip():
+    values = (5, datetime(2025, 1, 2, 3, 4, 5, 678), 42)
+
+    assert decode_cursor(encode_cursor(values), (int, datetime, int)) == values
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", encode_cursor([1]), encode_cursor(["x", "y", "z"])])
+def test_decode_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, (int, datetime, int))
+
+
+def test_split_page():
+    assert split_page([1, 2], 2, lambda row: (row,)) == ([1, 2], None)
+    rows, cursor = split_page([1, 2, 3], 2, lambda row: (row,))
+    assert rows == [1, 2]
+    assert decode_cursor(cursor, (int,)) == (2,)
+
+
+def test_task_cursor_pages_match_offset_order(client):
+    # 優先級相同的任務以建立時間、ID 排序
+    bulk = [{"work_id": 1, "status_id": 1, "priority": i % 3} for i in range(8)]
+    assert client.post(f"{TASK_URL}bulk", json=bulk).status_code == 201
+
+    expected = [row["id"] for row in client.get(TASK_URL, params={"limit": 100}).json()]
+    pages = walk(client, TASK_URL, 3)
+
+    assert [len(page) for page in pages] == [3, 3, 2]
+    assert sum(pages, []) == expected
+
+
+def test_task_cursor_does_not_repeat_after_insert(client):
+    bulk = [{"work_id": 1, "status_id": 1, "priority": 5} for _ in range(4)]
+    client.post(f"{TASK_URL}bulk", json=bulk)
+
+    first = client.get(TASK_URL, params={"limit": 2})
+    # 新增排在第一頁之前的任務，OFFSET 分頁會讓第二頁重複一筆
+    client.post(TASK_URL, json={"work_id": 1, "status_id": 1, "priority": 9})
+    second = client.get(TASK_URL, params={"limit": 2, "cursor": first.headers[NEXT_CURSOR_HEADER]})
+
+    first_ids = {row["id"] for row in first.json()}
+    second_ids = {row["id"] for row in second.json()}
+    assert len(second_ids) == 2
+    assert not first_ids & second_ids
+
+
+def test_task_cursor_with_filter(client):
+    bulk = [{"work_id": 1, "status_id": i % 2, "priority": 0} for i in range(6)]
+    client.post(f"{TASK_URL}bulk", json=bulk)
+
+    pages = walk(client, TASK_URL, 2, status_id=1)
+
+    assert sum(len(page) for page in pages) == 3
+
+
+def test_agv_cursor_pages(client):
+    for i in range(5):
+        client.post("/api/v1/agv/", json={"name": f"A{i}", "model": "K400"})
+
+    pages = walk(client, "/api/v1/agv/", 2)
+
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert sum(pages, []) == sorted(sum(pages, []))
+
+
+def test_invalid_cursor_returns_400(client):
+    assert client.get(TASK_URL, params={"cursor": "bogus"}).status_code == 400
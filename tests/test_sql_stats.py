@@ -0,0 +1,60 @@
+"""
+SQL 語句統計與 N+1 偵測
+"""
+import logging
+
+import pytest
+
+from app.core import sql_stats
+from app.core.sql_stats import begin_request, end_request, normalize_statement, skip_repeat_check
+
+
+@pytest.mark.parametrize("statement, expected", [
+    ("SELECT * FROM agv WHERE id = $1", "SELECT * FROM agv WHERE id = ?"),
+    ("SELECT *\n  FROM agv WHERE name = 'A1' LIMIT 10", "SELECT * FROM agv WHERE name = ? LIMIT ?"),
+    ("SELECT * FROM task WHERE id IN (%s, %s, %s)", "SELECT * FROM task WHERE id IN (?)"),
+    ("INSERT INTO t (a, b) VALUES (?, ?), (?, ?), (?, ?)", "INSERT INTO t (a, b) VALUES (?)"),
+])
+def test_normalize_statement(statement, expected):
+    assert normalize_statement(statement) == expected
+
+
+def run_request(label, shape, count, skip=False):
+    context, token = begin_request(label)
+    if skip:
+        skip_repeat_check()
+    context.shapes[shape] = count
+    end_request(context, token)
+
+
+def test_repeated_statement_logs_n_plus_one(caplog, monkeypatch):
+    monkeypatch.setattr(sql_stats.settings, "SQL_REPEAT_THRESHOLD", 3)
+
+    with caplog.at_level(logging.WARNING, logger="app"):
+        run_request("GET /a", "SELECT ?", 3)
+        run_request("GET /b", "SELECT ?", 4)
+
+    assert [record.getMessage() for record in caplog.records] == ["[N+1] GET /b 同一語句執行 4 次: SELECT ?"]
+
+
+def test_streaming_request_skips_n_plus_one(caplog, monkeypatch):
+    monkeypatch.setattr(sql_stats.settings, "SQL_REPEAT_THRESHOLD", 3)
+
+    with caplog.at_level(logging.WARNING, logger="app"):
+        run_request("GET /api/v1/task/stream", "SELECT ?", 100, skip=True)
+
+    assert caplog.records == []
+
+
+def test_duplicate_name_returns_400_with_hooks_installed(client):
+    sql_stats.sql_stats.reset()
+
+    assert client.post("/api/v1/agv/", json={"name": "A1", "model": "K400"}).status_code == 201
+    # handle_error 事件不能取代原本的 IntegrityError
+    response = client.post("/api/v1/agv/", json={"name": "A1", "model": "K400"})
+
+    assert response.status_code == 400
+    assert client.get("/api/v1/agv/").status_code == 200
+    # 測試引擎掛有統計事件：成功的 INSERT 有記錄，失敗的不計入
+    inserts = [row for row in sql_stats.sql_stats.top(100) if row["statement"].startswith("INSERT INTO agv")]
+    assert [row["calls"] for row in inserts] == [1]
@@ -0,0 +1,99 @@
+"""
+狀態訂閱的送出佇列：佇列已滿時的補送與溢位
+"""
+import asyncio
+import json
+
+import pytest
+
+from app.core.state_stream import AGV_TABLE, StateHub
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent: list[dict] = []
+        self.close_code = None
+
+    async def send_text(self, text: str):
+        self.sent.append(json.loads(text))
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+
+def make_connection(agv_names):
+    # 佇列只放得下一則訊息
+    hub = StateHub(queue_size=1)
+    websocket = FakeWebSocket()
+    connection = hub.connect(websocket)
+    hub.subscribe(connection, agv_names, [])
+    return hub, connection, websocket
+
+
+async def drain(hub, connection):
+    sender = asyncio.create_task(connection.send_loop(hub))
+    for _ in range(10):
+        await asyncio.sleep(0)
+    sender.cancel()
+    try:
+        await sender
+    except asyncio.CancelledError:
+        pass
+
+
+def agv(row_id, name):
+    return {"id": row_id, "name": name, "enable": 1}
+
+
+@pytest.mark.anyio
+async def test_delete_after_overflow_is_sent():
+    hub, connection, websocket = make_connection(["A1", "A2"])
+    hub._apply((AGV_TABLE, 1), agv(1, "A1"))
+    # 佇列已滿：A2 的快照被丟棄，之後 A2 被刪除
+    hub._apply((AGV_TABLE, 2), agv(2, "A2"))
+    hub._apply((AGV_TABLE, 2), None)
+
+    await drain(hub, connection)
+
+    assert [(m["op"], m["id"]) for m in websocket.sent] == [("snapshot", 1), ("delete", 2)]
+    assert websocket.sent[1]["name"] == "A2"
+
+
+@pytest.mark.anyio
+async def test_row_moved_out_of_subscription_after_overflow_is_deleted():
+    hub, connection, websocket = make_connection(["A1", "A2"])
+    hub._apply((AGV_TABLE, 1), agv(1, "A1"))
+    hub._apply((AGV_TABLE, 2), agv(2, "A2"))
+    # 改名後不再符合訂閱（快照仍存在於其他訂閱者時也不可送出快照）
+    other = hub.connect(FakeWebSocket())
+    hub.subscribe(other, ["B"], [])
+    hub._apply((AGV_TABLE, 2), agv(2, "B"))
+
+    await drain(hub, connection)
+
+    assert [(m["op"], m["id"]) for m in websocket.sent] == [("snapshot", 1), ("delete", 2)]
+
+
+@pytest.mark.anyio
+async def test_stale_row_is_refreshed_with_latest_snapshot():
+    hub, connection, websocket = make_connection(["A1", "A2"])
+    hub._apply((AGV_TABLE, 1), agv(1, "A1"))
+    hub._apply((AGV_TABLE, 2), agv(2, "A2"))
+    hub._apply((AGV_TABLE, 2), {**agv(2, "A2"), "enable": 0})
+
+    await drain(hub, connection)
+
+    assert [(m["op"], m["id"]) for m in websocket.sent] == [("snapshot", 1), ("snapshot", 2)]
+    assert websocket.sent[1]["data"]["enable"] == 0
+
+
+@pytest.mark.anyio
+async def test_control_overflow_closes_connection():
+    hub, connection, websocket = make_connection(["A1"])
+    hub._apply((AGV_TABLE, 1), agv(1, "A1"))
+    connection.push_control({"op": "error", "detail": "x"})
+
+    await drain(hub, connection)
+
+    assert websocket.sent == []
+    assert websocket.close_code == 1013
@@ -0,0 +1,43 @@
+"""
+任務變更串流的訂閱生命週期
+"""
+from datetime import timedelta
+
+import pytest
+
+from app.core.task_stream import TaskEventHub
+
+
+def make_hub():
+    hub = TaskEventHub(batch_size=100, queue_size=10, gap_grace=1.0, retention=timedelta(hours=1))
+    # 已初始化進度，訂閱時不查詢資料庫
+    hub._last_id = 0
+    return hub
+
+
+@pytest.mark.anyio
+async def test_stream_subscribes_only_while_running():
+    hub = make_hub()
+    stream = hub.stream(status_ids=[1], keepalive=0.01)
+
+    # 回應開始送出前用戶端就斷線：產生器沒有執行，不會留下訂閱
+    assert hub.subscriber_count == 0
+
+    assert (await stream.__anext__()).startswith("retry:")
+    assert hub.subscriber_count == 1
+
+    await stream.aclose()
+    assert hub.subscriber_count == 0
+
+
+@pytest.mark.anyio
+async def test_stream_unsubscribes_on_disconnect():
+    hub = make_hub()
+
+    async def disconnected():
+        return True
+
+    messages = [message async for message in hub.stream(is_disconnected=disconnected, keepalive=0.01)]
+
+    assert len(messages) == 1
+    assert hub.subscriber_count == 0
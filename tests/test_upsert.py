@@ -0,0 +1,41 @@
+"""
+依名稱新增或更新（PUT /by-name，INSERT ... ON CONFLICT，PostgreSQL 專用）
+"""
+import pytest
+
+pytestmark = pytest.mark.postgres
+
+AGV_URL = "/api/v1/agv/"
+PORT_URL = "/api/v1/eqp_port/"
+
+
+def test_upsert_agv_by_name_reports_insert_then_update(client):
+    first = client.put(f"{AGV_URL}by-name/A1", json={"model": "K400"})
+    second = client.put(f"{AGV_URL}by-name/A1", json={"model": "Cargo"})
+
+    assert first.status_code == 201
+    assert second.status_code == 200
+    assert second.json()["id"] == first.json()["id"]
+    assert second.json()["model"] == "Cargo"
+
+
+def test_upsert_eqp_port_by_name_reports_insert_then_update(client):
+    first = client.put(f"{PORT_URL}by-name/P1", json={"eqp_name": "EQ1", "node": "N1"})
+    second = client.put(f"{PORT_URL}by-name/P1", json={"eqp_name": "EQ1", "node": "N2"})
+
+    assert first.status_code == 201
+    assert second.status_code == 200
+    assert second.json()["id"] == first.json()["id"]
+    assert second.json()["node"] == "N2"
+
+
+def test_bulk_upsert_agvs_by_name(client):
+    client.put(f"{AGV_URL}by-name/A1", json={"model": "K400"})
+
+    response = client.put(f"{AGV_URL}by-name", json=[
+        {"name": "A1", "model": "Cargo"},
+        {"name": "A2", "model": "K400"},
+    ])
+
+    assert response.status_code == 200
+    assert {agv["name"]: agv["model"] for agv in response.json()} == {"A1": "Cargo", "A2": "K400"}